@@ -0,0 +1,51 @@
+from fastapi import APIRouter, Depends, Query, HTTPException
+from sqlalchemy.orm import Session, defer
+from app.models.intersection import Intersection
+from app.core.database import get_read_db
+from app.core.profiling import TimedRoute
+from app.schemas.intersections import IntersectionSummaryOut, IntersectionDetailOut
+
+router = APIRouter(
+    prefix="/intersections",
+    tags=["Intersections"],
+    route_class=TimedRoute
+)
+
+# (metric, window) -> indexed aggregate column
+RANKING_COLUMNS = {
+    ("harm", "all"): Intersection.harm,
+    ("count", "all"): Intersection.collision_count,
+    ("harm", "12m"): Intersection.harm_12m,
+    ("count", "12m"): Intersection.collisions_12m,
+}
+
+@router.get("/top", response_model=list[IntersectionSummaryOut])
+def get_top_intersections(
+    metric: str = Query("harm", pattern="^(harm|count)$"),
+    window: str = Query("all", pattern="^(all|12m)$", description="All time or the 12 months up to the latest collision"),
+    limit: int = Query(10, ge=1, le=100),
+    db: Session = Depends(get_read_db),
+):
+    """
+    Get the most dangerous intersections ranked by harm score or collision count.
+    Reads the precomputed intersection aggregates, so this is one index scan instead of a GROUP BY.
+    """
+    column = RANKING_COLUMNS[(metric, window)]
+    return (
+        db.query(Intersection)
+        .options(defer(Intersection.severity_mix), defer(Intersection.monthly), defer(Intersection.recent))
+        .order_by(column.desc(), Intersection.int_key)
+        .limit(limit)
+        .all()
+    )
+
+@router.get("/{int_key}", response_model=IntersectionDetailOut)
+def get_intersection(int_key: int, db: Session = Depends(get_read_db)):
+    """
+    Get one intersection's dashboard: totals, rolling 12 months, severity mix, monthly time series
+    and latest collisions, all from a single primary key lookup.
+    """
+    intersection = db.get(Intersection, int_key)
+    if intersection is None:
+        raise HTTPException(status_code=404, detail="Intersection not found")
+    return intersection
@@ -1,45 +1,65 @@
 from fastapi import APIRouter, Depends
-from app.schemas.collisions import SeverityOut, CollisionTypeOut, SDOTCollisionTypeOut, JunctionTypeOut, LightConditionOut, WeatherConditionOut, RoadConditionOut, AddressTypeOut
-from app.core.database import get_db
+from app.schemas.collisions import SeverityOut, CollisionTypeOut, SDOTCollisionTypeOut, JunctionTypeOut, LightConditionOut, WeatherConditionOut, RoadConditionOut, AddressTypeOut, HarmProfileOut
+from app.core.cache import result_cache
+from app.core.database import get_read_db
+from app.core.profiling import TimedRoute
 from sqlalchemy.orm import Session
-from app.models import Severity, CollisionType, SDOTCollisionType, JunctionType, LightCondition, WeatherCondition, RoadCondition, AddressType
+from app.models import Severity, CollisionType, SDOTCollisionType, JunctionType, LightCondition, WeatherCondition, RoadCondition, AddressType, HarmProfile
 
 router = APIRouter(
     prefix="/lookups",
-    tags=["Lookups"]
+    tags=["Lookups"],
+    route_class=TimedRoute
 )
 
+
+def cached_lookup(db: Session, model, *order_by) -> list[dict]:
+    """
+    Lookup rows as dicts, served from the result cache (shared between workers when configured).
+    """
+    columns = [column.name for column in model.__table__.columns]
+    return result_cache.get_or_compute(
+        f"lookups-{model.__tablename__}",
+        {},
+        lambda: [{name: getattr(row, name) for name in columns} for row in db.query(model).order_by(*order_by).all()],
+    )
+
 @router.get("/severities", response_model=list[SeverityOut], response_model_exclude_none=True)
-def list_severities(db: Session = Depends(get_db)):
-    return db.query(Severity).order_by(Severity.code.asc()).all()
+def list_severities(db: Session = Depends(get_read_db)):
+    return cached_lookup(db, Severity, Severity.code.asc())
 
 @router.get("/collision-types", response_model=list[CollisionTypeOut], response_model_exclude_none=True)
-def list_collision_types(db: Session = Depends(get_db)):
-    return db.query(CollisionType).order_by(CollisionType.name.asc()).all()
+def list_collision_types(db: Session = Depends(get_read_db)):
+    return cached_lookup(db, CollisionType, CollisionType.name.asc())
 
 @router.get("/sdot_collision_types", response_model=list[SDOTCollisionTypeOut], response_model_exclude_none=True)
-def list_sdot_collision_types(db: Session = Depends(get_db)):
-    return db.query(SDOTCollisionType).order_by(SDOTCollisionType.code.asc()).all()
+def list_sdot_collision_types(db: Session = Depends(get_read_db)):
+    return cached_lookup(db, SDOTCollisionType, SDOTCollisionType.code.asc())
 
 @router.get("/junction-types", response_model=list[JunctionTypeOut], response_model_exclude_none=True)
-def list_junction_types(db: Session = Depends(get_db)):
-    return db.query(JunctionType).order_by(JunctionType.name.asc()).all()
+def list_junction_types(db: Session = Depends(get_read_db)):
+    return cached_lookup(db, JunctionType, JunctionType.name.asc())
 
 
 @router.get("/light-conditions", response_model=list[LightConditionOut], response_model_exclude_none=True)
-def list_light_conditions(db: Session = Depends(get_db)):
-    return db.query(LightCondition).order_by(LightCondition.name.asc()).all()
+def list_light_conditions(db: Session = Depends(get_read_db)):
+    return cached_lookup(db, LightCondition, LightCondition.name.asc())
 
 
 @router.get("/weather-conditions", response_model=list[WeatherConditionOut], response_model_exclude_none=True)
-def list_weather_conditions(db: Session = Depends(get_db)):
-    return db.query(WeatherCondition).order_by(WeatherCondition.name.asc()).all()
+def list_weather_conditions(db: Session = Depends(get_read_db)):
+    return cached_lookup(db, WeatherCondition, WeatherCondition.name.asc())
 
 
 @router.get("/road-conditions", response_model=list[RoadConditionOut], response_model_exclude_none=True)
-def list_road_conditions(db: Session = Depends(get_db)):
-    return db.query(RoadCondition).order_by(RoadCondition.name.asc()).all()
+def list_road_conditions(db: Session = Depends(get_read_db)):
+    return cached_lookup(db, RoadCondition, RoadCondition.name.asc())
 
 @router.get("/address-types", response_model=list[AddressTypeOut], response_model_exclude_none=True)
-def list_address_types(db: Session = Depends(get_db)):
-    return db.query(AddressType).order_by(AddressType.name.asc()).all()
\ No newline at end of file
+def list_address_types(db: Session = Depends(get_read_db)):
+    return cached_lookup(db, AddressType, AddressType.name.asc())
+
+
+@router.get("/harm-profiles", response_model=list[HarmProfileOut])
+def list_harm_profiles(db: Session = Depends(get_read_db)):
+    return cached_lookup(db, HarmProfile, HarmProfile.is_default.desc(), HarmProfile.name.asc())
\ No newline at end of file
@@ -1,15 +1,22 @@
 from datetime import datetime
 from typing import Optional
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy import func
-from app.schemas.collision_stats import CollisionStatsSummaryOut, CollisionsStatsBySeverityOut
-from app.core.database import get_db
+from fastapi import APIRouter, Depends, Query, HTTPException
+from sqlalchemy import func, tuple_
+from app.schemas.collision_stats import CollisionStatsSummaryOut, CollisionsStatsBySeverityOut, CollisionStatsCubeOut, CollisionStatsTimeMatrixOut, CollisionStatsConditionsOut
+from app.core.cache import make_cache_key, result_cache
+from app.core.database import get_analytics_db
+from app.core.guardrails import admitted, affordable_variant, analytics_guard
+from app.core.profiling import TimedRoute
+from app.core.singleflight import inflight
 from sqlalchemy.orm import Session
-from app.models import TrafficCollision, Severity
+from app.models import TrafficCollision, Severity, CollisionType, WeatherCondition, LightCondition, RoadCondition, JunctionType, AddressType
 
 router = APIRouter(
     prefix="/collisions/stats",
-    tags=["Collisions Stats"]
+    tags=["Collisions Stats"],
+    route_class=TimedRoute,
+    # Admission slot and statement timeout per route, see app.core.guardrails
+    dependencies=[Depends(analytics_guard)],
 )
 
 @router.get("/", response_model=CollisionStatsSummaryOut, response_model_exclude_none=True)
@@ -18,33 +25,40 @@ def get_collision_stats(
     severity: Optional[str] = Query(None, description="Filter by severity"),
     start_date: Optional[datetime] = Query(None, description="Filter by results after start date"),
     end_date: Optional[datetime] = Query(None, description="Filter by results before end date"),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_analytics_db),
 ):
     """
     Get summary stats for all collisions, can be filtered based on location, severity, and start/end date.
     Returns an aggregated query that returns one row with all the stats.
     """
-    query = db.query(TrafficCollision)
+    def compute():
+        query = db.query(TrafficCollision)
 
-    if location:
-        query = query.filter(TrafficCollision.location.ilike(f"%{location}%"))
-    if severity:
-        query = query.join(TrafficCollision.severity).filter(Severity.desc.ilike(f"%{severity}%"))
-    if start_date:
-        query = query.filter(TrafficCollision.occurred_at >= start_date)
-    if end_date:
-        query = query.filter(TrafficCollision.occurred_at <= end_date)
+        if location:
+            query = query.filter(TrafficCollision.location.ilike(f"%{location}%"))
+        if severity:
+            query = query.join(TrafficCollision.severity).filter(Severity.desc.ilike(f"%{severity}%"))
+        if start_date:
+            query = query.filter(TrafficCollision.occurred_at >= start_date)
+        if end_date:
+            query = query.filter(TrafficCollision.occurred_at <= end_date)
 
-    row = query.with_entities(
-        func.count(TrafficCollision.id).label("total_collisions"),
-        func.coalesce(func.sum(TrafficCollision.injuries), 0).label("total_injuries"),
-        func.coalesce(func.sum(TrafficCollision.serious_injuries), 0).label("total_serious_injuries"),
-        func.coalesce(func.sum(TrafficCollision.fatalities), 0).label("total_fatalities"),
-        func.min(TrafficCollision.occurred_at).label("occurred_at_min"),
-        func.max(TrafficCollision.occurred_at).label("occurred_at_max")
-    ).one()
+        row = query.with_entities(
+            func.count(TrafficCollision.id).label("total_collisions"),
+            func.coalesce(func.sum(TrafficCollision.injuries), 0).label("total_injuries"),
+            func.coalesce(func.sum(TrafficCollision.serious_injuries), 0).label("total_serious_injuries"),
+            func.coalesce(func.sum(TrafficCollision.fatalities), 0).label("total_fatalities"),
+            func.min(TrafficCollision.occurred_at).label("occurred_at_min"),
+            func.max(TrafficCollision.occurred_at).label("occurred_at_max")
+        ).one()
 
-    return dict(row._mapping)
+        return dict(row._mapping)
+
+    return result_cache.get_or_compute(
+        "stats-summary",
+        {"location": location, "severity": severity, "start_date": start_date, "end_date": end_date},
+        admitted(db, compute),
+    )
 
 
 @router.get("/by-severity", response_model=list[CollisionsStatsBySeverityOut], response_model_exclude_none=True)
@@ -52,14 +66,113 @@ def get_collisions_stats_by_severity(
     location : Optional[str] = Query(None, description="Filter by location text"),
     start_date: Optional[datetime] = Query(None, description="Filter by results after start date"),
     end_date: Optional[datetime] = Query(None, description="Filter by results before end date"),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_analytics_db),
 ):
     """
     Get summary stats for all collisions by severity, can be filtered based on location and start/end date.
     Returns an aggregated query that returns one row per severity.
     """
+    def compute():
+        query = db.query(TrafficCollision)
+
+        if location:
+            query = query.filter(TrafficCollision.location.ilike(f"%{location}%"))
+        if start_date:
+            query = query.filter(TrafficCollision.occurred_at >= start_date)
+        if end_date:
+            query = query.filter(TrafficCollision.occurred_at <= end_date)
+
+        total_collisions = func.count(TrafficCollision.id).label("total_collisions")
+
+        rows = (query.join(TrafficCollision.severity).with_entities(
+            Severity.id.label("severity_id"),
+            Severity.code.label("severity_code"),
+            Severity.desc.label("severity_desc"),
+            total_collisions
+        )
+        .group_by(Severity.id, Severity.code, Severity.desc)
+        .order_by(total_collisions.desc())
+        .all()
+        )
+
+        return [dict(r._mapping) for r in rows]
+
+    return result_cache.get_or_compute(
+        "stats-by-severity",
+        {"location": location, "start_date": start_date, "end_date": end_date},
+        admitted(db, compute),
+    )
+
+
+# Cube dimensions: name -> (relationship to outer join, label column)
+CUBE_DIMENSIONS = {
+    "severity": (TrafficCollision.severity, Severity.desc),
+    "collision_type": (TrafficCollision.collision_type, CollisionType.name),
+    "weather": (TrafficCollision.weather_condition, WeatherCondition.name),
+    "light": (TrafficCollision.light_condition, LightCondition.name),
+    "road": (TrafficCollision.road_condition, RoadCondition.name),
+    "junction": (TrafficCollision.junction_type, JunctionType.name),
+    "address_type": (TrafficCollision.address_type, AddressType.name),
+}
+
+# CUBE expands to 2^n grouping sets, keep n small
+MAX_CUBE_DIMENSIONS = 4
+
+# Finest first, a request over the cost guardrail is served the next one
+CUBE_TIME_BUCKETS = ["day", "week", "month", "year"]
+
+CUBE_MEASURES = ["total_collisions", "total_injuries", "total_serious_injuries", "total_fatalities"]
+
+
+@router.get("/cube", response_model=CollisionStatsCubeOut)
+def get_collision_stats_cube(
+    group_by: list[str] = Query(..., description="Dimensions: severity, collision_type, weather, light, road, junction, address_type, time"),
+    grouping: str = Query("cube", pattern="^(cube|rollup|sets)$", description="cube = all combinations, rollup = hierarchical, sets = each dimension alone plus total"),
+    time_bucket: str = Query("month", pattern="^(day|week|month|year)$", description="Bucket size for the time dimension"),
+    severity: Optional[list[str]] = Query(None, description="Filter by severity description (repeatable)"),
+    collision_type: Optional[list[str]] = Query(None, description="Filter by collision type (repeatable)"),
+    weather: Optional[list[str]] = Query(None, description="Filter by weather condition (repeatable)"),
+    light: Optional[list[str]] = Query(None, description="Filter by light condition (repeatable)"),
+    road: Optional[list[str]] = Query(None, description="Filter by road condition (repeatable)"),
+    junction: Optional[list[str]] = Query(None, description="Filter by junction type (repeatable)"),
+    address_type: Optional[list[str]] = Query(None, description="Filter by address type (repeatable)"),
+    location: Optional[str] = Query(None, description="Filter by location text"),
+    start_date: Optional[datetime] = Query(None, description="Filter by results after start date"),
+    end_date: Optional[datetime] = Query(None, description="Filter by results before end date"),
+    db: Session = Depends(get_analytics_db),
+):
+    """
+    Get stats for several group-by dimensions at once, using one GROUPING SETS / CUBE / ROLLUP query.
+    Returned columnar. The `grouping` column is a bitmask of rolled-up dimensions
+    (last dimension = lowest bit), so a NULL dimension value with its bit unset is a real missing value.
+    """
+    unknown = [d for d in group_by if d != "time" and d not in CUBE_DIMENSIONS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown dimension(s): {', '.join(unknown)}")
+    if len(set(group_by)) != len(group_by):
+        raise HTTPException(status_code=400, detail="Duplicate dimensions in group_by")
+    if grouping == "cube" and len(group_by) > MAX_CUBE_DIMENSIONS:
+        raise HTTPException(status_code=400, detail=f"cube supports at most {MAX_CUBE_DIMENSIONS} dimensions, use rollup or sets")
+
+    filters = {
+        "severity": severity,
+        "collision_type": collision_type,
+        "weather": weather,
+        "light": light,
+        "road": road,
+        "junction": junction,
+        "address_type": address_type,
+    }
+
     query = db.query(TrafficCollision)
 
+    # Join each lookup once, whether it is grouped, filtered, or both
+    for name, (relationship, label) in CUBE_DIMENSIONS.items():
+        if name in group_by or filters[name]:
+            query = query.outerjoin(relationship)
+        if filters[name]:
+            query = query.filter(label.in_(filters[name]))
+
     if location:
         query = query.filter(TrafficCollision.location.ilike(f"%{location}%"))
     if start_date:
@@ -67,17 +180,119 @@ def get_collisions_stats_by_severity(
     if end_date:
         query = query.filter(TrafficCollision.occurred_at <= end_date)
 
-    total_collisions = func.count(TrafficCollision.id).label("total_collisions")
+    def cube_statement(time_bucket):
+        dimension_cols = []
+        for name in group_by:
+            if name == "time":
+                dimension_cols.append(func.date_trunc(time_bucket, TrafficCollision.occurred_at).label(name))
+            else:
+                dimension_cols.append(CUBE_DIMENSIONS[name][1].label(name))
 
-    rows = (query.join(TrafficCollision.severity).with_entities(
-        Severity.id.label("severity_id"),
-        Severity.code.label("severity_code"),
-        Severity.desc.label("severity_desc"),
-        total_collisions
-    )
-    .group_by(Severity.id, Severity.code, Severity.desc)
-    .order_by(total_collisions.desc())
-    .all()
-    )
+        if grouping == "cube":
+            group_clause = func.cube(*dimension_cols)
+        elif grouping == "rollup":
+            group_clause = func.rollup(*dimension_cols)
+        else:
+            group_clause = func.grouping_sets(*[tuple_(col) for col in dimension_cols], tuple_())
+
+        grouping_id = func.grouping(*dimension_cols).label("grouping")
+
+        return (
+            query.with_entities(
+                *dimension_cols,
+                grouping_id,
+                func.count(TrafficCollision.id).label("total_collisions"),
+                func.coalesce(func.sum(TrafficCollision.injuries), 0).label("total_injuries"),
+                func.coalesce(func.sum(TrafficCollision.serious_injuries), 0).label("total_serious_injuries"),
+                func.coalesce(func.sum(TrafficCollision.fatalities), 0).label("total_fatalities"),
+            )
+            .group_by(group_clause)
+            .order_by(grouping_id, *dimension_cols)
+        )
+
+    def compute():
+        # Over the cost guardrail a time dimension is served in the next coarser buckets
+        position = CUBE_TIME_BUCKETS.index(time_bucket)
+        buckets = CUBE_TIME_BUCKETS[position:position + 2] if "time" in group_by else [time_bucket]
+        used_bucket, statement = affordable_variant(db, "stats-cube", [(b, cube_statement(b)) for b in buckets])
+        return used_bucket, statement.all()
+
+    # Not cached (too many combinations), but identical concurrent requests share one query
+    key = make_cache_key("stats-cube", {
+        "group_by": group_by, "grouping": grouping, "time_bucket": time_bucket, **filters,
+        "location": location, "start_date": start_date, "end_date": end_date,
+    })
+    used_bucket, rows = inflight.do(key, admitted(db, compute), "stats-cube")
+
+    # Transpose rows into one list per column
+    column_names = [*group_by, "grouping", *CUBE_MEASURES]
+    columns = {name: [row._mapping[name] for row in rows] for name in column_names}
+
+    return {
+        "dimensions": group_by,
+        "measures": CUBE_MEASURES,
+        "row_count": len(rows),
+        "columns": columns,
+        "time_bucket": used_bucket if "time" in group_by else None,
+    }
+
+
+@router.get("/time-matrix", response_model=CollisionStatsTimeMatrixOut)
+def get_collision_stats_time_matrix(
+    matrix: str = Query("hour-of-week", pattern="^(hour-of-week|month-by-hour)$", description="Local hour against day of week (7x24) or month (12x24)"),
+    metric: str = Query("collisions", pattern="^(collisions|harm)$"),
+    severity_id: Optional[int] = Query(None, description="Filter by severity id"),
+    location: Optional[str] = Query(None, description="Filter by location text"),
+    start_date: Optional[datetime] = Query(None, description="Filter by results after start date"),
+    end_date: Optional[datetime] = Query(None, description="Filter by results before end date"),
+    harm_profile: Optional[str] = Query(None, description="Harm score profile for metric=harm, defaults to the stored default"),
+    db: Session = Depends(get_analytics_db),
+):
+    """
+    Get collisions by Seattle local time as a raw matrix, one GROUP BY over the precomputed local time columns.
+    """
+    # Loaded on first use, so importing the app does not pull in the harm scoring and importer code
+    from app.harm import HarmProfileNotFound
+    from app.time_matrix import time_matrix
+
+    params = {
+        "matrix": matrix,
+        "metric": metric,
+        "severity_id": severity_id,
+        "location": location,
+        "start_date": start_date,
+        "end_date": end_date,
+        "harm_profile": harm_profile,
+    }
+    try:
+        return result_cache.get_or_compute("stats-time-matrix", params, admitted(db, lambda: time_matrix(db, **params)))
+    except HarmProfileNotFound:
+        raise HTTPException(status_code=404, detail=f"Harm profile {harm_profile!r} not found")
+
+
+@router.get("/conditions", response_model=CollisionStatsConditionsOut)
+def get_collision_stats_conditions(
+    row: str = Query("road", pattern="^(weather|light|road|junction)$", description="Row dimension"),
+    column: str = Query("light", pattern="^(weather|light|road|junction)$", description="Column dimension"),
+    row_value: Optional[str] = Query(None, description="Only this row value, e.g. Wet"),
+    column_value: Optional[str] = Query(None, description="Only this column value, e.g. Dark - No Street Lights"),
+    severity_id: Optional[int] = Query(None, description="Filter by severity id"),
+    db: Session = Depends(get_analytics_db),
+):
+    """
+    Get co-occurrence stats for two condition dimensions: counts, injuries, harm, severity mix and rates per combination.
+    Reads the precomputed contingency table maintained by the importers, so this is one indexed query.
+    """
+    from app.conditions import condition_crosstab
+
+    if row == column:
+        raise HTTPException(status_code=400, detail="row and column must be different dimensions")
 
-    return [dict(r._mapping) for r in rows]
\ No newline at end of file
+    params = {
+        "row": row,
+        "column": column,
+        "severity_id": severity_id,
+        "row_value": row_value,
+        "column_value": column_value,
+    }
+    return result_cache.get_or_compute("stats-conditions", params, admitted(db, lambda: condition_crosstab(db, **params)))
@@ -1,15 +1,17 @@
 from typing import Optional
 from datetime import datetime
 from fastapi import APIRouter, Depends, Query, HTTPException
-from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.orm import Session, joinedload
 from app.models.traffic_collisions import TrafficCollision
 from app.models.severity import Severity
-from app.core.database import get_db
+from app.core.database import get_read_db
+from app.core.profiling import TimedRoute
 from app.schemas.collisions import PaginatedCollisionsOut, TrafficCollisionOut
 
 router = APIRouter(
     prefix="/collisions",
-    tags=["Traffic Collisions"]
+    tags=["Traffic Collisions"],
+    route_class=TimedRoute
 )
 
 @router.get("/", response_model=PaginatedCollisionsOut, response_model_exclude_none=True)
@@ -23,7 +25,7 @@ def read_collisions(
     limit: int = Query(100, ge=1, le=1000, description="Max number of results to return"),
     offset: int = Query(0, ge=0, description="Number of rows to skip"),
     # Database session
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Get LEAN list of traffic collisions, optionally filtered by location, severity, and date range.
@@ -46,11 +48,11 @@ def read_collisions(
     # Total count before pagination
     total = query.count()
 
-    # Eager loading severity and collision_types, preventing (N+1) queries
+    # Eager loading severity and collision_types in the same query, preventing (N+1) queries
     items = (
         query.options(
-            selectinload(TrafficCollision.severity),
-            selectinload(TrafficCollision.collision_type),
+            joinedload(TrafficCollision.severity),
+            joinedload(TrafficCollision.collision_type),
         )
         .offset(offset)
         .limit(limit)
@@ -61,22 +63,22 @@ def read_collisions(
     return {"total": total, "limit": limit, "offset": offset, "items": items}
 
 @router.get("/{collision_id}", response_model=TrafficCollisionOut, response_model_exclude_none=True)
-def read_collision_expanded(collision_id: int, db: Session = Depends(get_db)):
+def read_collision_expanded(collision_id: int, db: Session = Depends(get_read_db)):
     """
     Get full traffic collision record by ID, expanding all lookup relationships.
     """
 
-    # Query one collision by primary key and eager-load all relationships needed
+    # Query one collision by primary key and join all many-to-one lookups in a single query
     collision = (
         db.query(TrafficCollision).options(
-            selectinload(TrafficCollision.severity),
-            selectinload(TrafficCollision.collision_type),
-            selectinload(TrafficCollision.sdot_collision_type),
-            selectinload(TrafficCollision.junction_type),
-            selectinload(TrafficCollision.light_condition),
-            selectinload(TrafficCollision.weather_condition),
-            selectinload(TrafficCollision.road_condition),
-            selectinload(TrafficCollision.address_type),
+            joinedload(TrafficCollision.severity),
+            joinedload(TrafficCollision.collision_type),
+            joinedload(TrafficCollision.sdot_collision_type),
+            joinedload(TrafficCollision.junction_type),
+            joinedload(TrafficCollision.light_condition),
+            joinedload(TrafficCollision.weather_condition),
+            joinedload(TrafficCollision.road_condition),
+            joinedload(TrafficCollision.address_type),
         )
         .filter(TrafficCollision.id == collision_id)
         .first()
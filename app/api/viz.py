@@ -1,32 +1,112 @@
-from fastapi import APIRouter, Query, Depends
-from sqlalchemy import func
-from app.core.database import get_db
-from datetime import datetime, timedelta
+import asyncio
+import inspect
+import json
+import os
+from functools import cache, wraps
+from fastapi import APIRouter, Header, HTTPException, Query, Depends
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response
+from pydantic import BaseModel, ConfigDict, ValidationError, create_model
+from starlette.concurrency import run_in_threadpool
+from app.core.cache import result_cache
+from app.core.compression import decode_variants, encode_json_variants, variants_response
+from app.core.database import analytics_replicas, get_analytics_db
+from app.core.guardrails import DEFAULT_LIMITS, ROUTE_LIMITS, admission, admitted, analytics_guard, guardrail_error
+from app.core.profiling import TimedRoute
+from datetime import datetime
 from sqlalchemy.orm import Session
-from typing import Optional
-from app.models.traffic_collisions import TrafficCollision
-from app.viz_specs import build_collisions_by_severity_spec, build_horizontal_bar_graph_spec, build_line_chart_spec, build_collision_heatmap_spec
+from typing import Callable, Optional
+from app.schemas.dashboard import DashboardIn, DashboardPanelIn
 
 
 router = APIRouter(
     prefix="/viz",
-    tags=["Visualizations"]
+    tags=["Visualizations"],
+    route_class=TimedRoute,
+    dependencies=[Depends(analytics_guard)],
     )
 
 
+# Data-by-reference specs depend on the parameters only, clients may keep them this long
+VIZ_SPEC_MAX_AGE = int(os.getenv("VIZ_SPEC_MAX_AGE", "86400"))
+
+# ?data= of the viz endpoints: spec with embedded values, or spec loading /viz/data/<name>
+DATA_MODE = Query("inline", pattern="^(inline|url)$", description="inline = data embedded in the spec, url = spec loads it from /viz/data/...")
+
+# Panels of one dashboard request computed at once, each on its own connection
+DASHBOARD_MAX_PARALLEL = int(os.getenv("DASHBOARD_MAX_PARALLEL", "4"))
+
+# Viz name -> endpoint, registered by with_data_endpoint
+VIZ_ENDPOINTS: dict[str, Callable] = {}
+# Endpoint parameters that are not viz parameters
+_NOT_VIZ_PARAMS = {"data", "accept_encoding", "db"}
+
+
+def cached_viz(db: Session, name: str, accept_encoding: Optional[str], data: str = "inline", **params) -> Response:
+    """
+    Serve a viz spec from the result cache, building it on a miss.
+    Cached specs are stored already compressed, the variant the client accepts is sent as is.
+    data="url" serves the spec that references the data endpoint, data="columns" the columnar data.
+    """
+    # The spec builders (and the harm/time matrix queries they use) are loaded by the first viz request
+    from app.harm import HarmProfileNotFound
+    from app.viz_specs import build_encoded
+
+    headers = None
+    if data == "url":
+        name = f"{name}/spec"
+        headers = {"Cache-Control": f"public, max-age={VIZ_SPEC_MAX_AGE}"}
+    elif data == "columns":
+        name = f"{name}/data"
+    try:
+        blob = result_cache.get_or_compute(name, params, admitted(db, lambda: build_encoded(db, name, **params)))
+    except HarmProfileNotFound:
+        raise HTTPException(status_code=404, detail=f"Harm profile {params.get('harm_profile')!r} not found")
+    return variants_response(blob, accept_encoding, headers=headers)
+
+
+def with_data_endpoint(name: str):
+    """
+    Also register the decorated viz endpoint as GET /viz/data/<name>, with the same query
+    parameters minus `data`, returning the "table" data as columns: {"columns": {field: [values]}, "rows": n}.
+    The endpoint is also recorded in VIZ_ENDPOINTS for dashboard panels.
+    """
+    def register(endpoint):
+        VIZ_ENDPOINTS[name] = endpoint
+        signature = inspect.signature(endpoint)
+
+        @wraps(endpoint)
+        def data_endpoint(**kwargs):
+            return endpoint(**kwargs, data="columns")
+
+        data_endpoint.__signature__ = signature.replace(
+            parameters=[p for p in signature.parameters.values() if p.name != "data"]
+        )
+        data_endpoint.__doc__ = f"Returns the data of /viz/{name} as columnar JSON."
+        router.get(f"/data/{name}", response_model=None, name=f"{endpoint.__name__}_data")(data_endpoint)
+        return endpoint
+    return register
+
+
 @router.get("/collisions-by-severity", response_model=None)
+@with_data_endpoint("collisions-by-severity")
 def collisions_by_severity(
     location: Optional[str] = Query(None, description="Filter by location"),
     start_date: Optional[datetime] = Query(None, description="Filter by results after start date"),
     end_date: Optional[datetime] = Query(None, description="Filter by results before end date"),
-    db: Session = Depends(get_db)
-) -> dict:
+    data: str = DATA_MODE,
+    accept_encoding: Optional[str] = Header(None, include_in_schema=False),
+    db: Session = Depends(get_analytics_db),
+) -> Response:
     """
     Returns a Vega spec (JSON) with data embedded for collisions grouped by severity.
     """
 
-    return build_collisions_by_severity_spec(
+    return cached_viz(
         db,
+        "collisions-by-severity",
+        accept_encoding,
+        data,
         location=location,
         start_date=start_date,
         end_date=end_date
@@ -35,74 +115,96 @@ def collisions_by_severity(
 
 #/most-dangerous-addr @parameter -> addr_type intersection, block, mid
 @router.get("/most-dangerous-intersections", response_model=None)
+@with_data_endpoint("most-dangerous-intersections")
 def most_dangerous_intersections(
     metric: str = Query("harm", pattern="^(harm|count)$"),
     start_date: Optional[datetime] = Query(None),
     end_date: Optional[datetime] = Query(None),
     limit: int = Query(20, ge=1, le=100),
-    db: Session = Depends(get_db),
-) -> dict:
+    harm_profile: Optional[str] = Query(None, description="Harm score profile for metric=harm"),
+    data: str = DATA_MODE,
+    accept_encoding: Optional[str] = Header(None, include_in_schema=False),
+    db: Session = Depends(get_analytics_db),
+) -> Response:
     """
     Returns a Vega spec (JSON) with data embedded for most dangerous intersections.
     """
 
-    return build_horizontal_bar_graph_spec(
+    return cached_viz(
         db,
-        address_type_name="Intersection",
+        "most-dangerous-intersections",
+        accept_encoding,
+        data,
         metric=metric,
         limit=limit,
         start_date=start_date,
         end_date=end_date,
+        harm_profile=harm_profile,
     )
 
 
 @router.get("/most-dangerous-blocks", response_model=None)
+@with_data_endpoint("most-dangerous-blocks")
 def most_dangerous_blocks(
     metric: str = Query("harm", pattern="^(harm|count)$"),
     start_date: Optional[datetime] = Query(None),
     end_date: Optional[datetime] = Query(None),
     limit: int = Query(20, ge=1, le=100),
-    db: Session = Depends(get_db),
-) -> dict:
+    harm_profile: Optional[str] = Query(None, description="Harm score profile for metric=harm"),
+    data: str = DATA_MODE,
+    accept_encoding: Optional[str] = Header(None, include_in_schema=False),
+    db: Session = Depends(get_analytics_db),
+) -> Response:
     """
     Returns a Vega spec (JSON) with data embedded for most dangerous blocks.
     """
 
-    return build_horizontal_bar_graph_spec(
+    return cached_viz(
         db,
-        address_type_name="Block",
+        "most-dangerous-blocks",
+        accept_encoding,
+        data,
         metric=metric,
         limit=limit,
         start_date=start_date,
         end_date=end_date,
+        harm_profile=harm_profile,
     )
 
 
 # Need to address NULL locations to make this work
 @router.get("/most-dangerous-alleys", response_model=None)
+@with_data_endpoint("most-dangerous-alleys")
 def most_dangerous_alleys(
     metric: str = Query("harm", pattern="^(harm|count)$"),
     start_date: Optional[datetime] = Query(None),
     end_date: Optional[datetime] = Query(None),
     limit: int = Query(20, ge=1, le=100),
-    db: Session = Depends(get_db),
-) -> dict:
+    harm_profile: Optional[str] = Query(None, description="Harm score profile for metric=harm"),
+    data: str = DATA_MODE,
+    accept_encoding: Optional[str] = Header(None, include_in_schema=False),
+    db: Session = Depends(get_analytics_db),
+) -> Response:
     """
     Returns a Vega spec (JSON) with data embedded for most dangerous alleys.
     """
 
-    return build_horizontal_bar_graph_spec(
+    return cached_viz(
         db,
-        address_type_name="Alley",
+        "most-dangerous-alleys",
+        accept_encoding,
+        data,
         metric=metric,
         limit=limit,
         start_date=start_date,
         end_date=end_date,
+        harm_profile=harm_profile,
     )
 
 # Consolidate /most-dangerous-... into one endpoint, use parameter for determining ADDR_TYPE (INTERSECTION, ALLEY, BLOCK)
 
 @router.get("/collision-metrics-over-time", response_model=None)
+@with_data_endpoint("collision-metrics-over-time")
 def collision_metrics_over_time(
     metric: str = Query("collisions", pattern="^(collisions|injuries|serious_injuries|fatalities|harm)$"),
     interval: str = Query("month", pattern="^(day|week|month)$"),
@@ -110,47 +212,281 @@ def collision_metrics_over_time(
     location: Optional[str] = Query(None),
     start_date: Optional[datetime] = Query(None),
     end_date: Optional[datetime] = Query(None),
-    db: Session = Depends(get_db),
-) -> dict:
+    harm_profile: Optional[str] = Query(None, description="Harm score profile for metric=harm"),
+    max_points: Optional[int] = Query(None, ge=3, le=10000, description="Downsample each series to at most this many points (LTTB)"),
+    data: str = DATA_MODE,
+    accept_encoding: Optional[str] = Header(None, include_in_schema=False),
+    db: Session = Depends(get_analytics_db),
+) -> Response:
     """
     Returns a Vega spec line chart with data embedded for metric over time intervals.
+    Defaults to the last 5 years of data when no start date is given.
+    With `max_points`, long series are downsampled keeping peaks and dips.
     """
-    if start_date is None:
-        max_dt = db.query(func.max(TrafficCollision.occurred_at)).scalar()
-        if max_dt is not None:
-            start_date = max_dt - timedelta(days=1825)
-            if end_date is None:
-                end_date = max_dt
-    
-    return build_line_chart_spec(
+
+    return cached_viz(
         db,
+        "collision-metrics-over-time",
+        accept_encoding,
+        data,
         metric=metric,
         interval=interval,
         series=series,
         location=location,
         start_date=start_date,
         end_date=end_date,
+        harm_profile=harm_profile,
+        max_points=max_points,
     )
 
 @router.get("/collision-heatmap", response_model=None)
+@with_data_endpoint("collision-heatmap")
 def collision_heatmap(
     metric: str = Query("count", pattern="^(count|harm)$"),
     start_date: Optional[datetime] = Query(None),
     end_date: Optional[datetime] = Query(None),
     severity_id: Optional[int] = Query(None),
-    db: Session = Depends(get_db)
-) -> dict:
+    harm_profile: Optional[str] = Query(None, description="Harm score profile for metric=harm"),
+    data: str = DATA_MODE,
+    accept_encoding: Optional[str] = Header(None, include_in_schema=False),
+    db: Session = Depends(get_analytics_db),
+) -> Response:
     """
     Returns a Vega spec heatmap with data embedded for collisions by count or harm.
     """
 
-    return build_collision_heatmap_spec(
+    return cached_viz(
         db,
+        "collision-heatmap",
+        accept_encoding,
+        data,
         metric = metric,
         start_date = start_date,
         end_date = end_date,
-        severity_id=severity_id
+        severity_id=severity_id,
+        harm_profile=harm_profile,
+    )
+
+
+@router.get("/hotspots", response_model=None)
+@with_data_endpoint("hotspots")
+def hotspots(
+    eps_m: float = Query(150.0, ge=10, le=1000, description="Neighborhood radius in meters"),
+    min_collisions: int = Query(25, ge=2, le=10000, description="Collisions within eps_m that make a core location"),
+    metric: str = Query("harm", pattern="^(harm|count)$"),
+    limit: int = Query(50, ge=1, le=500),
+    start_date: Optional[datetime] = Query(None),
+    end_date: Optional[datetime] = Query(None),
+    severity_id: Optional[int] = Query(None),
+    harm_profile: Optional[str] = Query(None, description="Harm score profile for metric=harm"),
+    data: str = DATA_MODE,
+    accept_encoding: Optional[str] = Header(None, include_in_schema=False),
+    db: Session = Depends(get_analytics_db),
+) -> Response:
+    """
+    Returns a Vega spec map of density-based collision hotspots (DBSCAN over collision coordinates).
+    The ranked cluster list is under `usermeta.clusters`. Defaults to the last year of data.
+    """
+
+    return cached_viz(
+        db,
+        "hotspots",
+        accept_encoding,
+        data,
+        eps_m=eps_m,
+        min_collisions=min_collisions,
+        metric=metric,
+        limit=limit,
+        start_date=start_date,
+        end_date=end_date,
+        severity_id=severity_id,
+        harm_profile=harm_profile,
     )
 
 
-    
\ No newline at end of file
+@router.get("/time-matrix", response_model=None)
+@with_data_endpoint("time-matrix")
+def time_matrix(
+    matrix: str = Query("hour-of-week", pattern="^(hour-of-week|month-by-hour)$"),
+    metric: str = Query("collisions", pattern="^(collisions|harm)$"),
+    severity_id: Optional[int] = Query(None),
+    location: Optional[str] = Query(None),
+    start_date: Optional[datetime] = Query(None),
+    end_date: Optional[datetime] = Query(None),
+    harm_profile: Optional[str] = Query(None, description="Harm score profile for metric=harm"),
+    data: str = DATA_MODE,
+    accept_encoding: Optional[str] = Header(None, include_in_schema=False),
+    db: Session = Depends(get_analytics_db),
+) -> Response:
+    """
+    Returns a Vega spec heatmap of collisions by Seattle local hour against day of week or month.
+    The raw matrix is served by `/collisions/stats/time-matrix`.
+    """
+
+    return cached_viz(
+        db,
+        "time-matrix",
+        accept_encoding,
+        data,
+        matrix=matrix,
+        metric=metric,
+        severity_id=severity_id,
+        location=location,
+        start_date=start_date,
+        end_date=end_date,
+        harm_profile=harm_profile,
+    )
+
+
+@cache
+def panel_params_model(name: str) -> type[BaseModel]:
+    """
+    Pydantic model of a viz endpoint's query parameters, with the same defaults and constraints,
+    so dashboard panels are validated like the query string of /viz/<name>.
+    """
+    parameters = inspect.signature(VIZ_ENDPOINTS[name]).parameters.values()
+    fields = {p.name: (p.annotation, p.default) for p in parameters if p.name not in _NOT_VIZ_PARAMS}
+    return create_model(f"Panel_{name.replace('-', '_')}", __config__=ConfigDict(extra="forbid"), **fields)
+
+
+def panel_params(panel: DashboardPanelIn, filters: dict) -> dict:
+    """
+    The parameters cached_viz would get for the panel's /viz request, shared filters included.
+    """
+    model = panel_params_model(panel.viz)
+    shared = {key: value for key, value in filters.items() if key in model.model_fields}
+    return model.model_validate({**shared, **panel.params}).model_dump()
+
+
+def _dashboard_session(route: str) -> Session:
+    # A panel computes under the limits of its own /viz route, as the single request would
+    db = analytics_replicas.session()
+    db.info["admission_route"] = route
+    db.info["statement_timeout_ms"] = ROUTE_LIMITS.get(route, DEFAULT_LIMITS).statement_timeout_ms
+    return db
+
+
+def _panel_error(exc: Exception) -> Optional[tuple[int, str]]:
+    from app.harm import HarmProfileNotFound
+
+    if isinstance(exc, HarmProfileNotFound):
+        return 404, f"Harm profile {exc.args[0]!r} not found"
+    if isinstance(exc, HTTPException):
+        # Shed by admission control
+        return exc.status_code, exc.detail
+    return guardrail_error(exc)
+
+
+def _cached_panel(index: int, name: str, params: dict, compute: Callable[[], bytes]) -> tuple[int, object]:
+    # (index, cached blob) or (index, (status, detail)) for errors a single /viz request would answer with 4xx/503
+    try:
+        return index, result_cache.get_or_compute(name, params, compute)
+    except Exception as exc:
+        error = _panel_error(exc)
+        if error is None:
+            raise
+        return index, error
+
+
+def _panel_job(index: int, name: str, params: dict) -> Callable[[], list]:
+    from app.viz_specs import build_encoded
+
+    def job():
+        with _dashboard_session(f"/viz/{name}") as db:
+            return [_cached_panel(index, name, params, admitted(db, lambda: build_encoded(db, name, **params)))]
+    return job
+
+
+def _ranked_bar_graphs_job(group: list[tuple[int, str, dict]]) -> Callable[[], list]:
+    # Bar charts that differ only in address type and limit, computed by one ranked query
+    from app.viz_specs import build_ranked_bar_graph_specs
+
+    def job():
+        filters = {key: group[0][2][key] for key in ("metric", "start_date", "end_date", "harm_profile")}
+        with _dashboard_session("/viz/dashboard") as db:
+            try:
+                with admission.slot("/viz/dashboard"):
+                    specs = build_ranked_bar_graph_specs(
+                        db, limits={name: params["limit"] for _, name, params in group}, **filters
+                    )
+            except Exception as exc:
+                error = _panel_error(exc)
+                if error is None:
+                    raise
+                return [(index, error) for index, _, _ in group]
+            return [
+                _cached_panel(index, name, params, lambda spec=specs[name]: encode_json_variants(spec))
+                for index, name, params in group
+            ]
+    return job
+
+
+def plan_dashboard(panels: list[tuple[str, dict]]) -> list[Callable[[], list]]:
+    """
+    Split the panels into jobs that can run concurrently: uncached most-dangerous bar charts
+    with the same filters share one job (and one query), every other panel is a job of its own.
+    """
+    from app.viz_specs import RANKED_BAR_GRAPHS
+
+    jobs = []
+    groups: dict[str, list[tuple[int, str, dict]]] = {}
+    for index, (name, params) in enumerate(panels):
+        if name in RANKED_BAR_GRAPHS and not result_cache.contains(name, params):
+            key = json.dumps({k: v for k, v in params.items() if k != "limit"}, sort_keys=True, default=str)
+            group = groups.setdefault(key, [])
+            if all(name != other for _, other, _ in group):
+                group.append((index, name, params))
+                continue
+        jobs.append(_panel_job(index, name, params))
+    for group in groups.values():
+        if len(group) > 1:
+            jobs.append(_ranked_bar_graphs_job(group))
+        else:
+            jobs.append(_panel_job(*group[0]))
+    return jobs
+
+
+@router.post("/dashboard", response_model=None)
+async def dashboard(body: DashboardIn) -> Response:
+    """
+    Returns several viz specs in one response, computed concurrently on separate connections
+    (up to DASHBOARD_MAX_PARALLEL at once), so the request takes about as long as its slowest panel.
+    Panels go through the same cache as /viz/<name>; most-dangerous bar charts with the same filters
+    come from one ranked query. Result: {"panels": [{"viz", "id", "spec"}]} in request order,
+    a panel that failed has "status" and "detail" instead of "spec".
+    """
+    panels = []
+    for index, panel in enumerate(body.panels):
+        if panel.viz not in VIZ_ENDPOINTS:
+            raise HTTPException(status_code=422, detail=f"Panel {index}: unknown viz {panel.viz!r}")
+        try:
+            panels.append((panel.viz, panel_params(panel, body.filters)))
+        except ValidationError as exc:
+            raise HTTPException(
+                status_code=422,
+                detail=jsonable_encoder({"panel": index, "errors": exc.errors(include_url=False)}),
+            )
+
+    limiter = asyncio.Semaphore(DASHBOARD_MAX_PARALLEL)
+
+    async def run(job):
+        async with limiter:
+            return await run_in_threadpool(job)
+
+    results: list[object] = [None] * len(panels)
+    for finished in await asyncio.gather(*(run(job) for job in plan_dashboard(panels))):
+        for index, result in finished:
+            results[index] = result
+
+    # Cached specs are spliced in as stored, without decoding them
+    parts = []
+    for panel, result in zip(body.panels, results):
+        head = {"viz": panel.viz, "id": panel.id}
+        if isinstance(result, tuple):
+            status_code, detail = result
+            head.update(status=status_code, detail=detail)
+            parts.append(json.dumps(head, separators=(",", ":")).encode("utf-8"))
+        else:
+            head = json.dumps(head, separators=(",", ":")).encode("utf-8")
+            parts.append(head[:-1] + b',"spec":' + decode_variants(result)["identity"] + b"}")
+    return Response(b'{"panels":[' + b",".join(parts) + b"]}", media_type="application/json")
@@ -0,0 +1,59 @@
+import argparse
+from pathlib import Path
+
+from app.benchmarks.results import compare_results, save_results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.benchmarks", description="SEA-RoadInfo benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    generate = commands.add_parser("generate", help="Bulk load synthetic collisions into DATABASE_URL")
+    generate.add_argument("--rows", type=int, default=100_000, help="10k to 10M rows")
+    generate.add_argument("--seed", type=int, default=42)
+
+    imports = commands.add_parser("import", help="Import throughput against a fake ArcGIS source")
+    imports.add_argument("--rows", type=int, default=10_000)
+    imports.add_argument("--page-size", type=int, default=2000)
+    imports.add_argument("--seed", type=int, default=42)
+    imports.add_argument("--keep", action="store_true", help="Keep the imported rows")
+
+    api = commands.add_parser("api", help="Endpoint latency against a running server")
+    api.add_argument("--base-url", default="http://127.0.0.1:8000")
+    api.add_argument("--requests", type=int, default=50, help="Requests per scenario per concurrency level")
+    api.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    api.add_argument("--scenario", action="append", help="Only run scenarios with these names")
+
+    compare = commands.add_parser("compare", help="Compare two saved result files")
+    compare.add_argument("baseline", type=Path)
+    compare.add_argument("candidate", type=Path)
+
+    args = parser.parse_args()
+
+    if args.command == "generate":
+        from app.benchmarks.synthetic import seed_database
+        from app.core.database import SessionLocal
+        with SessionLocal() as db:
+            print(f"Loaded {seed_database(db, args.rows, seed=args.seed)} synthetic collisions")
+
+    elif args.command == "import":
+        from app.benchmarks.import_bench import run_import_benchmark
+        results = run_import_benchmark(args.rows, page_size=args.page_size, seed=args.seed, keep=args.keep)
+        print(results)
+        print(f"Saved {save_results('import', results, vars(args))}")
+
+    elif args.command == "api":
+        from app.benchmarks.api_bench import SCENARIOS, run_api_benchmark
+        scenarios = [s for s in SCENARIOS if not args.scenario or s[0] in args.scenario]
+        results = run_api_benchmark(args.base_url, args.requests, tuple(args.concurrency), scenarios)
+        for name, scenario in results.items():
+            worst = scenario[f"c{max(args.concurrency)}"]
+            print(f"{name:<28} cold {scenario['cold_ms']:>8} ms   p50 {worst['p50_ms']:>8} ms   p99 {worst['p99_ms']:>8} ms")
+        print(f"Saved {save_results('api', results, vars(args))}")
+
+    elif args.command == "compare":
+        print(compare_results(args.baseline, args.candidate))
+
+
+if __name__ == "__main__":
+    main()
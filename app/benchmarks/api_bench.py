@@ -0,0 +1,70 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+from app.benchmarks.results import latency_summary
+
+# (scenario name, path) covering each endpoint family with varied filters
+SCENARIOS = [
+    ("collisions-list", "/collisions/?limit=100"),
+    ("collisions-list-filtered", "/collisions/?limit=100&severity=Injury&start_date=2015-01-01T00:00:00"),
+    ("collisions-list-deep-page", "/collisions/?limit=100&offset=50000"),
+    ("collisions-detail", "/collisions/{id}"),
+    ("stats-summary", "/collisions/stats/"),
+    ("stats-summary-filtered", "/collisions/stats/?severity=Injury&start_date=2018-01-01T00:00:00"),
+    ("stats-by-severity", "/collisions/stats/by-severity"),
+    ("stats-cube", "/collisions/stats/cube?group_by=severity&group_by=weather&group_by=light"),
+    ("viz-by-severity", "/viz/collisions-by-severity"),
+    ("viz-intersections-harm", "/viz/most-dangerous-intersections?metric=harm"),
+    ("viz-blocks-count-2020", "/viz/most-dangerous-blocks?metric=count&start_date=2020-01-01T00:00:00"),
+    ("viz-line-month", "/viz/collision-metrics-over-time"),
+    ("viz-line-day-severity", "/viz/collision-metrics-over-time?interval=day&series=severity"),
+    ("viz-heatmap-count", "/viz/collision-heatmap?metric=count"),
+    ("viz-heatmap-harm-2020", "/viz/collision-heatmap?metric=harm&start_date=2020-01-01T00:00:00"),
+]
+
+
+def _timed_get(client: httpx.Client, path: str) -> float:
+    started = time.perf_counter()
+    response = client.get(path)
+    elapsed = time.perf_counter() - started
+    response.raise_for_status()
+    return elapsed
+
+
+def _run_concurrent(base_url: str, path: str, requests: int, concurrency: int) -> dict:
+    def worker(count: int) -> list[float]:
+        with httpx.Client(base_url=base_url, timeout=120) as client:
+            return [_timed_get(client, path) for _ in range(count)]
+
+    # Spread the requests over the workers
+    shares = [requests // concurrency + (1 if i < requests % concurrency else 0) for i in range(concurrency)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        samples = [s for result in pool.map(worker, shares) for s in result]
+    return latency_summary(samples, time.perf_counter() - started)
+
+
+def run_api_benchmark(
+    base_url: str = "http://127.0.0.1:8000",
+    requests: int = 50,
+    concurrency_levels: tuple[int, ...] = (1, 8, 32),
+    scenarios: list[tuple[str, str]] = SCENARIOS,
+) -> dict:
+    """
+    Measure p50/p90/p99 latency and throughput for each scenario at each concurrency level.
+    The first (cold) request of each scenario is reported separately.
+    """
+    with httpx.Client(base_url=base_url, timeout=120) as client:
+        first = client.get("/collisions/?limit=1").json()["items"]
+        collision_id = first[0]["id"] if first else 1
+
+        results = {}
+        for name, path in scenarios:
+            path = path.format(id=collision_id)
+            scenario = {"path": path, "cold_ms": round(_timed_get(client, path) * 1000, 2)}
+            for concurrency in concurrency_levels:
+                scenario[f"c{concurrency}"] = _run_concurrent(base_url, path, requests, concurrency)
+            results[name] = scenario
+    return results
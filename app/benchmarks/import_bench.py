@@ -0,0 +1,51 @@
+import time
+
+from sqlalchemy import delete, func
+
+from app.benchmarks.synthetic import FakeArcGISSource
+from app.core.database import SessionLocal
+from app.data_import import seattle_collisions
+from app.models import TrafficCollision
+
+
+def run_import_benchmark(rows: int = 10_000, page_size: int = seattle_collisions.BATCH_SIZE, seed: int = 42, keep: bool = False) -> dict:
+    """
+    Time `import_collisions` against a fake ArcGIS source of `rows` synthetic records.
+    Inserted rows are removed afterwards unless `keep` is set.
+    """
+    with SessionLocal() as db:
+        first_inc_key = (db.query(func.max(TrafficCollision.inc_key)).scalar() or 0) + 1
+
+    source = FakeArcGISSource(rows, page_size=page_size, seed=seed, first_inc_key=first_inc_key)
+
+    # Generation time is measured separately so it can be subtracted from the import
+    started = time.perf_counter()
+    for offset in range(0, rows, page_size):
+        source.fetch_page_bytes(offset)
+    generate_seconds = time.perf_counter() - started
+
+    original_batch_size = seattle_collisions.BATCH_SIZE
+    seattle_collisions.BATCH_SIZE = page_size
+    try:
+        started = time.perf_counter()
+        seattle_collisions.import_collisions(fetch_records=source.fetch_records)
+        total_seconds = time.perf_counter() - started
+    finally:
+        seattle_collisions.BATCH_SIZE = original_batch_size
+
+    with SessionLocal() as db:
+        imported = db.query(func.count(TrafficCollision.id)).filter(TrafficCollision.inc_key >= first_inc_key).scalar()
+        if not keep:
+            db.execute(delete(TrafficCollision).where(TrafficCollision.inc_key >= first_inc_key))
+            db.commit()
+
+    import_seconds = max(total_seconds - generate_seconds, 1e-9)
+    return {
+        "rows": rows,
+        "imported_rows": imported,
+        "page_size": page_size,
+        "generate_seconds": round(generate_seconds, 3),
+        "total_seconds": round(total_seconds, 3),
+        "import_seconds": round(import_seconds, 3),
+        "rows_per_second": round(imported / import_seconds, 1),
+    }
@@ -0,0 +1,94 @@
+import json
+import math
+import platform
+import subprocess
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+RESULTS_DIR = Path("bench_results")
+
+
+def percentile(samples: list[float], pct: float) -> Optional[float]:
+    """
+    Nearest-rank percentile of a list of samples.
+    """
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def latency_summary(samples: list[float], wall_seconds: Optional[float] = None) -> dict:
+    """
+    Summarize request latencies (seconds) as milliseconds.
+    """
+    summary = {
+        "requests": len(samples),
+        "p50_ms": round(percentile(samples, 50) * 1000, 2) if samples else None,
+        "p90_ms": round(percentile(samples, 90) * 1000, 2) if samples else None,
+        "p99_ms": round(percentile(samples, 99) * 1000, 2) if samples else None,
+        "max_ms": round(max(samples) * 1000, 2) if samples else None,
+    }
+    if wall_seconds:
+        summary["throughput_rps"] = round(len(samples) / wall_seconds, 1)
+    return summary
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save_results(kind: str, results: dict, params: dict) -> Path:
+    """
+    Write one benchmark run to `bench_results/<kind>-<timestamp>.json`.
+    """
+    RESULTS_DIR.mkdir(exist_ok=True)
+    started = datetime.now()
+    payload = {
+        "kind": kind,
+        "created_at": started.isoformat(timespec="seconds"),
+        "git_revision": _git_revision(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "params": params,
+        "results": results,
+    }
+    path = RESULTS_DIR / f"{kind}-{started:%Y%m%d-%H%M%S}.json"
+    path.write_text(json.dumps(payload, indent=2), encoding="utf-8")
+    return path
+
+
+def _flatten(results: dict, prefix: str = "") -> dict:
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)):
+            flat[name] = value
+    return flat
+
+
+def compare_results(baseline_path: Path, candidate_path: Path) -> str:
+    """
+    Side-by-side comparison of the numeric results of two runs.
+    """
+    baseline = _flatten(json.loads(baseline_path.read_text(encoding="utf-8"))["results"])
+    candidate = _flatten(json.loads(candidate_path.read_text(encoding="utf-8"))["results"])
+
+    lines = [f"{'metric':<60} {'baseline':>12} {'candidate':>12} {'change':>9}"]
+    for name in sorted(set(baseline) | set(candidate)):
+        before, after = baseline.get(name), candidate.get(name)
+        if before and after is not None:
+            change = f"{(after - before) / before * 100:+.1f}%"
+        else:
+            change = ""
+        lines.append(f"{name:<60} {str(before):>12} {str(after):>12} {change:>9}")
+    return "\n".join(lines)
@@ -0,0 +1,377 @@
+import io
+import json
+import random
+from itertools import accumulate
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Iterator, Optional
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.conditions import rebuild_condition_stats
+from app.data_import.seattle_collisions import CollisionRecord, iter_records, local_time_parts, to_record
+from app.data_import.streaming import read_chunks
+from app.harm import score_harm
+from app.intersections import refresh_intersections
+from app.models import TrafficCollision, Severity, CollisionType, SDOTCollisionType, JunctionType, LightCondition, WeatherCondition, RoadCondition, AddressType
+
+SEATTLE_TZ = ZoneInfo("America/Los_Angeles")
+
+# Seattle city limits, roughly
+LON_MIN, LON_MAX = -122.44, -122.235
+LAT_MIN, LAT_MAX = 47.495, 47.735
+
+FIRST_DATE = datetime(2004, 1, 1)
+LAST_DATE = datetime(2025, 12, 31)
+
+# (code, desc, weight, injuries range, serious injuries, fatalities), weights follow the SDOT layer
+SEVERITIES = [
+    ("1", "Property Damage Only Collision", 680, (0, 0), 0, 0),
+    ("2", "Injury Collision", 275, (1, 3), 0, 0),
+    ("2b", "Serious Injury Collision", 15, (0, 2), 1, 0),
+    ("3", "Fatality Collision", 2, (0, 1), 0, 1),
+    ("0", "Unknown", 28, (0, 0), 0, 0),
+]
+COLLISION_TYPES = [
+    ("Parked Car", 22), ("Angles", 17), ("Rear Ended", 17), ("Other", 12), ("Sideswipe", 9),
+    ("Left Turn", 7), ("Pedestrian", 3.5), ("Cycles", 2.7), ("Right Turn", 1.4), ("Head On", 1), (None, 7.4),
+]
+SDOT_COLLISION_TYPES = [
+    ("11", "MOTOR VEHICLE STRUCK MOTOR VEHICLE, FRONT END AT ANGLE", 30),
+    ("14", "MOTOR VEHICLE STRUCK MOTOR VEHICLE, REAR END", 25),
+    ("16", "MOTOR VEHICLE STRUCK MOTOR VEHICLE, LEFT SIDE SIDESWIPE", 6),
+    ("28", "MOTOR VEHICLE RAN OFF ROAD - HIT FIXED OBJECT", 7),
+    ("24", "MOTOR VEHICLE STRUCK PEDESTRIAN", 4),
+    ("48", "MOTOR VEHICLE STRUCK PEDALCYCLIST, FRONT END AT ANGLE", 3),
+    ("13", "MOTOR VEHICLE STRUCK MOTOR VEHICLE, LEFT SIDE AT ANGLE", 10),
+    ("0", "NOT ENOUGH INFORMATION / NOT APPLICABLE", 15),
+]
+JUNCTION_TYPES = [
+    ("Mid-Block (not related to intersection)", 46), ("At Intersection (intersection related)", 32),
+    ("Mid-Block (but intersection related)", 12), ("Driveway Junction", 5),
+    ("At Intersection (but not related to intersection)", 1), ("Ramp Junction", 0.1), (None, 3.9),
+]
+LIGHT_CONDITIONS = [
+    ("Daylight", 61), ("Dark - Street Lights On", 26), ("Unknown", 7), ("Dusk", 3),
+    ("Dawn", 1.3), ("Dark - No Street Lights", 0.8), ("Dark - Street Lights Off", 0.6), (None, 0.3),
+]
+WEATHER_CONDITIONS = [
+    ("Clear", 58), ("Raining", 17), ("Overcast", 14), ("Unknown", 8), ("Snowing", 0.5),
+    ("Fog/Smog/Smoke", 0.3), ("Sleet/Hail/Freezing Rain", 0.1), (None, 2.1),
+]
+ROAD_CONDITIONS = [("Dry", 65), ("Wet", 25), ("Unknown", 8), ("Ice", 0.6), ("Snow/Slush", 0.5), (None, 0.9)]
+ADDRESS_TYPES = [("Block", 65), ("Intersection", 33), ("Alley", 0.4), (None, 1.6)]
+
+# Collisions by local hour of day, afternoon peak
+HOUR_WEIGHTS = [2, 1.5, 1.5, 1, 1, 1.5, 3, 5, 6, 5, 5, 5.5, 6, 6, 6.5, 7.5, 8, 8, 6.5, 5, 4, 3.5, 3, 2.5]
+
+# Records generated from one random seed
+GENERATOR_BLOCK = 1000
+
+STREETS = ["PINE", "PIKE", "UNION", "MADISON", "JACKSON", "YESLER", "MERCER", "DENNY", "MARKET", "LAKE CITY", "RAINIER", "AURORA", "HOLMAN", "GREENWOOD", "BROADWAY"]
+
+# ArcGIS field metadata, repeated on every page like the real service
+ARCGIS_FIELDS = [
+    {"name": name, "type": ftype, "alias": name}
+    for name, ftype in [
+        ("OBJECTID", "esriFieldTypeOID"), ("INCKEY", "esriFieldTypeInteger"), ("INTKEY", "esriFieldTypeInteger"),
+        ("LOCATION", "esriFieldTypeString"), ("ADDRTYPE", "esriFieldTypeString"), ("SEVERITYCODE", "esriFieldTypeString"),
+        ("SEVERITYDESC", "esriFieldTypeString"), ("COLLISIONTYPE", "esriFieldTypeString"), ("PERSONCOUNT", "esriFieldTypeInteger"),
+        ("PEDCOUNT", "esriFieldTypeInteger"), ("PEDCYLCOUNT", "esriFieldTypeInteger"), ("VEHCOUNT", "esriFieldTypeInteger"),
+        ("INJURIES", "esriFieldTypeInteger"), ("SERIOUSINJURIES", "esriFieldTypeInteger"), ("FATALITIES", "esriFieldTypeInteger"),
+        ("INCDATE", "esriFieldTypeDate"), ("INCDTTM", "esriFieldTypeString"), ("JUNCTIONTYPE", "esriFieldTypeString"),
+        ("SDOT_COLCODE", "esriFieldTypeString"), ("SDOT_COLDESC", "esriFieldTypeString"), ("WEATHER", "esriFieldTypeString"),
+        ("ROADCOND", "esriFieldTypeString"), ("LIGHTCOND", "esriFieldTypeString"),
+    ]
+]
+
+
+@dataclass
+class Intersection:
+    int_key: int
+    location: str
+    lon: float
+    lat: float
+    weight: float
+
+
+class SyntheticCollisions:
+    """
+    Deterministic generator of SDOT-like collision records.
+    Any slice of records can be regenerated on its own, so pages can be produced in any order.
+    """
+
+    def __init__(self, seed: int = 42, intersections: int = 12000, first_inc_key: int = 1):
+        self.seed = seed
+        self.first_inc_key = first_inc_key
+        rng = random.Random(seed)
+
+        # Fixed intersection pool with a heavy-tailed weight so some become hotspots
+        self.intersections = [
+            Intersection(
+                int_key=20000 + i,
+                location=f"{rng.randint(1, 99)}TH AVE AND {rng.choice(STREETS)} ST",
+                lon=rng.uniform(LON_MIN, LON_MAX),
+                lat=rng.uniform(LAT_MIN, LAT_MAX),
+                weight=rng.paretovariate(1.2),
+            )
+            for i in range(intersections)
+        ]
+        self._intersection_weights = list(accumulate(x.weight for x in self.intersections))
+        self._span_days = (LAST_DATE - FIRST_DATE).days
+
+    def attributes(self, start: int, count: int) -> Iterator[tuple[dict, dict]]:
+        """
+        Yield (attributes, geometry) pairs in ArcGIS field naming for records start..start+count.
+        """
+        # Records are generated in fixed blocks so a record never depends on where a page starts
+        end = start + count
+        for block_start in range(start - start % GENERATOR_BLOCK, end, GENERATOR_BLOCK):
+            rng = random.Random(self.seed * 1_000_003 + block_start)
+            for i in range(block_start, min(block_start + GENERATOR_BLOCK, end)):
+                record = self._record(rng, self.first_inc_key + i)
+                if i >= start:
+                    yield record
+
+    def _record(self, rng: random.Random, inc_key: int) -> tuple[dict, dict]:
+        code, desc, _, injury_range, serious, fatal = rng.choices(SEVERITIES, cum_weights=_SEVERITY_WEIGHTS)[0]
+        address_type = _pick(rng, ADDRESS_TYPES)
+
+        if address_type == "Intersection":
+            intersection = rng.choices(self.intersections, cum_weights=self._intersection_weights)[0]
+            int_key, location = intersection.int_key, intersection.location
+            lon = intersection.lon + rng.gauss(0, 0.00015)
+            lat = intersection.lat + rng.gauss(0, 0.0001)
+        else:
+            int_key = None
+            street = rng.choice(STREETS)
+            location = f"{street} ST BETWEEN {rng.randint(1, 99)}TH AVE AND {rng.randint(1, 99)}TH AVE" if address_type else None
+            lon = rng.uniform(LON_MIN, LON_MAX)
+            lat = rng.uniform(LAT_MIN, LAT_MAX)
+
+        day = FIRST_DATE + timedelta(days=rng.randrange(self._span_days))
+        hour = rng.choices(range(24), cum_weights=_HOUR_WEIGHTS)[0]
+        local = day.replace(hour=hour, minute=rng.randrange(60), second=rng.randrange(60))
+        incdate = int(day.replace(tzinfo=SEATTLE_TZ).astimezone(timezone.utc).timestamp() * 1000)
+        # About one in ten records only carries a date
+        if rng.random() < 0.1:
+            incdttm = f"{day.month}/{day.day}/{day.year}"
+        else:
+            hour12 = local.hour % 12 or 12
+            meridiem = "AM" if local.hour < 12 else "PM"
+            incdttm = f"{local.month}/{local.day}/{local.year} {hour12}:{local.minute:02d}:{local.second:02d} {meridiem}"
+
+        sdot_code, sdot_desc, _ = rng.choices(SDOT_COLLISION_TYPES, cum_weights=_SDOT_WEIGHTS)[0]
+        pedestrians = 1 if rng.random() < 0.035 else 0
+        cyclists = 1 if rng.random() < 0.027 else 0
+        vehicles = rng.choices([0, 1, 2, 3, 4], cum_weights=[2, 15, 90, 98, 100])[0]
+
+        attrs = {
+            "OBJECTID": inc_key,
+            "INCKEY": inc_key,
+            "INTKEY": int_key,
+            "LOCATION": location,
+            "ADDRTYPE": address_type,
+            "SEVERITYCODE": code,
+            "SEVERITYDESC": desc,
+            "COLLISIONTYPE": _pick(rng, COLLISION_TYPES),
+            "PERSONCOUNT": rng.choices([0, 1, 2, 3, 4, 5], cum_weights=[3, 15, 70, 87, 95, 100])[0],
+            "PEDCOUNT": pedestrians,
+            "PEDCYLCOUNT": cyclists,
+            "VEHCOUNT": vehicles,
+            "INJURIES": rng.randint(*injury_range),
+            "SERIOUSINJURIES": serious,
+            "FATALITIES": fatal,
+            "INCDATE": incdate,
+            "INCDTTM": incdttm,
+            "JUNCTIONTYPE": _pick(rng, JUNCTION_TYPES),
+            "SDOT_COLCODE": sdot_code,
+            "SDOT_COLDESC": sdot_desc,
+            "WEATHER": _pick(rng, WEATHER_CONDITIONS),
+            "ROADCOND": _pick(rng, ROAD_CONDITIONS),
+            "LIGHTCOND": _pick(rng, LIGHT_CONDITIONS),
+        }
+        return attrs, {"x": lon, "y": lat}
+
+
+def _pick(rng: random.Random, weighted: list[tuple]) -> Optional[str]:
+    return rng.choices(weighted, cum_weights=_CUM_WEIGHTS[id(weighted)])[0][0]
+
+
+# Cumulative weights computed once, rng.choices would rebuild them on every call otherwise
+_SEVERITY_WEIGHTS = list(accumulate(s[2] for s in SEVERITIES))
+_SDOT_WEIGHTS = list(accumulate(s[2] for s in SDOT_COLLISION_TYPES))
+_HOUR_WEIGHTS = list(accumulate(HOUR_WEIGHTS))
+_CUM_WEIGHTS = {
+    id(weighted): list(accumulate(w[-1] for w in weighted))
+    for weighted in (COLLISION_TYPES, JUNCTION_TYPES, LIGHT_CONDITIONS, WEATHER_CONDITIONS, ROAD_CONDITIONS, ADDRESS_TYPES)
+}
+
+
+class FakeArcGISSource:
+    """
+    Stand-in for the ArcGIS query endpoint serving synthetic pages.
+    `fetch_page` has the same contract as `fetch_collisions` and `fetch_records` the same as
+    `stream_collisions`, so it can be passed to `import_collisions`.
+    """
+
+    def __init__(self, total_rows: int, page_size: int = 2000, seed: int = 42, first_inc_key: int = 1):
+        self.total_rows = total_rows
+        self.page_size = page_size
+        self.generator = SyntheticCollisions(seed=seed, first_inc_key=first_inc_key)
+
+    def fetch_page(self, offset: int = 0) -> dict:
+        count = max(0, min(self.page_size, self.total_rows - offset))
+        features = [
+            {"attributes": attrs, "geometry": geometry}
+            for attrs, geometry in self.generator.attributes(offset, count)
+        ]
+        return {
+            "objectIdFieldName": "OBJECTID",
+            "geometryType": "esriGeometryPoint",
+            "spatialReference": {"wkid": 4326, "latestWkid": 4326},
+            "fields": ARCGIS_FIELDS,
+            "exceededTransferLimit": offset + count < self.total_rows,
+            "features": features,
+        }
+
+    def fetch_page_bytes(self, offset: int = 0) -> bytes:
+        """
+        Same page serialized like the HTTP response body.
+        """
+        return json.dumps(self.fetch_page(offset)).encode("utf-8")
+
+    def fetch_records(self, offset: int = 0) -> Iterator[CollisionRecord]:
+        """
+        Serialized page decoded through the streaming decoder, like a live response.
+        """
+        return iter_records(read_chunks(io.BytesIO(self.fetch_page_bytes(offset))))
+
+    # INCKEY range interface, same as ArcGISRangeSource in the parallel importer
+
+    def key_bounds(self) -> tuple[int, int, int]:
+        first = self.generator.first_inc_key
+        return first, first + self.total_rows - 1, self.total_rows
+
+    def count(self, lo: int, hi: int) -> int:
+        first = self.generator.first_inc_key
+        return max(0, min(hi, first + self.total_rows) - max(lo, first))
+
+    def distinct_values(self, fields: list[str]) -> list[dict]:
+        values = _DISTINCT_VALUES[tuple(fields)]
+        return [dict(zip(fields, value)) for value in values]
+
+    def fetch_range(self, lo: int, hi: int, after: Optional[int]) -> list[CollisionRecord]:
+        first = self.generator.first_inc_key
+        start_key = max(lo, first, after + 1 if after is not None else lo)
+        end_key = min(hi, first + self.total_rows, start_key + self.page_size)
+        count = max(0, end_key - start_key)
+        return [to_record(attrs, geometry) for attrs, geometry in self.generator.attributes(start_key - first, count)]
+
+
+# Values returned for ArcGIS returnDistinctValues queries
+_DISTINCT_VALUES = {
+    ("SEVERITYCODE", "SEVERITYDESC"): [s[:2] for s in SEVERITIES],
+    ("SDOT_COLCODE", "SDOT_COLDESC"): [s[:2] for s in SDOT_COLLISION_TYPES],
+    ("COLLISIONTYPE",): [v[:1] for v in COLLISION_TYPES],
+    ("JUNCTIONTYPE",): [v[:1] for v in JUNCTION_TYPES],
+    ("LIGHTCOND",): [v[:1] for v in LIGHT_CONDITIONS],
+    ("WEATHER",): [v[:1] for v in WEATHER_CONDITIONS],
+    ("ROADCOND",): [v[:1] for v in ROAD_CONDITIONS],
+    ("ADDRTYPE",): [v[:1] for v in ADDRESS_TYPES],
+}
+
+
+# Column order for COPY into traffic_collisions
+COPY_COLUMNS = [
+    "inc_key", "int_key", "location", "lon", "lat", "occurred_at",
+    "person_count", "ped_count", "pedcyl_count", "veh_count", "injuries", "serious_injuries", "fatalities",
+    "severity_id", "collision_type_id", "sdot_collision_type_id", "junction_type_id",
+    "light_condition_id", "weather_condition_id", "road_condition_id", "address_type_id",
+    "local_hour", "local_dow", "local_month",
+]
+
+LOOKUPS = [
+    # (model, lookup rows)
+    (Severity, [{"code": s[0], "desc": s[1]} for s in SEVERITIES]),
+    (SDOTCollisionType, [{"code": s[0], "desc": s[1]} for s in SDOT_COLLISION_TYPES]),
+    (CollisionType, [{"name": v[0]} for v in COLLISION_TYPES if v[0]]),
+    (JunctionType, [{"name": v[0]} for v in JUNCTION_TYPES if v[0]]),
+    (LightCondition, [{"name": v[0]} for v in LIGHT_CONDITIONS if v[0]]),
+    (WeatherCondition, [{"name": v[0]} for v in WEATHER_CONDITIONS if v[0]]),
+    (RoadCondition, [{"name": v[0]} for v in ROAD_CONDITIONS if v[0]]),
+    (AddressType, [{"name": v[0]} for v in ADDRESS_TYPES if v[0]]),
+]
+
+
+def _ensure_lookups(db: Session) -> dict:
+    """
+    Create every synthetic lookup value and return {model: {key: id}}.
+    """
+    ids = {}
+    for model, values in LOOKUPS:
+        ids[model] = {}
+        for value in values:
+            # Match on code like the importer does, descriptions may differ
+            key = value.get("code", value.get("name"))
+            if "code" in value:
+                row = db.query(model).filter_by(code=key).first()
+            else:
+                row = db.query(model).filter_by(name=key).first()
+            if row is None:
+                row = model(**value)
+                db.add(row)
+                db.flush()
+            ids[model][key] = row.id
+    db.commit()
+    return ids
+
+
+def _to_row(attrs: dict, geometry: dict, ids: dict) -> tuple:
+    if " " in attrs["INCDTTM"]:
+        local = datetime.strptime(attrs["INCDTTM"], "%m/%d/%Y %I:%M:%S %p").replace(tzinfo=SEATTLE_TZ)
+        occurred_at = local.astimezone(timezone.utc)
+    else:
+        occurred_at = datetime.fromtimestamp(attrs["INCDATE"] / 1000, tz=timezone.utc)
+
+    return (
+        attrs["INCKEY"], attrs["INTKEY"], attrs["LOCATION"], geometry["x"], geometry["y"], occurred_at,
+        attrs["PERSONCOUNT"], attrs["PEDCOUNT"], attrs["PEDCYLCOUNT"], attrs["VEHCOUNT"],
+        attrs["INJURIES"], attrs["SERIOUSINJURIES"], attrs["FATALITIES"],
+        ids[Severity].get(attrs["SEVERITYCODE"]),
+        ids[CollisionType].get(attrs["COLLISIONTYPE"]),
+        ids[SDOTCollisionType].get(attrs["SDOT_COLCODE"]),
+        ids[JunctionType].get(attrs["JUNCTIONTYPE"]),
+        ids[LightCondition].get(attrs["LIGHTCOND"]),
+        ids[WeatherCondition].get(attrs["WEATHER"]),
+        ids[RoadCondition].get(attrs["ROADCOND"]),
+        ids[AddressType].get(attrs["ADDRTYPE"]),
+        *local_time_parts(occurred_at).values(),
+    )
+
+
+def seed_database(db: Session, rows: int, seed: int = 42, chunk_size: int = 50_000) -> int:
+    """
+    Bulk load `rows` synthetic collisions with COPY, continuing after the highest existing inc_key.
+    Fast enough for 10M-row benchmark databases. Returns the number of rows loaded.
+    """
+    ids = _ensure_lookups(db)
+    first_inc_key = (db.query(func.max(TrafficCollision.inc_key)).scalar() or 0) + 1
+    generator = SyntheticCollisions(seed=seed, first_inc_key=first_inc_key)
+
+    # psycopg 3 connection underneath the session
+    raw = db.connection().connection.driver_connection
+    columns = ", ".join(COPY_COLUMNS)
+    with raw.cursor() as cursor:
+        for start in range(0, rows, chunk_size):
+            count = min(chunk_size, rows - start)
+            with cursor.copy(f"COPY {TrafficCollision.__tablename__} ({columns}) FROM STDIN") as copy:
+                for attrs, geometry in generator.attributes(start, count):
+                    copy.write_row(_to_row(attrs, geometry, ids))
+    score_harm(db)
+    refresh_intersections(db)
+    rebuild_condition_stats(db)
+    db.commit()
+    return rows
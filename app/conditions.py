@@ -0,0 +1,181 @@
+import logging
+import time
+from itertools import combinations
+from typing import Iterable, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session, aliased
+
+from app.core.database import SessionLocal
+from app.core.logging import setup_logging
+from app.models import ConditionPairStats, JunctionType, LightCondition, RoadCondition, Severity, WeatherCondition
+
+logger = logging.getLogger(__name__)
+
+# Dimension name -> (traffic_collisions column, lookup model); pairs are stored in this order
+CONDITION_DIMENSIONS = {
+    "weather": ("weather_condition_id", WeatherCondition),
+    "light": ("light_condition_id", LightCondition),
+    "road": ("road_condition_id", RoadCondition),
+    "junction": ("junction_type_id", JunctionType),
+}
+CONDITION_PAIRS = list(combinations(CONDITION_DIMENSIONS, 2))
+
+# Severity codes counted by severe_rate (serious injury, fatality)
+SEVERE_CODES = ("2b", "3")
+
+_PAIR_VALUES = ",\n            ".join(
+    f"('{a}', t.{CONDITION_DIMENSIONS[a][0]}, '{b}', t.{CONDITION_DIMENSIONS[b][0]})" for a, b in CONDITION_PAIRS
+)
+
+# Adds :sign times the contribution of the selected collisions ({where}) to every pair table.
+# Rows are written in key order so concurrent importers lock them in the same order.
+_DELTA_SQL = f"""
+INSERT INTO condition_pair_stats AS s (dim_a, dim_b, a_id, b_id, severity_id, collisions, injuries, serious_injuries, fatalities, harm)
+SELECT
+    p.dim_a, p.dim_b, coalesce(p.a_id, 0), coalesce(p.b_id, 0), coalesce(t.severity_id, 0),
+    :sign * count(*),
+    :sign * coalesce(sum(t.injuries), 0),
+    :sign * coalesce(sum(t.serious_injuries), 0),
+    :sign * coalesce(sum(t.fatalities), 0),
+    :sign * coalesce(sum(t.harm), 0)
+FROM traffic_collisions t
+CROSS JOIN LATERAL (VALUES
+            {_PAIR_VALUES}
+) AS p(dim_a, a_id, dim_b, b_id)
+WHERE {{where}}
+GROUP BY 1, 2, 3, 4, 5
+ORDER BY 1, 2, 3, 4, 5
+ON CONFLICT (dim_a, dim_b, a_id, b_id, severity_id) DO UPDATE SET
+    collisions = s.collisions + EXCLUDED.collisions,
+    injuries = s.injuries + EXCLUDED.injuries,
+    serious_injuries = s.serious_injuries + EXCLUDED.serious_injuries,
+    fatalities = s.fatalities + EXCLUDED.fatalities,
+    harm = s.harm + EXCLUDED.harm
+"""
+
+
+def apply_condition_deltas(db: Session, inc_keys: Iterable[int], sign: int) -> None:
+    """
+    Add (sign=1) or remove (sign=-1) the given collisions' contributions to the pair tables.
+    Importers remove the stored version of a changed row before overwriting it and add the
+    written version afterwards, in the same transaction. Does not commit.
+    """
+    inc_keys = list(inc_keys)
+    if inc_keys:
+        db.execute(text(_DELTA_SQL.format(where="t.inc_key = ANY(:keys)")), {"keys": inc_keys, "sign": sign})
+
+
+def rebuild_condition_stats(db: Session) -> int:
+    """
+    Recompute every pair table from traffic_collisions. Returns the number of cells. Does not commit.
+    """
+    db.execute(text("DELETE FROM condition_pair_stats"))
+    return db.execute(text(_DELTA_SQL.format(where="true")), {"sign": 1}).rowcount
+
+
+def rebuild_if_empty(db: Session) -> Optional[int]:
+    """
+    Build the pair tables for a database whose collisions were loaded before they existed.
+    """
+    missing = db.execute(text(
+        "SELECT NOT EXISTS (SELECT 1 FROM condition_pair_stats) AND EXISTS (SELECT 1 FROM traffic_collisions)"
+    )).scalar()
+    if not missing:
+        return None
+    cells = rebuild_condition_stats(db)
+    db.commit()
+    return cells
+
+
+def condition_crosstab(
+    db: Session,
+    row: str,
+    column: str,
+    severity_id: Optional[int] = None,
+    row_value: Optional[str] = None,
+    column_value: Optional[str] = None,
+) -> dict:
+    """
+    Contingency table of two condition dimensions with counts, injuries, harm and rates per combination.
+    One read of the precomputed pair table (primary key prefix), lookup names joined in.
+    `lift` is observed / expected collisions if the two conditions were independent.
+    """
+    swapped = list(CONDITION_DIMENSIONS).index(row) > list(CONDITION_DIMENSIONS).index(column)
+    dim_a, dim_b = (column, row) if swapped else (row, column)
+    LookupA = aliased(CONDITION_DIMENSIONS[dim_a][1])
+    LookupB = aliased(CONDITION_DIMENSIONS[dim_b][1])
+
+    query = (
+        db.query(ConditionPairStats, LookupA.name, LookupB.name, Severity.code)
+        .outerjoin(LookupA, LookupA.id == ConditionPairStats.a_id)
+        .outerjoin(LookupB, LookupB.id == ConditionPairStats.b_id)
+        .outerjoin(Severity, Severity.id == ConditionPairStats.severity_id)
+        .filter(
+            ConditionPairStats.dim_a == dim_a,
+            ConditionPairStats.dim_b == dim_b,
+            ConditionPairStats.collisions > 0,
+        )
+    )
+    if severity_id:
+        query = query.filter(ConditionPairStats.severity_id == severity_id)
+
+    cells: dict[tuple, dict] = {}
+    for stats, name_a, name_b, severity_code in query.all():
+        row_name, column_name = (name_b, name_a) if swapped else (name_a, name_b)
+        key = (row_name or "None", column_name or "None")
+        cell = cells.setdefault(key, {
+            "row": key[0], "column": key[1],
+            "collisions": 0, "injuries": 0, "serious_injuries": 0, "fatalities": 0, "harm": 0,
+            "severity": {},
+        })
+        for measure in ("collisions", "injuries", "serious_injuries", "fatalities", "harm"):
+            cell[measure] += getattr(stats, measure)
+        severity = severity_code or "None"
+        cell["severity"][severity] = cell["severity"].get(severity, 0) + stats.collisions
+
+    # Shares and lift are relative to the whole table, before the value filters
+    total = sum(cell["collisions"] for cell in cells.values())
+    row_totals: dict[str, int] = {}
+    column_totals: dict[str, int] = {}
+    for (row_name, column_name), cell in cells.items():
+        row_totals[row_name] = row_totals.get(row_name, 0) + cell["collisions"]
+        column_totals[column_name] = column_totals.get(column_name, 0) + cell["collisions"]
+
+    results = []
+    for (row_name, column_name), cell in cells.items():
+        if row_value and row_name != row_value:
+            continue
+        if column_value and column_name != column_value:
+            continue
+        collisions = cell["collisions"]
+        expected = row_totals[row_name] * column_totals[column_name] / total
+        results.append({
+            **cell,
+            "share": round(collisions / total, 6),
+            "row_share": round(collisions / row_totals[row_name], 6),
+            "lift": round(collisions / expected, 4) if expected else None,
+            "injuries_per_collision": round(cell["injuries"] / collisions, 4),
+            "harm_per_collision": round(cell["harm"] / collisions, 4),
+            "severe_rate": round(sum(cell["severity"].get(code, 0) for code in SEVERE_CODES) / collisions, 6),
+        })
+    results.sort(key=lambda cell: cell["collisions"], reverse=True)
+
+    return {
+        "row": row,
+        "column": column,
+        "total_collisions": total,
+        "row_totals": row_totals,
+        "column_totals": column_totals,
+        "cells": results,
+    }
+
+
+if __name__ == "__main__":
+    setup_logging()
+
+    started = time.perf_counter()
+    with SessionLocal() as session:
+        count = rebuild_condition_stats(session)
+        session.commit()
+    logger.info("Rebuilt %d condition pair cells in %.1fs", count, time.perf_counter() - started)
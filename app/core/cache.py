@@ -0,0 +1,198 @@
+import json
+import os
+import threading
+import time
+from datetime import date, datetime
+from typing import Any, Callable, Optional
+
+from app.core.cache_stores import MemoryStore, make_store
+from app.core.singleflight import inflight
+
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "256"))
+# memory (per process), sqlite (shared by the workers on one host) or redis
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory").lower()
+# How long a worker may hold the compute lock for one entry before others give up waiting
+CACHE_LOCK_SECONDS = float(os.getenv("CACHE_LOCK_SECONDS", "30"))
+CACHE_POLL_SECONDS = 0.05
+
+
+def make_cache_key(name: str, params: dict) -> str:
+    """
+    Build a stable cache key from a result name and its query parameters.
+    None values are dropped so omitted and explicit-default filters share a key.
+    """
+    normalized = {}
+    for key, value in params.items():
+        if value is None:
+            continue
+        if isinstance(value, (datetime, date)):
+            value = value.isoformat()
+        normalized[key] = value
+    return f"{name}:{json.dumps(normalized, sort_keys=True, default=str)}"
+
+
+class ResultCache:
+    """
+    Cache for computed stats/viz results over a pluggable store: per-process memory (default),
+    or a SQLite file / Redis server shared by all workers (CACHE_BACKEND).
+    Tracks hits/misses per result name and how often each key is requested,
+    so the warm-up scheduler can precompute the most requested combinations.
+    A missing entry is computed once per process: identical concurrent misses wait on the first one
+    (see singleflight), and with a shared store one worker computes it while the others wait.
+    """
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, store=None):
+        self.max_entries = max_entries
+        self.store = store if store is not None else MemoryStore(max_entries)
+        self._hits: dict[str, int] = {}
+        self._misses: dict[str, int] = {}
+        # Misses served by another worker's computation
+        self._waited: dict[str, int] = {}
+        # key -> [name, params, request count]
+        self._requests: dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def shared(self) -> bool:
+        return self.store.shared
+
+    def get(self, name: str, params: dict) -> Optional[Any]:
+        key = make_cache_key(name, params)
+        with self._lock:
+            request = self._requests.setdefault(key, [name, dict(params), 0])
+            request[2] += 1
+            if len(self._requests) > self.max_entries * 4:
+                self._prune_requests()
+
+        value = self.store.get(key)
+        with self._lock:
+            if value is None:
+                self._misses[name] = self._misses.get(name, 0) + 1
+            else:
+                self._hits[name] = self._hits.get(name, 0) + 1
+        return value
+
+    def set(self, name: str, params: dict, value: Any) -> None:
+        self.store.set(make_cache_key(name, params), name, params, value)
+
+    def get_or_compute(self, name: str, params: dict, compute: Callable[[], Any]) -> Any:
+        """
+        Return the cached result for (name, params), computing and storing it on a miss.
+        Concurrent misses for the same key in this process share one computation.
+        """
+        value = self.get(name, params)
+        if value is not None:
+            return value
+
+        key = make_cache_key(name, params)
+        return inflight.do(key, lambda: self._compute_locked(key, name, params, compute), name)
+
+    def _compute_locked(self, key: str, name: str, params: dict, compute: Callable[[], Any]) -> Any:
+        deadline = time.monotonic() + CACHE_LOCK_SECONDS
+        while not self.store.acquire(key, CACHE_LOCK_SECONDS):
+            # Another worker is computing this entry
+            time.sleep(CACHE_POLL_SECONDS)
+            value = self.store.get(key)
+            if value is not None:
+                with self._lock:
+                    self._waited[name] = self._waited.get(name, 0) + 1
+                return value
+            if time.monotonic() > deadline:
+                return compute()
+
+        try:
+            # It may have been stored between the miss and taking the lock
+            value = self.store.get(key) if self.shared else None
+            if value is None:
+                value = compute()
+                self.store.set(key, name, params, value)
+            return value
+        finally:
+            self.store.release(key)
+
+    def compute_missing(self, name: str, params: dict, compute: Callable[[], Any]) -> bool:
+        """
+        Compute and store (name, params) unless it is cached or another worker is computing it.
+        Returns True if this call computed it.
+        """
+        key = make_cache_key(name, params)
+        if self.store.contains(key) or not self.store.acquire(key, CACHE_LOCK_SECONDS):
+            return False
+        try:
+            if self.shared and self.store.contains(key):
+                return False
+            self.store.set(key, name, params, compute())
+            return True
+        finally:
+            self.store.release(key)
+
+    def claim(self, token: str, ttl: float) -> bool:
+        """
+        True for the first worker to claim `token` within `ttl` seconds, always True for the memory store.
+        Used so one worker warms a shared store per data version.
+        """
+        return self.store.acquire(f"claim:{token}", ttl)
+
+    def replace_all(self, entries: list[tuple[str, dict, Any]]) -> None:
+        """
+        Swap the whole cache for freshly computed entries, dropping everything else.
+        """
+        self.store.replace_all([(make_cache_key(name, params), name, params, value) for name, params, value in entries])
+
+    def contains(self, name: str, params: dict) -> bool:
+        """
+        Check for a cached result without counting it as a request.
+        """
+        return self.store.contains(make_cache_key(name, params))
+
+    def invalidate(self, predicate: Callable[[str, dict], bool]) -> int:
+        """
+        Drop the entries for which predicate(name, params) is true. Returns how many were dropped.
+        """
+        return self.store.invalidate(predicate)
+
+    def clear(self) -> None:
+        self.store.clear()
+
+    def most_requested(self, limit: int) -> list[tuple[str, dict]]:
+        """
+        Return the (name, params) pairs requested most often since startup.
+        """
+        with self._lock:
+            ranked = sorted(self._requests.values(), key=lambda r: r[2], reverse=True)
+        return [(name, params) for name, params, _ in ranked[:limit]]
+
+    def _prune_requests(self) -> None:
+        # Keep request counters bounded when many one-off parameter combinations come in
+        ranked = sorted(self._requests.items(), key=lambda item: item[1][2], reverse=True)
+        self._requests = dict(ranked[:self.max_entries])
+
+    def stats(self) -> dict:
+        with self._lock:
+            names = sorted(set(self._hits) | set(self._misses))
+            by_name = {}
+            for name in names:
+                hits = self._hits.get(name, 0)
+                misses = self._misses.get(name, 0)
+                by_name[name] = {
+                    "hits": hits,
+                    "misses": misses,
+                    "hit_rate": round(hits / (hits + misses), 4) if hits + misses else None,
+                }
+                if name in self._waited:
+                    by_name[name]["waited"] = self._waited[name]
+        entries = [
+            {"key": key, "stored_at": datetime.fromtimestamp(stored_at).isoformat()}
+            for key, stored_at in self.store.entries()
+        ]
+        return {
+            "backend": self.store.backend,
+            "entries": len(entries),
+            "max_entries": self.max_entries,
+            "by_name": by_name,
+            "keys": entries,
+        }
+
+
+# Shared instance used by the API and the warm-up scheduler
+result_cache = ResultCache(store=make_store(CACHE_BACKEND, CACHE_MAX_ENTRIES))
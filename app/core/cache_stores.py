@@ -0,0 +1,321 @@
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Any, Callable, Optional
+
+CACHE_SQLITE_PATH = os.getenv("CACHE_SQLITE_PATH", os.path.join(tempfile.gettempdir(), "roadhelp-cache.sqlite3"))
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0")
+CACHE_REDIS_PREFIX = os.getenv("CACHE_REDIS_PREFIX", "roadhelp:cache:")
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if hasattr(value, "item"):
+        # NumPy scalars
+        return value.item()
+    return str(value)
+
+
+# Prefix of stored values that are raw bytes (e.g. precompressed response bodies) rather than JSON
+_RAW = b"\x00"
+
+
+def encode(value: Any) -> bytes:
+    if isinstance(value, bytes):
+        return _RAW + value
+    return json.dumps(value, separators=(",", ":"), default=_json_default).encode("utf-8")
+
+
+def decode(data: bytes) -> Any:
+    if data[:1] == _RAW:
+        return bytes(data[1:])
+    return json.loads(data)
+
+
+class MemoryStore:
+    """
+    Per-process LRU store, the default. Values are kept as the Python objects that were computed.
+    """
+
+    backend = "memory"
+    shared = False
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        # key -> (value, stored_at, name, params)
+        self._entries: OrderedDict[str, tuple[Any, float, str, dict]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key: str, name: str, params: dict, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (value, time.time(), name, dict(params))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def replace_all(self, entries: list[tuple[str, str, dict, Any]]) -> None:
+        now = time.time()
+        with self._lock:
+            self._entries = OrderedDict((key, (value, now, name, dict(params))) for key, name, params, value in entries)
+
+    def contains(self, key: str) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def invalidate(self, predicate: Callable[[str, dict], bool]) -> int:
+        with self._lock:
+            stale = [key for key, (_, _, name, params) in self._entries.items() if predicate(name, params)]
+            for key in stale:
+                del self._entries[key]
+        return len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def entries(self) -> list[tuple[str, float]]:
+        with self._lock:
+            return [(key, stored_at) for key, (_, stored_at, _, _) in self._entries.items()]
+
+    def acquire(self, key: str, ttl: float) -> bool:
+        # Only one process, in-process coalescing is left to the caller
+        return True
+
+    def release(self, key: str) -> None:
+        pass
+
+
+class SQLiteStore:
+    """
+    Store shared by every worker process on one host: a SQLite file in WAL mode, read through mmap.
+    Entries are evicted oldest-stored first once there are more than max_entries.
+    Locks are rows with an expiry, so a worker that dies while computing does not block the key forever.
+    """
+
+    backend = "sqlite"
+    shared = True
+
+    def __init__(self, max_entries: int, path: str = CACHE_SQLITE_PATH):
+        self.max_entries = max_entries
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY, name TEXT NOT NULL, params TEXT NOT NULL,
+                    value BLOB NOT NULL, stored_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS entries_stored_at ON entries (stored_at);
+                CREATE TABLE IF NOT EXISTS locks (key TEXT PRIMARY KEY, expires_at REAL NOT NULL);
+            """)
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per thread and process (workers may be forked after import)
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA mmap_size=268435456")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def get(self, key: str) -> Optional[Any]:
+        row = self._connect().execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+        return decode(row[0]) if row else None
+
+    def set(self, key: str, name: str, params: dict, value: Any) -> None:
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)",
+                (key, name, encode(params), encode(value), time.time()),
+            )
+            conn.execute(
+                "DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY stored_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def replace_all(self, entries: list[tuple[str, str, dict, Any]]) -> None:
+        rows = [(key, name, encode(params), encode(value), time.time()) for key, name, params, value in entries]
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM entries")
+            conn.executemany("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)", rows)
+
+    def contains(self, key: str) -> bool:
+        return self._connect().execute("SELECT 1 FROM entries WHERE key = ?", (key,)).fetchone() is not None
+
+    def invalidate(self, predicate: Callable[[str, dict], bool]) -> int:
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute("SELECT key, name, params FROM entries").fetchall()
+            stale = [(key,) for key, name, params in rows if predicate(name, decode(params))]
+            conn.executemany("DELETE FROM entries WHERE key = ?", stale)
+        return len(stale)
+
+    def clear(self) -> None:
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM entries")
+
+    def entries(self) -> list[tuple[str, float]]:
+        return self._connect().execute("SELECT key, stored_at FROM entries ORDER BY stored_at").fetchall()
+
+    def acquire(self, key: str, ttl: float) -> bool:
+        now = time.time()
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM locks WHERE key = ? AND expires_at < ?", (key, now))
+            return conn.execute("INSERT OR IGNORE INTO locks VALUES (?, ?)", (key, now + ttl)).rowcount == 1
+
+    def release(self, key: str) -> None:
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM locks WHERE key = ?", (key,))
+
+
+# Deletes a lock only while it still holds the releasing worker's token
+_RELEASE_LOCK = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+class RedisStore:
+    """
+    Store on a Redis server, for workers spread over several hosts. Any client with the redis-py
+    interface can be passed in (e.g. fakeredis in tests). Each entry is a hash, a sorted set
+    indexes keys by store time for eviction and listing, and locks are SET NX keys with an expiry
+    holding a token of their holder, so a holder that outlived the expiry cannot release a lock
+    another worker has taken since.
+    """
+
+    backend = "redis"
+    shared = True
+
+    def __init__(self, max_entries: int, url: str = CACHE_REDIS_URL, client=None, prefix: str = CACHE_REDIS_PREFIX):
+        self.max_entries = max_entries
+        self.client = client if client is not None else _require_redis().Redis.from_url(url)
+        self.prefix = prefix
+        self.index = f"{prefix}index"
+        self._release_lock = self.client.register_script(_RELEASE_LOCK)
+        # Tokens of the locks held by this thread, by key
+        self._local = threading.local()
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}entry:{key}"
+
+    def get(self, key: str) -> Optional[Any]:
+        data = self.client.hget(self._key(key), "value")
+        return decode(data) if data is not None else None
+
+    def set(self, key: str, name: str, params: dict, value: Any) -> None:
+        now = time.time()
+        pipe = self.client.pipeline()
+        pipe.hset(self._key(key), mapping={"name": name, "params": encode(params), "value": encode(value)})
+        pipe.zadd(self.index, {key: now})
+        pipe.execute()
+
+        extra = self.client.zcard(self.index) - self.max_entries
+        if extra > 0:
+            evicted = [k.decode() if isinstance(k, bytes) else k for k, _ in self.client.zpopmin(self.index, extra)]
+            self.client.delete(*(self._key(k) for k in evicted))
+
+    def replace_all(self, entries: list[tuple[str, str, dict, Any]]) -> None:
+        old = self._keys()
+        now = time.time()
+        pipe = self.client.pipeline(transaction=True)
+        if old:
+            pipe.delete(*(self._key(k) for k in old))
+        pipe.delete(self.index)
+        for key, name, params, value in entries:
+            pipe.hset(self._key(key), mapping={"name": name, "params": encode(params), "value": encode(value)})
+            pipe.zadd(self.index, {key: now})
+        pipe.execute()
+
+    def contains(self, key: str) -> bool:
+        return bool(self.client.exists(self._key(key)))
+
+    def _keys(self) -> list[str]:
+        return [k.decode() if isinstance(k, bytes) else k for k in self.client.zrange(self.index, 0, -1)]
+
+    def invalidate(self, predicate: Callable[[str, dict], bool]) -> int:
+        keys = self._keys()
+        pipe = self.client.pipeline()
+        for key in keys:
+            pipe.hmget(self._key(key), "name", "params")
+        stale = []
+        for key, (name, params) in zip(keys, pipe.execute()):
+            if name is None or predicate(name.decode() if isinstance(name, bytes) else name, decode(params)):
+                stale.append(key)
+        if stale:
+            pipe = self.client.pipeline()
+            pipe.delete(*(self._key(k) for k in stale))
+            pipe.zrem(self.index, *stale)
+            pipe.execute()
+        return len(stale)
+
+    def clear(self) -> None:
+        self.replace_all([])
+
+    def entries(self) -> list[tuple[str, float]]:
+        return [
+            (k.decode() if isinstance(k, bytes) else k, stored_at)
+            for k, stored_at in self.client.zrange(self.index, 0, -1, withscores=True)
+        ]
+
+    def _tokens(self) -> dict[str, str]:
+        if not hasattr(self._local, "tokens"):
+            self._local.tokens = {}
+        return self._local.tokens
+
+    def acquire(self, key: str, ttl: float) -> bool:
+        token = uuid.uuid4().hex
+        if not self.client.set(f"{self.prefix}lock:{key}", token, nx=True, px=int(ttl * 1000)):
+            return False
+        self._tokens()[key] = token
+        return True
+
+    def release(self, key: str) -> None:
+        token = self._tokens().pop(key, None)
+        if token is not None:
+            self._release_lock(keys=[f"{self.prefix}lock:{key}"], args=[token])
+
+
+def _require_redis():
+    try:
+        import redis
+    except ImportError as exc:
+        raise RuntimeError("CACHE_BACKEND=redis needs the redis client: pip install redis") from exc
+    return redis
+
+
+STORES = {"memory": MemoryStore, "sqlite": SQLiteStore, "redis": RedisStore}
+
+
+def make_store(backend: str, max_entries: int):
+    if backend not in STORES:
+        raise RuntimeError(f"Unknown CACHE_BACKEND {backend!r}, expected one of {', '.join(STORES)}")
+    return STORES[backend](max_entries)
@@ -0,0 +1,190 @@
+import json
+import logging
+import os
+import threading
+from datetime import date, datetime, timedelta
+from typing import Callable, Iterable, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.core.cache import result_cache
+from app.core.database import get_engine, replicas_configured, require_replay
+
+logger = logging.getLogger(__name__)
+
+CHANGES_CHANNEL = "collisions_changed"
+CHANGE_LISTENER_ENABLED = os.getenv("CHANGE_LISTENER_ENABLED", "true").lower() == "true"
+# Notifications arriving within this window are merged into one invalidation
+CHANGE_BATCH_SECONDS = float(os.getenv("CHANGE_BATCH_SECONDS", "0.5"))
+
+# NOTIFY payloads are limited to 8000 bytes, this many rows keeps one message well below it
+NOTIFY_CHUNK_ROWS = 150
+
+
+def change_event(rows: Iterable[dict]) -> dict:
+    """
+    Summarize changed collision rows (inc_key, occurred_at) as inc_keys and UTC days.
+    Cached results are scoped by date range only, so the days are what invalidation matches on.
+    """
+    inc_keys, days = [], set()
+    for row in rows:
+        inc_keys.append(row["inc_key"])
+        days.add(row["occurred_at"].date().isoformat())
+    return {"inc_keys": inc_keys, "days": sorted(days)}
+
+
+def notify_changes(db: Session, rows: list[dict]) -> None:
+    """
+    Queue change events for rows written in the current transaction.
+    Postgres delivers them to listeners only when the transaction commits.
+    """
+    for start in range(0, len(rows), NOTIFY_CHUNK_ROWS):
+        payload = json.dumps(change_event(rows[start:start + NOTIFY_CHUNK_ROWS]), separators=(",", ":"))
+        db.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": CHANGES_CHANNEL, "payload": payload})
+
+
+def notify_all_changed(db: Session) -> None:
+    """
+    Queue a change event that invalidates every cached result, for changes not tied to
+    particular collisions (e.g. harm score reweighting).
+    """
+    payload = json.dumps({"inc_keys": [], "days": [], "all": True}, separators=(",", ":"))
+    db.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": CHANGES_CHANNEL, "payload": payload})
+
+
+def merge_events(events: list[dict]) -> dict:
+    inc_keys, days = [], set()
+    for event in events:
+        inc_keys.extend(event["inc_keys"])
+        days.update(event["days"])
+    merged = {"inc_keys": inc_keys, "days": sorted(days)}
+    if any(event.get("all") for event in events):
+        merged["all"] = True
+    return merged
+
+
+def _as_date(value) -> Optional[date]:
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return value.date() if isinstance(value, datetime) else value
+
+
+def affects(params: dict, days: list[str]) -> bool:
+    """
+    True if a result computed with `params` may include collisions on any of `days`.
+    Open-ended ranges always do; bounds are widened by a day to cover time zone offsets.
+    """
+    start = _as_date(params.get("start_date"))
+    end = _as_date(params.get("end_date"))
+    if start is None and end is None:
+        return bool(days)
+    low = start - timedelta(days=1) if start else date.min
+    high = end + timedelta(days=1) if end else date.max
+    return any(low <= date.fromisoformat(day) <= high for day in days)
+
+
+class ChangeListener:
+    """
+    Background thread that LISTENs for import change events on its own connection.
+    Each merged event invalidates only the cached results whose date range covers the
+    affected days, asks the warm-up scheduler to refill them, and is passed to subscribers
+    (e.g. in-memory aggregates that can apply the change incrementally).
+    """
+
+    def __init__(self, channel: str = CHANGES_CHANNEL, batch_seconds: float = CHANGE_BATCH_SECONDS):
+        self.channel = channel
+        self.batch_seconds = batch_seconds
+        self.connected = False
+        self.events_received = 0
+        self.entries_invalidated = 0
+        self.last_event_at: Optional[datetime] = None
+        self.last_error: Optional[str] = None
+        self._subscribers: list[Callable[[dict], None]] = []
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def subscribe(self, callback: Callable[[dict], None]) -> None:
+        self._subscribers.append(callback)
+
+    def start(self) -> None:
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="change-listener", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self) -> None:
+        # Imported here, the API otherwise loads the driver only with the first database session
+        import psycopg
+
+        conninfo = get_engine().url.set(drivername="postgresql").render_as_string(hide_password=False)
+        backoff = 1.0
+        while not self._stop.is_set():
+            try:
+                with psycopg.connect(conninfo, autocommit=True) as conn:
+                    conn.execute(f"LISTEN {self.channel}")
+                    self.connected = True
+                    backoff = 1.0
+                    while not self._stop.is_set():
+                        payloads = [n.payload for n in conn.notifies(timeout=self.batch_seconds)]
+                        if payloads:
+                            event = merge_events([json.loads(p) for p in payloads])
+                            if replicas_configured():
+                                # The changes are committed at or before the primary's current WAL position
+                                event["lsn"] = conn.execute("SELECT pg_current_wal_lsn()::text").fetchone()[0]
+                            self.apply(event)
+            except Exception as exc:
+                self.last_error = repr(exc)
+                logger.warning("Change listener disconnected (%s), retrying in %.0fs", exc, backoff)
+            self.connected = False
+            self._stop.wait(backoff)
+            backoff = min(backoff * 2, 60.0)
+
+    def apply(self, event: dict) -> int:
+        """
+        Invalidate affected cached results and notify subscribers. Returns entries invalidated.
+        """
+        # Imported here, the importer side of this module must not pull in the viz builders
+        from app.precompute import warmup_scheduler
+
+        if event.get("lsn"):
+            # Replicas that have not replayed the change must not rebuild the invalidated results
+            require_replay(event["lsn"])
+        invalidated = result_cache.invalidate(lambda name, params: event.get("all") or affects(params, event["days"]))
+        self.events_received += 1
+        self.entries_invalidated += invalidated
+        self.last_event_at = datetime.now()
+        logger.info(
+            "Change event: %d collisions on %d days, %d cached results invalidated",
+            len(event["inc_keys"]), len(event["days"]), invalidated,
+        )
+
+        for callback in self._subscribers:
+            try:
+                callback(event)
+            except Exception:
+                logger.exception("Change subscriber failed")
+
+        if invalidated:
+            warmup_scheduler.request_refresh(missing_only=True)
+        return invalidated
+
+    def status(self) -> dict:
+        return {
+            "enabled": CHANGE_LISTENER_ENABLED,
+            "connected": self.connected,
+            "events_received": self.events_received,
+            "entries_invalidated": self.entries_invalidated,
+            "last_event_at": self.last_event_at.isoformat() if self.last_event_at else None,
+            "last_error": self.last_error,
+        }
+
+
+change_listener = ChangeListener()
@@ -0,0 +1,137 @@
+import gzip
+import json
+import os
+import struct
+from typing import Callable, Optional
+
+from fastapi import Request
+from fastapi.responses import Response
+from starlette.concurrency import run_in_threadpool
+
+from app.core.cache_stores import encode
+
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "true").lower() == "true"
+# Uncached responses smaller than this are sent as they are
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+
+COMPRESSIBLE_TYPES = ("application/json", "text/")
+
+
+def _brotli() -> Optional[Callable[[bytes, int], bytes]]:
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return lambda data, level: brotli.compress(data, quality=level)
+
+
+def _zstd() -> Optional[Callable[[bytes, int], bytes]]:
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return lambda data, level: zstandard.ZstdCompressor(level=level).compress(data)
+
+
+# Content-Encoding -> (compress(data, level), level for per-request compression, level for stored bodies).
+# In server preference order; brotli and zstd only when their packages are installed.
+CODECS: dict[str, tuple[Callable[[bytes, int], bytes], int, int]] = {}
+for _name, _codec, _levels in [("zstd", _zstd(), (3, 12)), ("br", _brotli(), (4, 9))]:
+    if _codec is not None:
+        CODECS[_name] = (_codec, *_levels)
+CODECS["gzip"] = (lambda data, level: gzip.compress(data, compresslevel=level, mtime=0), 6, 9)
+
+
+def negotiate(accept_encoding: Optional[str], available) -> str:
+    """
+    Pick the Content-Encoding for a response from the client's Accept-Encoding header,
+    among `available` codings in server preference order. "identity" when none is acceptable.
+    """
+    if not accept_encoding or not COMPRESSION_ENABLED:
+        return "identity"
+    accepted: dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip().lower()] = quality
+    for coding in available:
+        if coding != "identity" and accepted.get(coding, accepted.get("*", 0.0)) > 0:
+            return coding
+    return "identity"
+
+
+def encode_json_variants(value) -> bytes:
+    """
+    Serialize a result once as JSON and compress it with every available codec.
+    The variants are packed into one blob so they can be cached as a single entry:
+    uint32 header length, JSON header {coding: length} in preference order, then the bodies.
+    """
+    body = encode(value)
+    variants = {"identity": body}
+    if COMPRESSION_ENABLED:
+        for coding, (compress, _, stored_level) in CODECS.items():
+            variants[coding] = compress(body, stored_level)
+    header = json.dumps({coding: len(data) for coding, data in variants.items()}).encode("utf-8")
+    return b"".join([struct.pack("<I", len(header)), header, *variants.values()])
+
+
+def decode_variants(blob: bytes) -> dict[str, bytes]:
+    (header_length,) = struct.unpack_from("<I", blob)
+    header = json.loads(blob[4:4 + header_length])
+    variants = {}
+    offset = 4 + header_length
+    for coding, length in header.items():
+        variants[coding] = blob[offset:offset + length]
+        offset += length
+    return variants
+
+
+def variants_response(
+    blob: bytes, accept_encoding: Optional[str], media_type: str = "application/json", headers: Optional[dict] = None
+) -> Response:
+    """
+    Response with the stored body variant the client accepts, no compression at request time.
+    """
+    variants = decode_variants(blob)
+    # Prefer the codecs this process ranks first, then whatever else was stored (e.g. by another worker)
+    available = [*(coding for coding in CODECS if coding in variants), *variants]
+    coding = negotiate(accept_encoding, available)
+    headers = {**(headers or {}), "Vary": "Accept-Encoding"}
+    if coding != "identity":
+        headers["Content-Encoding"] = coding
+    return Response(variants[coding], media_type=media_type, headers=headers)
+
+
+async def compression_middleware(request: Request, call_next):
+    """
+    Compress uncached JSON/text responses of at least COMPRESS_MIN_BYTES in a worker thread.
+    Responses that already carry a Content-Encoding (precompressed cache entries) and
+    streamed responses without a Content-Length are passed through.
+    """
+    response = await call_next(request)
+    if not COMPRESSION_ENABLED or "content-encoding" in response.headers:
+        return response
+    length = response.headers.get("content-length")
+    media_type = response.headers.get("content-type", "")
+    if length is None or int(length) < COMPRESS_MIN_BYTES or not media_type.startswith(COMPRESSIBLE_TYPES):
+        return response
+    coding = negotiate(request.headers.get("accept-encoding"), CODECS)
+    response.headers["vary"] = "Accept-Encoding"
+    if coding == "identity":
+        return response
+
+    body = b"".join([chunk async for chunk in response.body_iterator])
+    compress, level, _ = CODECS[coding]
+    compressed = await run_in_threadpool(compress, body, level)
+
+    headers = dict(response.headers)
+    headers.pop("content-length", None)
+    headers["content-encoding"] = coding
+    headers["vary"] = "Accept-Encoding"
+    return Response(compressed, status_code=response.status_code, headers=headers)
@@ -1,7 +1,12 @@
+import logging
 import os
+import threading
+import time
+from typing import Optional
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import create_engine, make_url, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker
 
 try:
     from dotenv import load_dotenv
@@ -9,23 +14,317 @@ try:
 except ImportError:
     pass
 
+logger = logging.getLogger(__name__)
+
 DATABASE_URL = os.getenv("DATABASE_URL")
-if not DATABASE_URL:
-    raise RuntimeError("DATABASE_URL is not set, create a new .env file (see .env.example)")
+# Comma-separated replica URLs for read-only endpoints, and for the heavy stats/viz aggregates
+# (defaults to the read replicas). Without any, every session uses DATABASE_URL.
+READ_REPLICA_URLS = [url.strip() for url in os.getenv("READ_REPLICA_URLS", "").split(",") if url.strip()]
+ANALYTICS_REPLICA_URLS = [
+    url.strip() for url in os.getenv("ANALYTICS_REPLICA_URLS", "").split(",") if url.strip()
+] or READ_REPLICA_URLS
+# Replicas further behind than this are skipped until they catch up
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "30"))
+# How often each replica's health and lag is re-checked
+REPLICA_CHECK_SECONDS = float(os.getenv("REPLICA_CHECK_SECONDS", "5"))
+REPLICA_CONNECT_TIMEOUT = int(os.getenv("REPLICA_CONNECT_TIMEOUT", "2"))
+# Re-check interval while a replica has not replayed a change this process was notified of
+_CATCH_UP_POLL_SECONDS = 0.25
+
+_engine: Optional[Engine] = None
+_engine_lock = threading.Lock()
+
+
+def get_engine() -> Engine:
+    """
+    The shared engine, created on first use so importing the app does not load the database driver.
+    """
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                if not DATABASE_URL:
+                    raise RuntimeError("DATABASE_URL is not set, create a new .env file (see .env.example)")
+                _engine = create_engine(DATABASE_URL)
+    return _engine
+
+
+def dispose_engine() -> None:
+    """
+    Close the pooled connections of the primary and replica engines that were created.
+    """
+    if _engine is not None:
+        _engine.dispose()
+    for replica in _replicas.values():
+        replica.dispose()
+
+
+def __getattr__(name: str):
+    # `from app.core.database import engine` keeps working, it creates the engine at that point
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class _LazySessionmaker(sessionmaker):
+    """
+    sessionmaker that binds to the engine when the first session is opened.
+    """
+
+    def __call__(self, **local_kw):
+        if self.kw.get("bind") is None:
+            self.configure(bind=get_engine())
+        return super().__call__(**local_kw)
+
+
+SessionLocal = _LazySessionmaker(
+    autocommit=False,
+    autoflush=False,
+)
+
+
+def _lsn(value: Optional[str]) -> Optional[int]:
+    # Postgres LSNs are printed as two hex halves, "16/B374D848"
+    if value is None:
+        return None
+    high, low = value.split("/")
+    return (int(high, 16) << 32) | int(low, 16)
+
+
+# Highest primary WAL position a change event was received for; replicas must replay it before serving reads
+_required_lsn: Optional[int] = None
+
+# Reports whether the server is a standby, its replayed WAL position and how far behind it is in seconds
+_REPLICA_STATE_SQL = """
+SELECT
+    pg_is_in_recovery(),
+    pg_last_wal_replay_lsn()::text,
+    CASE
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE extract(epoch FROM now() - pg_last_xact_replay_timestamp())
+    END
+"""
+
+
+def require_replay(lsn: str) -> None:
+    """
+    Route reads away from replicas until they have replayed the primary's WAL up to `lsn`.
+    The change listener calls this before invalidating cached results, so the results are
+    recomputed from data that includes the change.
+    """
+    global _required_lsn
+    position = _lsn(lsn)
+    if _required_lsn is None or position > _required_lsn:
+        _required_lsn = position
+
+
+class Replica:
+    """
+    One read replica and its last observed state. A server that is not in recovery (e.g. a second
+    instance loaded from a snapshot) has no replication lag to measure and counts as current until
+    the first change event: it never replays the primary's WAL, so from then on it is not caught up.
+    """
+
+    def __init__(self, url: str):
+        self.url = url
+        self._engine: Optional[Engine] = None
+        self._check_lock = threading.Lock()
+        self.checked_at: Optional[float] = None
+        self.healthy = False
+        self.in_recovery: Optional[bool] = None
+        self.replay_lsn: Optional[int] = None
+        self.lag_seconds: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    @property
+    def engine(self) -> Engine:
+        if self._engine is None:
+            self._engine = create_engine(
+                self.url, pool_pre_ping=True, connect_args={"connect_timeout": REPLICA_CONNECT_TIMEOUT}
+            )
+        return self._engine
+
+    def check(self) -> None:
+        try:
+            with self.engine.connect() as conn:
+                in_recovery, replay_lsn, lag = conn.execute(text(_REPLICA_STATE_SQL)).one()
+            self.in_recovery = in_recovery
+            self.replay_lsn = _lsn(replay_lsn) if in_recovery else None
+            self.lag_seconds = float(lag or 0) if in_recovery else 0.0
+            if not self.healthy:
+                logger.info("Replica %s is available (lag %.1fs)", self.display_url, self.lag_seconds)
+            self.healthy = True
+            self.last_error = None
+        except Exception as exc:
+            if self.healthy or self.last_error is None:
+                logger.warning("Replica %s is unavailable, reading from the primary: %s", self.display_url, exc)
+            self.healthy = False
+            self.last_error = repr(exc)
+        self.checked_at = time.monotonic()
+
+    def caught_up(self) -> bool:
+        if _required_lsn is None:
+            return True
+        # replay_lsn is None for a server that is not a standby (or not checked yet)
+        return self.replay_lsn is not None and self.replay_lsn >= _required_lsn
+
+    def usable(self, max_lag: float, check_interval: float) -> bool:
+        """
+        True if the replica is reachable, within `max_lag` and has replayed every change seen so far.
+        State older than `check_interval` is refreshed by one caller while the others use what is known.
+        """
+        age = None if self.checked_at is None else time.monotonic() - self.checked_at
+        stale = age is None or age > check_interval or (not self.caught_up() and age > _CATCH_UP_POLL_SECONDS)
+        if stale and self._check_lock.acquire(blocking=False):
+            try:
+                self.check()
+            finally:
+                self._check_lock.release()
+        return self.healthy and self.lag_seconds <= max_lag and self.caught_up()
 
-engine = create_engine(DATABASE_URL)
+    @property
+    def display_url(self) -> str:
+        return make_url(self.url).render_as_string(hide_password=True)
 
-SessionLocal = sessionmaker(
+    def status(self) -> dict:
+        return {
+            "url": self.display_url,
+            "healthy": self.healthy,
+            "in_recovery": self.in_recovery,
+            "lag_seconds": None if self.lag_seconds is None else round(self.lag_seconds, 3),
+            "caught_up": self.caught_up(),
+            "checked_seconds_ago": None if self.checked_at is None else round(time.monotonic() - self.checked_at, 1),
+            "last_error": self.last_error,
+        }
+
+    def dispose(self) -> None:
+        if self._engine is not None:
+            self._engine.dispose()
+
+
+# Replicas shared by the pools that list the same URL
+_replicas: dict[str, Replica] = {}
+
+
+class RoutingSession(Session):
+    """
+    Session that runs queries on `read_bind` and sends flushes and ORM INSERT/UPDATE/DELETE to the primary.
+    After the first write it stays on the primary, so it reads its own uncommitted changes.
+    Writes through text() are not detected, endpoints that write use get_db.
+    """
+
+    def __init__(self, read_bind: Optional[Engine] = None, **kw):
+        super().__init__(**kw)
+        self.read_bind = read_bind
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if self.read_bind is None or self._flushing or (clause is not None and clause.is_dml):
+            self.read_bind = None
+            return super().get_bind(mapper=mapper, clause=clause, **kw)
+        return self.read_bind
+
+
+RoutingSessionLocal = _LazySessionmaker(
+    class_=RoutingSession,
     autocommit=False,
     autoflush=False,
-    bind=engine,
 )
 
+
+class ReplicaPool:
+    """
+    Replicas serving one kind of read traffic, used round-robin.
+    Falls back to the primary when none is reachable, within the lag limit and caught up.
+    """
+
+    def __init__(self, name: str, urls: list[str], max_lag: float = REPLICA_MAX_LAG_SECONDS,
+                 check_interval: float = REPLICA_CHECK_SECONDS):
+        self.name = name
+        self.replicas = [_replicas.setdefault(url, Replica(url)) for url in urls]
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.routed = 0
+        self.fallbacks = 0
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def engine(self) -> Engine:
+        if not self.replicas:
+            return get_engine()
+        with self._lock:
+            start = self._next
+            self._next = (self._next + 1) % len(self.replicas)
+        for i in range(len(self.replicas)):
+            replica = self.replicas[(start + i) % len(self.replicas)]
+            if replica.usable(self.max_lag, self.check_interval):
+                with self._lock:
+                    self.routed += 1
+                return replica.engine
+        with self._lock:
+            self.fallbacks += 1
+        return get_engine()
+
+    def session(self) -> Session:
+        """
+        A session reading from the chosen replica (or the primary), writes still go to the primary.
+        """
+        if not self.replicas:
+            return SessionLocal()
+        return RoutingSessionLocal(read_bind=self.engine())
+
+    def status(self) -> dict:
+        return {
+            "replicas": [replica.status() for replica in self.replicas],
+            "max_lag_seconds": self.max_lag,
+            "routed": self.routed,
+            "fallbacks": self.fallbacks,
+        }
+
+
+read_replicas = ReplicaPool("read", READ_REPLICA_URLS)
+analytics_replicas = ReplicaPool("analytics", ANALYTICS_REPLICA_URLS)
+
+
+def replicas_configured() -> bool:
+    return bool(_replicas)
+
+
+def replica_status() -> dict:
+    return {
+        "primary": make_url(DATABASE_URL).render_as_string(hide_password=True) if DATABASE_URL else None,
+        "read": read_replicas.status(),
+        "analytics": analytics_replicas.status(),
+        "required_lsn": None if _required_lsn is None else f"{_required_lsn >> 32:X}/{_required_lsn & 0xFFFFFFFF:X}",
+    }
+
+
 def get_db():
     """
     Dependency that provides a db session and closes it after request.
     """
     db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def get_read_db():
+    """
+    Dependency for read-only endpoints: a session on a read replica when one is usable.
+    """
+    db = read_replicas.session()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def get_analytics_db():
+    """
+    Dependency for heavy aggregates (stats, viz): a session on an analytics replica when one is usable.
+    """
+    db = analytics_replicas.session()
     try:
         yield db
     finally:
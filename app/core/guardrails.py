@@ -0,0 +1,343 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable, Iterator, Optional, TypeVar
+
+from fastapi import Depends, HTTPException, Request
+from fastapi.responses import JSONResponse
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+from app.core.database import get_analytics_db
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Defaults for the analytical routes (/viz, /collisions/stats), see ROUTE_LIMITS for per-route overrides
+ANALYTICS_STATEMENT_TIMEOUT_MS = int(os.getenv("ANALYTICS_STATEMENT_TIMEOUT_MS", "15000"))
+ANALYTICS_MAX_CONCURRENT = int(os.getenv("ANALYTICS_MAX_CONCURRENT", "4"))
+ANALYTICS_MAX_QUEUE = int(os.getenv("ANALYTICS_MAX_QUEUE", "8"))
+# Across all analytical routes, below the pool size (5 + 10 overflow) so cheap endpoints keep connections
+ANALYTICS_MAX_CONCURRENT_TOTAL = int(os.getenv("ANALYTICS_MAX_CONCURRENT_TOTAL", "8"))
+# Longest a request waits for a slot before it is shed with 503
+ANALYTICS_QUEUE_TIMEOUT_SECONDS = float(os.getenv("ANALYTICS_QUEUE_TIMEOUT_SECONDS", "10"))
+RETRY_AFTER_SECONDS = int(os.getenv("RETRY_AFTER_SECONDS", "5"))
+
+# Planner cost (EXPLAIN "Total Cost") above which a coarser variant is served, if the endpoint has one,
+# and above which the request is rejected. For scale, a line chart over 70k collisions estimates ~14000,
+# a two-dimension cube ~40000.
+QUERY_COST_DOWNGRADE = float(os.getenv("QUERY_COST_DOWNGRADE", "250000"))
+QUERY_COST_LIMIT = float(os.getenv("QUERY_COST_LIMIT", "2000000"))
+
+# Postgres SQLSTATE of a statement cancelled by statement_timeout
+QUERY_CANCELED = "57014"
+
+
+@dataclass(frozen=True)
+class RouteLimits:
+    max_concurrent: int = ANALYTICS_MAX_CONCURRENT
+    max_queue: int = ANALYTICS_MAX_QUEUE
+    statement_timeout_ms: int = ANALYTICS_STATEMENT_TIMEOUT_MS
+
+
+DEFAULT_LIMITS = RouteLimits()
+
+# Route path -> limits for the routes that need more or less room than the defaults
+ROUTE_LIMITS = {
+    "/viz/hotspots": RouteLimits(max_concurrent=2),
+    "/viz/data/hotspots": RouteLimits(max_concurrent=2),
+    "/collisions/stats/cube": RouteLimits(max_concurrent=2),
+    # Ranked bar chart queries of dashboard requests, other panels count against their /viz/<name> route
+    "/viz/dashboard": RouteLimits(max_concurrent=2),
+}
+
+
+class QueryTooExpensive(Exception):
+    def __init__(self, name: str, cost: float, limit: float):
+        super().__init__(f"{name}: estimated cost {cost:.0f} is over the limit of {limit:.0f}")
+        self.name = name
+        self.cost = cost
+        self.limit = limit
+
+
+# Gate.acquire outcomes that hold a slot
+HELD = ("admitted", "queued")
+
+
+class Gate:
+    """
+    Admits at most `limit` holders at a time. Up to `max_queue` more wait in arrival order,
+    anything beyond that is rejected right away. Holders are the worker threads computing
+    cache misses, so a waiter blocks its thread; the queue bounds how many do.
+    """
+
+    def __init__(self, limit: int, max_queue: int):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.active = 0
+        self._waiters: deque[threading.Event] = deque()
+        self._lock = threading.Lock()
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    def acquire(self, timeout: float) -> str:
+        """
+        Returns "admitted" or "queued" once a slot is held, "rejected" when the queue is full
+        and "timed_out" when no slot freed up within `timeout` seconds.
+        """
+        with self._lock:
+            if self.active < self.limit and not self._waiters:
+                self.active += 1
+                return "admitted"
+            if len(self._waiters) >= self.max_queue:
+                return "rejected"
+            waiter = threading.Event()
+            self._waiters.append(waiter)
+        if not waiter.wait(timeout):
+            with self._lock:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                    return "timed_out"
+            # The slot was handed over just as the wait timed out
+        return "queued"
+
+    def release(self) -> None:
+        # Hand the slot straight to the next waiter, so a new arrival cannot take it first
+        with self._lock:
+            if not self._waiters:
+                self.active -= 1
+                return
+            waiter = self._waiters.popleft()
+        waiter.set()
+
+
+class AdmissionControl:
+    """
+    Per-route concurrency limits for the computations of the analytical routes, plus one limit
+    over all of them. Only cache misses take a slot (see admitted), so cached results are served
+    during a burst. Computations over a limit queue briefly; a full queue is shed with 429,
+    a wait longer than ANALYTICS_QUEUE_TIMEOUT_SECONDS with 503.
+    """
+
+    def __init__(self, total_limit: int = ANALYTICS_MAX_CONCURRENT_TOTAL, max_queue: int = ANALYTICS_MAX_QUEUE,
+                 queue_timeout: float = ANALYTICS_QUEUE_TIMEOUT_SECONDS):
+        self.total = Gate(total_limit, max_queue)
+        self.queue_timeout = queue_timeout
+        self._gates: dict[str, Gate] = {}
+        # route -> outcome -> count
+        self._counts: dict[str, dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def gate(self, route: str) -> Gate:
+        # Under the lock, so the first requests of a route all share one gate
+        with self._lock:
+            gate = self._gates.get(route)
+            if gate is None:
+                limits = ROUTE_LIMITS.get(route, DEFAULT_LIMITS)
+                gate = self._gates[route] = Gate(limits.max_concurrent, limits.max_queue)
+            return gate
+
+    def _count(self, route: str, outcome: str) -> None:
+        with self._lock:
+            counts = self._counts.setdefault(route, {})
+            counts[outcome] = counts.get(outcome, 0) + 1
+
+    def acquire(self, route: str) -> None:
+        deadline = time.monotonic() + self.queue_timeout
+        gate = self.gate(route)
+        outcome = gate.acquire(self.queue_timeout)
+        if outcome in HELD:
+            total_outcome = self.total.acquire(max(deadline - time.monotonic(), 0.0))
+            if total_outcome not in HELD:
+                gate.release()
+                outcome = total_outcome
+            elif total_outcome == "queued":
+                outcome = "queued"
+        self._count(route, outcome)
+        if outcome == "rejected":
+            raise HTTPException(
+                status_code=429,
+                detail="Too many analytical requests queued, retry later",
+                headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+            )
+        if outcome == "timed_out":
+            raise HTTPException(
+                status_code=503,
+                detail=f"No capacity for this request within {self.queue_timeout:g}s, retry later",
+                headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+            )
+
+    def release(self, route: str) -> None:
+        self.total.release()
+        self.gate(route).release()
+
+    @contextmanager
+    def slot(self, route: str) -> Iterator[None]:
+        """
+        Hold a slot of `route` (and of the total) for the block, raising 429/503 when shed.
+        """
+        self.acquire(route)
+        try:
+            yield
+        finally:
+            self.release(route)
+
+    def status(self) -> dict:
+        with self._lock:
+            counts = {route: dict(outcomes) for route, outcomes in self._counts.items()}
+            gates = sorted(self._gates.items())
+        return {
+            "total": {"limit": self.total.limit, "active": self.total.active, "waiting": self.total.waiting},
+            "routes": {
+                route: {
+                    "limit": gate.limit,
+                    "active": gate.active,
+                    "waiting": gate.waiting,
+                    **counts.get(route, {}),
+                }
+                for route, gate in gates
+            },
+        }
+
+    def render(self) -> str:
+        lines = [
+            "# HELP admission_requests_total Analytical requests by admission outcome.",
+            "# TYPE admission_requests_total counter",
+        ]
+        with self._lock:
+            for route, outcomes in sorted(self._counts.items()):
+                for outcome, count in sorted(outcomes.items()):
+                    lines.append(f'admission_requests_total{{route="{route}",outcome="{outcome}"}} {count}')
+            gates = sorted(self._gates.items())
+        lines.append("# HELP admission_in_flight Analytical computations holding a slot.")
+        lines.append("# TYPE admission_in_flight gauge")
+        for route, gate in gates:
+            lines.append(f'admission_in_flight{{route="{route}"}} {gate.active}')
+        return "\n".join(lines) + "\n"
+
+
+admission = AdmissionControl()
+
+
+async def analytics_guard(request: Request, db: Session = Depends(get_analytics_db)) -> None:
+    """
+    Router dependency of the analytical routes: records the route on the request's session
+    (the same one the endpoint gets), for its statement timeout and for the admission slot
+    its cache misses take.
+    """
+    route = request.scope["route"].path
+    db.info["admission_route"] = route
+    db.info["statement_timeout_ms"] = ROUTE_LIMITS.get(route, DEFAULT_LIMITS).statement_timeout_ms
+
+
+def admitted(db: Session, compute: Callable[[], T]) -> Callable[[], T]:
+    """
+    Wrap the computation of a cache miss so it runs holding an admission slot of the session's route.
+    Pass the result to result_cache.get_or_compute / inflight.do: cache hits and requests coalesced
+    onto a running computation then never wait for a slot.
+    """
+    route = db.info.get("admission_route")
+    if route is None:
+        return compute
+
+    def run() -> T:
+        with admission.slot(route):
+            return compute()
+    return run
+
+
+@event.listens_for(Session, "after_begin")
+def _set_statement_timeout(session, transaction, connection):
+    # SET LOCAL lasts until the end of the transaction, so pooled connections are not affected
+    timeout_ms = session.info.get("statement_timeout_ms")
+    if timeout_ms:
+        connection.exec_driver_sql(f"SET LOCAL statement_timeout = {int(timeout_ms)}")
+
+
+class _Explain(Executable, ClauseElement):
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(_Explain, "postgresql")
+def _compile_explain(element, compiler, **kw):
+    return "EXPLAIN (FORMAT JSON) " + compiler.process(element.statement, **kw)
+
+
+def estimated_cost(db: Session, query) -> float:
+    """
+    Planner estimate ("Total Cost") of an ORM query or select, without running it.
+    """
+    statement = getattr(query, "statement", query)
+    plan = db.execute(_Explain(statement)).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return float(plan[0]["Plan"]["Total Cost"])
+
+
+def check_cost(db: Session, name: str, query) -> float:
+    """
+    Raise QueryTooExpensive when the query's estimated cost is over QUERY_COST_LIMIT.
+    """
+    cost = estimated_cost(db, query)
+    if cost > QUERY_COST_LIMIT:
+        raise QueryTooExpensive(name, cost, QUERY_COST_LIMIT)
+    return cost
+
+
+def affordable_variant(db: Session, name: str, variants: list[tuple[str, object]]) -> tuple[str, object]:
+    """
+    Pick among (label, query) variants of one aggregate, requested first, then coarser ones
+    (e.g. day/week/month buckets). The planner prices every bucket size the same (it cannot tell
+    how many groups date_trunc makes), so only the requested variant is estimated: within
+    QUERY_COST_DOWNGRADE it is served, over QUERY_COST_LIMIT the request is rejected,
+    in between the next coarser variant is served instead.
+    """
+    label, query = variants[0]
+    cost = check_cost(db, name, query)
+    if cost > QUERY_COST_DOWNGRADE and len(variants) > 1:
+        logger.info("%s downgraded from %s to %s (estimated cost %.0f)", name, label, variants[1][0], cost)
+        return variants[1]
+    return label, query
+
+
+def guardrail_error(exc: Exception) -> Optional[tuple[int, str]]:
+    """
+    Status code and message for a request stopped by a guardrail (over the cost limit,
+    cancelled by the statement timeout), None for any other error.
+    """
+    if isinstance(exc, QueryTooExpensive):
+        return 400, f"Request is too expensive (estimated cost {exc.cost:.0f}), narrow the date range or add filters"
+    if isinstance(exc, OperationalError) and getattr(exc.orig, "sqlstate", None) == QUERY_CANCELED:
+        return 503, "Query exceeded the statement timeout, narrow the date range or retry later"
+    return None
+
+
+async def query_too_expensive_handler(request: Request, exc: QueryTooExpensive) -> JSONResponse:
+    status_code, detail = guardrail_error(exc)
+    return JSONResponse(status_code=status_code, content={"detail": detail})
+
+
+async def statement_timeout_handler(request: Request, exc: OperationalError) -> JSONResponse:
+    error = guardrail_error(exc)
+    if error is None:
+        raise exc
+    logger.warning("Statement timeout on %s %s", request.method, request.url.path)
+    return JSONResponse(
+        status_code=error[0],
+        content={"detail": error[1]},
+        headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+    )
@@ -0,0 +1,230 @@
+import cProfile
+import inspect
+import io
+import logging
+import os
+import pstats
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from functools import wraps
+from typing import Callable, Optional
+
+from fastapi import Request
+from fastapi.responses import PlainTextResponse
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# ?profile=1 runs the endpoint under cProfile, opt in (development, or behind access control)
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+SLOW_REQUEST_SECONDS = float(os.getenv("SLOW_REQUEST_SECONDS", "1.0"))
+
+# Latency histogram buckets in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+@dataclass
+class RequestTimings:
+    """
+    Timings collected while serving one request.
+    """
+    started: float = field(default_factory=time.perf_counter)
+    sql_count: int = 0
+    sql_seconds: float = 0.0
+    handler_seconds: float = 0.0
+    profile: bool = False
+    profile_report: Optional[str] = None
+
+
+_current_timings: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+
+def current_timings() -> Optional[RequestTimings]:
+    return _current_timings.get()
+
+
+# SQL timing hooks, registered on the Engine class so they cover every engine
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_started"].pop()
+    timings = _current_timings.get()
+    if timings is not None:
+        timings.sql_count += 1
+        timings.sql_seconds += time.perf_counter() - started
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(context):
+    # A failed statement never reaches after_cursor_execute, drop its start time here
+    conn = context.connection
+    if conn is not None and conn.info.get("query_started"):
+        conn.info["query_started"].pop()
+
+
+class TimedRoute(APIRoute):
+    """
+    APIRoute that times the endpoint function itself, so the middleware can split
+    total time into SQL, ORM/handler work and everything around the endpoint.
+    Also runs the endpoint under cProfile when `?profile=1` is requested.
+    """
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        super().__init__(path, _timed_endpoint(endpoint), **kwargs)
+
+
+def _timed_endpoint(endpoint: Callable) -> Callable:
+    # include_router rebuilds routes with the same route class, don't wrap twice
+    if getattr(endpoint, "_timed", False):
+        return endpoint
+
+    if inspect.iscoroutinefunction(endpoint):
+        @wraps(endpoint)
+        async def async_wrapper(*args, **kwargs):
+            timings = _current_timings.get()
+            if timings is None:
+                return await endpoint(*args, **kwargs)
+            started = time.perf_counter()
+            profiler = cProfile.Profile() if timings.profile else None
+            if profiler:
+                profiler.enable()
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                if profiler:
+                    profiler.disable()
+                    timings.profile_report = _format_profile(profiler)
+                timings.handler_seconds += time.perf_counter() - started
+        async_wrapper._timed = True
+        return async_wrapper
+
+    @wraps(endpoint)
+    def wrapper(*args, **kwargs):
+        timings = _current_timings.get()
+        if timings is None:
+            return endpoint(*args, **kwargs)
+        started = time.perf_counter()
+        # Sync endpoints run in a worker thread, so the profiler is enabled there
+        profiler = cProfile.Profile() if timings.profile else None
+        if profiler:
+            profiler.enable()
+        try:
+            return endpoint(*args, **kwargs)
+        finally:
+            if profiler:
+                profiler.disable()
+                timings.profile_report = _format_profile(profiler)
+            timings.handler_seconds += time.perf_counter() - started
+    wrapper._timed = True
+    return wrapper
+
+
+def _format_profile(profiler: cProfile.Profile, limit: int = 40) -> str:
+    out = io.StringIO()
+    stats = pstats.Stats(profiler, stream=out)
+    stats.strip_dirs().sort_stats("cumulative").print_stats(limit)
+    return out.getvalue()
+
+
+class LatencyMetrics:
+    """
+    Per-route request latency histograms and SQL counters in Prometheus text format.
+    """
+
+    def __init__(self, buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        # (method, route) -> bucket counts, count, sum and SQL totals
+        self._series: dict[tuple[str, str], dict] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, method: str, route: str, seconds: float, timings: RequestTimings) -> None:
+        with self._lock:
+            series = self._series.setdefault(
+                (method, route),
+                {"buckets": [0] * len(self.buckets), "count": 0, "sum": 0.0, "sql_count": 0, "sql_seconds": 0.0},
+            )
+            for i, upper in enumerate(self.buckets):
+                if seconds <= upper:
+                    series["buckets"][i] += 1
+            series["count"] += 1
+            series["sum"] += seconds
+            series["sql_count"] += timings.sql_count
+            series["sql_seconds"] += timings.sql_seconds
+
+    def render(self) -> str:
+        lines = [
+            "# HELP http_request_duration_seconds Request latency by route.",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        with self._lock:
+            series = sorted(self._series.items())
+            for (method, route), s in series:
+                labels = f'method="{method}",route="{route}"'
+                for upper, count in zip(self.buckets, s["buckets"]):
+                    lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{upper}"}} {count}')
+                lines.append(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {s["count"]}')
+                lines.append(f"http_request_duration_seconds_sum{{{labels}}} {s['sum']:.6f}")
+                lines.append(f"http_request_duration_seconds_count{{{labels}}} {s['count']}")
+
+            lines.append("# HELP db_statements_total SQL statements executed while serving requests.")
+            lines.append("# TYPE db_statements_total counter")
+            for (method, route), s in series:
+                lines.append(f'db_statements_total{{method="{method}",route="{route}"}} {s["sql_count"]}')
+
+            lines.append("# HELP db_statement_duration_seconds_total Time spent in SQL while serving requests.")
+            lines.append("# TYPE db_statement_duration_seconds_total counter")
+            for (method, route), s in series:
+                lines.append(f'db_statement_duration_seconds_total{{method="{method}",route="{route}"}} {s["sql_seconds"]:.6f}')
+        return "\n".join(lines) + "\n"
+
+
+latency_metrics = LatencyMetrics()
+
+
+async def timing_middleware(request: Request, call_next):
+    """
+    Collect per-request timings, add a Server-Timing header and record route latency.
+    With `?profile=1` the response is replaced by a cProfile summary of the endpoint.
+    """
+    timings = RequestTimings(
+        profile=PROFILING_ENABLED and request.query_params.get("profile") == "1",
+    )
+    token = _current_timings.set(timings)
+    try:
+        response = await call_next(request)
+    finally:
+        _current_timings.reset(token)
+
+    total = time.perf_counter() - timings.started
+    route = request.scope.get("route")
+    route_path = route.path if route is not None else "unmatched"
+    latency_metrics.observe(request.method, route_path, total, timings)
+
+    if total >= SLOW_REQUEST_SECONDS:
+        logger.warning(
+            "Slow request %s %s: %.3fs total, %d SQL statements in %.3fs",
+            request.method, request.url.path, total, timings.sql_count, timings.sql_seconds,
+        )
+
+    if timings.profile and timings.profile_report is not None:
+        response = PlainTextResponse(timings.profile_report)
+
+    # Handler time minus SQL is ORM hydration plus Python work. The rest is overhead around the
+    # endpoint: dependencies, request validation, response serialization, compression, middleware
+    orm_seconds = max(timings.handler_seconds - timings.sql_seconds, 0.0)
+    overhead_seconds = max(total - timings.handler_seconds, 0.0)
+    response.headers["Server-Timing"] = ", ".join([
+        f'sql;dur={timings.sql_seconds * 1000:.1f};desc="{timings.sql_count} queries"',
+        f"orm;dur={orm_seconds * 1000:.1f}",
+        f"overhead;dur={overhead_seconds * 1000:.1f}",
+        f"total;dur={total * 1000:.1f}",
+    ])
+    return response
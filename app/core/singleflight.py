@@ -0,0 +1,84 @@
+import threading
+from typing import Any, Callable, Optional
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent calls within the process. The first caller for a key (the leader)
+    runs the function; callers arriving while it runs (followers) block until it finishes and get
+    the same result, or the same exception. Nothing is kept once the call completes, caching is
+    left to ResultCache.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: dict[str, _Call] = {}
+        # name -> [calls run, calls coalesced onto a running one]
+        self._counts: dict[str, list[int]] = {}
+
+    def do(self, key: str, fn: Callable[[], Any], name: str = "default") -> Any:
+        with self._lock:
+            counts = self._counts.setdefault(name, [0, 0])
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                counts[0] += 1
+            else:
+                counts[1] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "in_flight": len(self._calls),
+                "by_name": {
+                    name: {"executed": executed, "coalesced": coalesced}
+                    for name, (executed, coalesced) in sorted(self._counts.items())
+                },
+            }
+
+    def render(self) -> str:
+        """
+        Prometheus-style counters, appended to /metrics.
+        """
+        lines = [
+            "# HELP singleflight_calls_total Cache misses computed, and requests that waited on an identical in-flight computation instead.",
+            "# TYPE singleflight_calls_total counter",
+        ]
+        with self._lock:
+            for name, (executed, coalesced) in sorted(self._counts.items()):
+                lines.append(f'singleflight_calls_total{{name="{name}",role="executed"}} {executed}')
+                lines.append(f'singleflight_calls_total{{name="{name}",role="coalesced"}} {coalesced}')
+        return "\n".join(lines) + "\n"
+
+
+# Shared instance for the stats and viz result builders
+inflight = SingleFlight()
@@ -1,4 +1,6 @@
-from app.core.database import engine
+from sqlalchemy import inspect, text
+
+from app.core.database import SessionLocal, engine
 from app.core.base import Base
 
 import app.models.traffic_collisions
@@ -10,9 +12,48 @@ import app.models.light_condition
 import app.models.weather_condition
 import app.models.road_condition
 import app.models.address_type
+import app.models.intersection
+import app.models.condition_pair_stats
+import app.models.harm_profile
 
 def create_tables():
     Base.metadata.create_all(bind=engine)
+    add_missing_columns()
+    backfill_columns()
+
+
+def add_missing_columns():
+    """
+    create_all skips tables that already exist, so add columns (and their indexes)
+    that were added to a model after the table was created.
+    """
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    column_type = column.type.compile(dialect=engine.dialect)
+                    conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+
+
+def backfill_columns():
+    """
+    Compute derived columns and aggregate tables for rows imported before they were added.
+    """
+    # Imported here so the model imports above stay free of importer dependencies
+    from app.conditions import rebuild_if_empty
+    from app.data_import.seattle_collisions import backfill_local_time
+    from app.harm import ensure_default_profile, score_harm
+
+    with SessionLocal() as db:
+        backfill_local_time(db)
+        ensure_default_profile(db)
+        score_harm(db)
+        db.commit()
+        rebuild_if_empty(db)
 
 if __name__ == "__main__":
     create_tables()
\ No newline at end of file
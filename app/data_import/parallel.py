@@ -0,0 +1,225 @@
+import argparse
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Iterator, Optional
+
+import requests
+from sqlalchemy import func
+
+from app.core.database import SessionLocal, engine
+from app.core.logging import setup_logging
+from app.data_import import seattle_collisions
+from app.data_import.seattle_collisions import (
+    BASE_URL,
+    CODE_DESC_LOOKUPS,
+    NAME_LOOKUPS,
+    CollisionRecord,
+    LookupResolver,
+    build_collision_row,
+    iter_records,
+    write_changed_rows,
+)
+from app.data_import.streaming import CHUNK_SIZE
+from app.intersections import refresh_intersections
+from app.models.traffic_collisions import TrafficCollision
+
+logger = logging.getLogger(__name__)
+
+
+class ArcGISRangeSource:
+    """
+    ArcGIS query endpoint addressed by INCKEY ranges (where clauses) instead of resultOffset,
+    so independent workers can page through disjoint slices of the layer.
+    """
+
+    def __init__(self, base_url: str = BASE_URL, page_size: Optional[int] = None):
+        self.base_url = base_url
+        self.page_size = page_size or seattle_collisions.BATCH_SIZE
+
+    def _query(self, **params) -> dict:
+        response = requests.get(self.base_url, params={"f": "json", **params})
+        response.raise_for_status()
+        data = response.json()
+        if "error" in data:
+            raise RuntimeError(f"ArcGIS query failed: {data['error']}")
+        return data
+
+    def key_bounds(self) -> tuple[int, int, int]:
+        """
+        Return (min INCKEY, max INCKEY, record count) for the whole layer.
+        """
+        stats = [
+            {"statisticType": kind, "onStatisticField": "INCKEY", "outStatisticFieldName": f"{kind}_key"}
+            for kind in ("min", "max", "count")
+        ]
+        attrs = self._query(where="1=1", outStatistics=json.dumps(stats))["features"][0]["attributes"]
+        return attrs["min_key"], attrs["max_key"], attrs["count_key"]
+
+    def count(self, lo: int, hi: int) -> int:
+        return self._query(where=f"INCKEY >= {lo} AND INCKEY < {hi}", returnCountOnly="true")["count"]
+
+    def distinct_values(self, fields: list[str]) -> list[dict]:
+        data = self._query(
+            where="1=1",
+            outFields=",".join(fields),
+            returnDistinctValues="true",
+            returnGeometry="false",
+        )
+        return [feature["attributes"] for feature in data.get("features", [])]
+
+    def fetch_range(self, lo: int, hi: int, after: Optional[int]) -> Iterator[CollisionRecord]:
+        """
+        Next page of records with lo <= INCKEY < hi and INCKEY > after (keyset pagination),
+        decoded as the response streams in.
+        """
+        where = f"INCKEY >= {lo} AND INCKEY < {hi}"
+        if after is not None:
+            where += f" AND INCKEY > {after}"
+        params = {
+            "f": "json",
+            "where": where,
+            "outFields": "*",
+            "orderByFields": "INCKEY",
+            "resultRecordCount": self.page_size,
+            "returnGeometry": "true",
+            "outSR": "4326",
+        }
+        with requests.get(self.base_url, params=params, stream=True) as response:
+            response.raise_for_status()
+            yield from iter_records(response.iter_content(CHUNK_SIZE))
+
+
+def plan_ranges(min_key: int, max_key: int, partitions: int) -> list[tuple[int, int]]:
+    """
+    Split [min_key, max_key] into `partitions` half-open INCKEY ranges of equal width.
+    """
+    span = max_key - min_key + 1
+    partitions = max(1, min(partitions, span))
+    edges = [min_key + span * i // partitions for i in range(partitions)] + [max_key + 1]
+    return list(zip(edges[:-1], edges[1:]))
+
+
+def resolve_lookups(source) -> dict:
+    """
+    Create every distinct lookup value up front so workers rarely have to.
+    Returns LookupResolver ids, which are picklable and shared with each worker.
+    """
+    with SessionLocal() as db:
+        resolver = LookupResolver(db)
+        for model, (code_field, desc_field) in CODE_DESC_LOOKUPS.items():
+            for attrs in source.distinct_values([code_field, desc_field]):
+                resolver.code_desc(model, attrs.get(code_field), attrs.get(desc_field))
+        for model, field in NAME_LOOKUPS.items():
+            for attrs in source.distinct_values([field]):
+                resolver.name(model, attrs.get(field))
+        db.commit()
+        return resolver.ids
+
+
+def _init_worker() -> None:
+    # Forked workers must not reuse the coordinator's pooled connections
+    engine.dispose(close=False)
+
+
+def import_range(source, lo: int, hi: int, lookup_ids: dict) -> tuple[int, set[int]]:
+    """
+    Import every record with lo <= INCKEY < hi on this worker's own connection.
+    Unchanged records are skipped. Returns the number of records fetched and the changed int_keys.
+    """
+    fetched = 0
+    after = None
+    int_keys = set()
+
+    with SessionLocal() as db:
+        lookups = LookupResolver(db, lookup_ids)
+        while True:
+            rows = [build_collision_row(record, lookups) for record in source.fetch_range(lo, hi, after)]
+            if not rows:
+                break
+
+            int_keys |= write_changed_rows(db, rows)
+            db.commit()
+
+            fetched += len(rows)
+            after = rows[-1]["inc_key"]
+    return fetched, int_keys
+
+
+def check_consistency(source, ranges: list[tuple[int, int]]) -> list[dict]:
+    """
+    Compare source and database row counts per range, returning the ranges that differ.
+    """
+    mismatches = []
+    with SessionLocal() as db:
+        for lo, hi in ranges:
+            expected = source.count(lo, hi)
+            actual = (
+                db.query(func.count(TrafficCollision.id))
+                .filter(TrafficCollision.inc_key >= lo, TrafficCollision.inc_key < hi)
+                .scalar()
+            )
+            if expected != actual:
+                mismatches.append({"range": [lo, hi], "source": expected, "database": actual})
+    return mismatches
+
+
+def parallel_import(source=None, workers: Optional[int] = None, partitions: Optional[int] = None) -> dict:
+    """
+    Coordinator: resolve lookups once, fan INCKEY ranges out to a process pool,
+    then verify per-range counts against the source.
+    """
+    source = source or ArcGISRangeSource()
+    workers = workers or os.cpu_count() or 1
+    # More ranges than workers keeps every core busy when ranges are uneven
+    partitions = partitions or workers * 4
+
+    started = time.perf_counter()
+    min_key, max_key, total = source.key_bounds()
+    ranges = plan_ranges(min_key, max_key, partitions)
+    lookup_ids = resolve_lookups(source)
+    logger.info("Importing %d records in %d ranges on %d workers", total, len(ranges), workers)
+
+    fetched = 0
+    int_keys = set()
+    engine.dispose()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        futures = {pool.submit(import_range, source, lo, hi, lookup_ids): (lo, hi) for lo, hi in ranges}
+        for future in as_completed(futures):
+            range_fetched, range_int_keys = future.result()
+            fetched += range_fetched
+            int_keys |= range_int_keys
+            logger.info("Range %s done (%d/%d records)", futures[future], fetched, total)
+
+    # Intersections span INCKEY ranges, so their aggregates are refreshed once here
+    with SessionLocal() as db:
+        refresh_intersections(db, int_keys)
+        db.commit()
+
+    import_seconds = time.perf_counter() - started
+    mismatches = check_consistency(source, ranges)
+    if mismatches:
+        logger.warning("%d ranges differ from the source: %s", len(mismatches), mismatches)
+
+    return {
+        "source_records": total,
+        "fetched_records": fetched,
+        "ranges": len(ranges),
+        "workers": workers,
+        "import_seconds": round(import_seconds, 3),
+        "records_per_second": round(fetched / import_seconds, 1) if import_seconds else None,
+        "mismatched_ranges": mismatches,
+    }
+
+
+if __name__ == "__main__":
+    setup_logging()
+
+    parser = argparse.ArgumentParser(description="Parallel import of Seattle collisions by INCKEY range")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--partitions", type=int, default=None, help="INCKEY ranges (default: 4 per worker)")
+    args = parser.parse_args()
+
+    print(parallel_import(workers=args.workers, partitions=args.partitions))
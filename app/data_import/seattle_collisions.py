@@ -1,8 +1,17 @@
-import requests
+import hashlib
+from collections import namedtuple
 from datetime import datetime, timezone
+from typing import Callable, Iterable, Iterator, Optional
 from zoneinfo import ZoneInfo
+from sqlalchemy import select, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
+from app.conditions import apply_condition_deltas
+from app.core.changes import notify_changes
 from app.core.database import SessionLocal
+from app.harm import score_harm
+from app.intersections import refresh_intersections
 from app.models.traffic_collisions import TrafficCollision
 from app.models.severity import Severity
 from app.models.collision_type import CollisionType
@@ -12,18 +21,66 @@ from app.models.light_condition import LightCondition
 from app.models.weather_condition import WeatherCondition
 from app.models.road_condition import RoadCondition
 from app.models.address_type import AddressType
+from app.data_import.streaming import CHUNK_SIZE, iter_features
 
 BASE_URL = "https://services.arcgis.com/ZOyb2t4B0UYuYNYH/ArcGIS/rest/services/SDOT_Collisions_All_Years/FeatureServer/0/query"
 BATCH_SIZE = 2000
 
-def fetch_collisions(offset: int = 0) -> dict:
+SEATTLE_TZ = ZoneInfo("America/Los_Angeles")
+
+# Lookup models and the ArcGIS fields they are built from
+CODE_DESC_LOOKUPS = {
+    Severity: ("SEVERITYCODE", "SEVERITYDESC"),
+    SDOTCollisionType: ("SDOT_COLCODE", "SDOT_COLDESC"),
+}
+NAME_LOOKUPS = {
+    CollisionType: "COLLISIONTYPE",
+    JunctionType: "JUNCTIONTYPE",
+    LightCondition: "LIGHTCOND",
+    WeatherCondition: "WEATHER",
+    RoadCondition: "ROADCOND",
+    AddressType: "ADDRTYPE",
+}
+
+# ArcGIS attributes kept from each feature, everything else is dropped while decoding
+STORED_FIELDS = (
+    "INCKEY", "INTKEY", "LOCATION", "INCDTTM", "INCDATE",
+    "SEVERITYCODE", "SEVERITYDESC", "SDOT_COLCODE", "SDOT_COLDESC",
+    "COLLISIONTYPE", "JUNCTIONTYPE", "LIGHTCOND", "WEATHER", "ROADCOND", "ADDRTYPE",
+    "PERSONCOUNT", "PEDCOUNT", "PEDCYLCOUNT", "VEHCOUNT", "INJURIES", "SERIOUSINJURIES", "FATALITIES",
+)
+CollisionRecord = namedtuple("CollisionRecord", STORED_FIELDS + ("x", "y"))
+
+
+def to_record(attrs: dict, geometry: Optional[dict]) -> CollisionRecord:
     """
-    Fetch a batch of collision records from Seattle ArcGIS API.
+    Compact tuple of the stored attributes plus point coordinates.
+    """
+    geometry = geometry or {}
+    return CollisionRecord(*(attrs.get(field) for field in STORED_FIELDS), geometry.get("x"), geometry.get("y"))
+
+
+def iter_records(chunks: Iterable[bytes]) -> Iterator[CollisionRecord]:
+    """
+    Stream CollisionRecords out of a raw ArcGIS JSON response body.
+    """
+    for feature in iter_features(chunks):
+        yield to_record(feature["attributes"], feature.get("geometry"))
+
+
+def page_records(data: dict) -> list[CollisionRecord]:
+    """
+    CollisionRecords from an already decoded ArcGIS JSON page.
     """
+    return [to_record(f["attributes"], f.get("geometry")) for f in data.get("features", [])]
 
-    # Query parameters sent to ArcGIS REST API
-    params = {
-        "where": "1=1", # Return all records
+
+def page_params(offset: int = 0, where: str = "1=1") -> dict:
+    """
+    Query parameters sent to ArcGIS REST API for one page.
+    """
+    return {
+        "where": where, # Return all records by default
         "outFields": "*",   # All available fields for each record
         "f": "json",    # Format in json
         "resultOffset" : offset,    # Pagination offset
@@ -33,12 +90,33 @@ def fetch_collisions(offset: int = 0) -> dict:
         "outSR": "4326",
     }
 
+
+def fetch_collisions(offset: int = 0, where: str = "1=1") -> dict:
+    """
+    Fetch a batch of collision records from Seattle ArcGIS API.
+    """
+
+    # The API imports this module for backfills only, keep the HTTP client out of its startup
+    import requests
+
     # Send GET request with params and return response JSON
-    response = requests.get(BASE_URL, params=params)
+    response = requests.get(BASE_URL, params=page_params(offset, where))
     response.raise_for_status()
     return response.json()
 
 
+def stream_collisions(offset: int = 0, where: str = "1=1") -> Iterator[CollisionRecord]:
+    """
+    Fetch a batch of collision records, decoding features as the response body arrives
+    instead of materializing the whole page.
+    """
+    import requests
+
+    with requests.get(BASE_URL, params=page_params(offset, where), stream=True) as response:
+        response.raise_for_status()
+        yield from iter_records(response.iter_content(CHUNK_SIZE))
+
+
 def get_or_create_by_code_desc(db, model, code, desc):
     """
     Helper function to get or create lookup table.
@@ -47,7 +125,7 @@ def get_or_create_by_code_desc(db, model, code, desc):
         code_value = None
     else:
         code_value = str(code)
-    
+
     if desc is None:
         desc_value = None
     else:
@@ -59,157 +137,239 @@ def get_or_create_by_code_desc(db, model, code, desc):
         row = db.query(model).filter_by(desc=desc_value).first()
     else:
         return None
-    
+
     if row is None:
         row = model(code=code_value or "Unknown", desc=desc_value or "Unknown")
         db.add(row)
         db.flush()
-    
+
     return row.id
 
 
 def get_or_create_by_name(db, model, name):
     if not name:
         return None
-    
+
     row = db.query(model).filter_by(name=name).first()
-    
+
     if row is None:
         row = model(name=name)
         db.add(row)
         db.flush()
-    
+
     return row.id
-        
 
-def import_collisions():
+
+class LookupResolver:
+    """
+    Resolves lookup values to ids and remembers them, so each distinct value
+    costs at most one query per import instead of one per record.
+    Can be seeded with ids resolved elsewhere (e.g. by the parallel import coordinator).
+    """
+
+    def __init__(self, db: Session, known_ids: Optional[dict] = None):
+        self.db = db
+        # (model name, code or name) -> id
+        self.ids: dict[tuple[str, str], Optional[int]] = dict(known_ids or {})
+
+    def code_desc(self, model, code, desc) -> Optional[int]:
+        key = (model.__name__, str(code) if code is not None else f"desc:{desc}")
+        if key not in self.ids:
+            self.ids[key] = self._create(lambda: get_or_create_by_code_desc(self.db, model, code, desc))
+        return self.ids[key]
+
+    def name(self, model, name) -> Optional[int]:
+        if not name:
+            return None
+        key = (model.__name__, name)
+        if key not in self.ids:
+            self.ids[key] = self._create(lambda: get_or_create_by_name(self.db, model, name))
+        return self.ids[key]
+
+    def _create(self, get_or_create: Callable[[], Optional[int]]) -> Optional[int]:
+        try:
+            with self.db.begin_nested():
+                return get_or_create()
+        except IntegrityError:
+            # Another import process created the same value first
+            return get_or_create()
+
+
+def parse_occurred_at(record: CollisionRecord) -> datetime:
+    """
+    Convert the local INCDTTM text (falling back to INCDATE epoch ms) to UTC.
+    """
+    incdttm = record.INCDTTM
+    for fmt in ("%m/%d/%Y %I:%M:%S %p", "%m/%d/%Y"):
+        try:
+            local_naive = datetime.strptime(incdttm, fmt)
+            local_dt = local_naive.replace(tzinfo=SEATTLE_TZ)
+            return local_dt.astimezone(timezone.utc)
+        except ValueError:
+            pass
+
+    return datetime.fromtimestamp(record.INCDATE/1000, tz=timezone.utc)
+
+
+def local_time_parts(occurred_at: datetime) -> dict:
+    """
+    Seattle local hour (0-23), day of week (0 = Monday) and month of a UTC timestamp.
+    """
+    local = occurred_at.astimezone(SEATTLE_TZ)
+    return {"local_hour": local.hour, "local_dow": local.weekday(), "local_month": local.month}
+
+
+def backfill_local_time(db: Session, batch_size: int = 100_000) -> int:
+    """
+    Fill the local time columns of rows stored before they existed. Returns rows updated.
+    Commits per batch of ids so a large table is not rewritten in one transaction.
+    """
+    table = TrafficCollision.__tablename__
+    low, high = db.execute(text(f"SELECT min(id), max(id) FROM {table} WHERE local_hour IS NULL")).one()
+    if low is None:
+        return 0
+
+    updated = 0
+    for start in range(low, high + 1, batch_size):
+        updated += db.execute(text(f"""
+            UPDATE {table} SET
+                local_hour = extract(hour FROM occurred_at AT TIME ZONE :tz),
+                local_dow = extract(isodow FROM occurred_at AT TIME ZONE :tz) - 1,
+                local_month = extract(month FROM occurred_at AT TIME ZONE :tz)
+            WHERE id >= :start AND id < :end AND local_hour IS NULL
+        """), {"tz": SEATTLE_TZ.key, "start": start, "end": start + batch_size}).rowcount
+        db.commit()
+    return updated
+
+
+# Columns computed from other columns, left out of the fingerprint so adding one does not mark every row changed
+DERIVED_COLUMNS = ("local_hour", "local_dow", "local_month")
+
+
+def record_hash(row: dict) -> int:
+    """
+    63-bit fingerprint of a normalized row (fits BIGINT and is never negative).
+    """
+    excluded = ("record_hash", *DERIVED_COLUMNS)
+    values = repr(tuple(row[column] for column in sorted(row) if column not in excluded))
+    digest = hashlib.blake2b(values.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") >> 1
+
+
+def build_collision_row(record: CollisionRecord, lookups: LookupResolver) -> dict:
+    """
+    Map one ArcGIS record to traffic_collisions column values, including its record_hash.
+    """
+    row = {
+        "inc_key": record.INCKEY,
+        "int_key": record.INTKEY,
+        "location": record.LOCATION,
+        "lon": record.x,
+        "lat": record.y,
+        "occurred_at": parse_occurred_at(record),
+        "severity_id": lookups.code_desc(Severity, record.SEVERITYCODE, record.SEVERITYDESC),
+        "sdot_collision_type_id": lookups.code_desc(SDOTCollisionType, record.SDOT_COLCODE, record.SDOT_COLDESC),
+        "collision_type_id": lookups.name(CollisionType, record.COLLISIONTYPE),
+        "junction_type_id": lookups.name(JunctionType, record.JUNCTIONTYPE),
+        "light_condition_id": lookups.name(LightCondition, record.LIGHTCOND),
+        "weather_condition_id": lookups.name(WeatherCondition, record.WEATHER),
+        "road_condition_id": lookups.name(RoadCondition, record.ROADCOND),
+        "address_type_id": lookups.name(AddressType, record.ADDRTYPE),
+        "person_count": record.PERSONCOUNT,
+        "ped_count": record.PEDCOUNT,
+        "pedcyl_count": record.PEDCYLCOUNT,
+        "veh_count": record.VEHCOUNT,
+        "injuries": record.INJURIES,
+        "serious_injuries": record.SERIOUSINJURIES,
+        "fatalities": record.FATALITIES,
+    }
+    row.update(local_time_parts(row["occurred_at"]))
+    row["record_hash"] = record_hash(row)
+    return row
+
+
+# Columns reported in change events, for new rows and for the previous version of updated ones
+CHANGE_COLUMNS = ("inc_key", "int_key", "occurred_at")
+
+
+def write_changed_rows(db: Session, rows: list[dict]) -> set[int]:
+    """
+    Upsert only rows that are new or whose record_hash differs from the stored one,
+    and queue change events for them. Unchanged rows cause no writes and no events.
+    Returns the int_keys of the written rows and of their previous versions.
+    """
+    table = TrafficCollision.__table__
+    stored = {
+        row.inc_key: row
+        for row in db.execute(
+            select(table.c.record_hash, *(table.c[c] for c in CHANGE_COLUMNS))
+            .where(table.c.inc_key.in_([row["inc_key"] for row in rows]))
+        )
+    }
+
+    changed, previous = [], []
+    for row in rows:
+        old = stored.get(row["inc_key"])
+        if old is None:
+            changed.append(row)
+        elif old.record_hash != row["record_hash"]:
+            changed.append(row)
+            previous.append(dict(old._mapping))
+
+    if changed:
+        # Take the stored versions out of the condition tables before they are overwritten
+        apply_condition_deltas(db, [row["inc_key"] for row in previous], -1)
+
+        # Core upsert so psycopg batches the rows (executemany); the WHERE keeps concurrent imports from rewriting equal rows
+        statement = insert(table)
+        statement = statement.on_conflict_do_update(
+            index_elements=["inc_key"],
+            set_={column: statement.excluded[column] for column in changed[0] if column != "inc_key"},
+            where=table.c.record_hash.is_distinct_from(statement.excluded.record_hash),
+        )
+        db.execute(statement, changed)
+        score_harm(db, [row["inc_key"] for row in changed])
+        apply_condition_deltas(db, [row["inc_key"] for row in changed], 1)
+        notify_changes(db, changed + previous)
+    return {row["int_key"] for row in changed + previous if row["int_key"] is not None}
+
+
+def import_collisions(fetch_records: Callable[[int], Iterable[CollisionRecord]] = stream_collisions):
     """
     Main import function that fetches collision data in batches,
-    converts API records into ORM objects for mapping,
-    and inserts them into PostgreSQL.
+    normalizes API records into traffic_collisions rows,
+    and writes the new or changed ones to PostgreSQL.
+    `fetch_records(offset)` yields one page of CollisionRecords, defaults to streaming the live API.
     """
     offset = 0
     db: Session = SessionLocal()
+    lookups = LookupResolver(db)
+    int_keys = set()
 
     try:
         # Loop while API returns records
         while True:
-            data = fetch_collisions(offset)
-
-            # Extract features from response 
-            features = data.get("features", [])
+            # Normalize each record as it is decoded from the response
+            rows = [build_collision_row(record, lookups) for record in fetch_records(offset)]
 
-            if not features:
+            if not rows:
                 break
 
-            # Loop over each feature (collision record)
-            for feature in features:
-                # Get feature attributes and geometry
-                attrs = feature["attributes"]
-                geometry = feature.get("geometry") or {}
-
-                # Convert PST time to UTC
-                occurred_at = None
-                incdttm = attrs["INCDTTM"]
-                for fmt in ("%m/%d/%Y %I:%M:%S %p", "%m/%d/%Y"):
-                    try:
-                        local_naive = datetime.strptime(incdttm, fmt)
-                        local_dt = local_naive.replace(tzinfo=ZoneInfo("America/Los_Angeles"))
-                        occurred_at = local_dt.astimezone(timezone.utc)
-                        break
-                    except ValueError:
-                        pass
-
-                if occurred_at is None:
-                    occurred_at = datetime.fromtimestamp(attrs["INCDATE"]/1000, tz=timezone.utc)
-
-                # Create or get lookup tables
-                severity_id = get_or_create_by_code_desc(
-                    db=db,
-                    model=Severity,
-                    code=attrs["SEVERITYCODE"],
-                    desc=attrs["SEVERITYDESC"]
-                )
-
-                sdot_collision_type_id = get_or_create_by_code_desc(
-                    db=db,
-                    model=SDOTCollisionType,
-                    code=attrs["SDOT_COLCODE"],
-                    desc=attrs["SDOT_COLDESC"]
-                )
-
-                collision_type_id = get_or_create_by_name(
-                    db=db,
-                    model=CollisionType,
-                    name=attrs["COLLISIONTYPE"]
-                )
-
-                junction_type_id = get_or_create_by_name(
-                    db=db,
-                    model=JunctionType,
-                    name=attrs["JUNCTIONTYPE"]
-                )
-
-                light_condition_id = get_or_create_by_name(
-                    db=db,
-                    model=LightCondition,
-                    name=attrs["LIGHTCOND"]
-                )
-
-                weather_condition_id = get_or_create_by_name(
-                    db=db,
-                    model=WeatherCondition,
-                    name=attrs["WEATHER"]
-                )
-
-                road_condition_id = get_or_create_by_name(
-                    db=db,
-                    model=RoadCondition,
-                    name=attrs["ROADCOND"]
-                )
-
-                address_type_id = get_or_create_by_name(
-                    db=db,
-                    model=AddressType,
-                    name=attrs["ADDRTYPE"]
-                )
-
-                # Create new ORM object mapped to traffic_collisions table
-                collision = TrafficCollision(
-                    inc_key=attrs["INCKEY"],
-                    int_key=attrs["INTKEY"],
-                    location=attrs["LOCATION"],
-                    lon=geometry.get("x"),
-                    lat=geometry.get("y"),
-                    occurred_at=occurred_at,
-                    severity_id=severity_id,
-                    sdot_collision_type_id=sdot_collision_type_id, 
-                    collision_type_id=collision_type_id,
-                    junction_type_id=junction_type_id,
-                    light_condition_id=light_condition_id,
-                    weather_condition_id=weather_condition_id,
-                    road_condition_id=road_condition_id,
-                    address_type_id=address_type_id,
-                    person_count=attrs["PERSONCOUNT"],
-                    ped_count=attrs["PEDCOUNT"],
-                    pedcyl_count=attrs["PEDCYLCOUNT"],
-                    veh_count=attrs["VEHCOUNT"],
-                    injuries=attrs["INJURIES"],
-                    serious_injuries=attrs["SERIOUSINJURIES"],
-                    fatalities=attrs["FATALITIES"]
-                )
-
-                # Add object to session for insertion
-                db.add(collision)
+            # Skip unchanged rows, write the rest and tell running API instances what changed
+            int_keys |= write_changed_rows(db, rows)
 
             # Commit session transaction
             db.commit()
             offset += BATCH_SIZE
 
+        # Recompute the intersection aggregates once, for the intersections that changed
+        refresh_intersections(db, int_keys)
+        db.commit()
+
     finally:
         db.close()
 
 
 if __name__ == "__main__":
     import_collisions()
-    
+
@@ -0,0 +1,326 @@
+import argparse
+import json
+import logging
+import math
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Iterator, Optional
+
+from sqlalchemy import func, select, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.conditions import rebuild_condition_stats
+from app.core.database import SessionLocal
+from app.core.logging import setup_logging
+from app.data_import.seattle_collisions import backfill_local_time
+from app.harm import score_harm
+from app.intersections import refresh_intersections
+from app.models import (
+    AddressType,
+    CollisionType,
+    JunctionType,
+    LightCondition,
+    RoadCondition,
+    SDOTCollisionType,
+    Severity,
+    TrafficCollision,
+    WeatherCondition,
+)
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_PATH = os.getenv("SNAPSHOT_PATH")
+
+MAGIC = b"SEASNAP1"
+VERSION = 1
+ALIGNMENT = 8
+# pg_advisory_xact_lock key held while seeding, so workers starting together seed once
+SEED_LOCK_KEY = 0x5EA5EED
+
+LOOKUP_MODELS = [Severity, SDOTCollisionType, CollisionType, JunctionType, LightCondition, WeatherCondition, RoadCondition, AddressType]
+
+# (column, array typecode); NULL is stored as -1 for ints and NaN for floats
+FACT_COLUMNS = [
+    ("id", "q"),
+    ("inc_key", "q"),
+    ("int_key", "i"),
+    ("location", "i"),          # index into the header's location strings
+    ("lon", "f"),
+    ("lat", "f"),
+    ("occurred_at", "q"),       # microseconds since the epoch, UTC
+    ("person_count", "h"),
+    ("ped_count", "h"),
+    ("pedcyl_count", "h"),
+    ("veh_count", "h"),
+    ("injuries", "h"),
+    ("serious_injuries", "h"),
+    ("fatalities", "h"),
+    ("severity_id", "h"),
+    ("collision_type_id", "h"),
+    ("sdot_collision_type_id", "h"),
+    ("junction_type_id", "h"),
+    ("light_condition_id", "h"),
+    ("weather_condition_id", "h"),
+    ("road_condition_id", "h"),
+    ("address_type_id", "h"),
+    ("record_hash", "q"),       # never negative, see seattle_collisions.record_hash
+    ("local_hour", "b"),
+    ("local_dow", "b"),
+    ("local_month", "b"),
+]
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+def export_snapshot(db: Session, path: Path, chunk_size: int = 50_000) -> int:
+    """
+    Write the fact and lookup tables to a columnar snapshot file. Returns the number of collisions.
+
+    Layout: MAGIC, uint32 header length, JSON header (lookup rows, location strings,
+    column offsets), then one 8-byte aligned little-endian array per fact column.
+    """
+    lookups = {}
+    for model in LOOKUP_MODELS:
+        columns = [c.name for c in model.__table__.columns]
+        rows = db.execute(select(*model.__table__.columns).order_by(model.id)).all()
+        lookups[model.__tablename__] = {"columns": columns, "rows": [list(row) for row in rows]}
+
+    arrays = {name: array(code) for name, code in FACT_COLUMNS}
+    locations: dict[str, int] = {}
+    table = TrafficCollision.__table__
+    statement = select(*(table.c[name] for name, _ in FACT_COLUMNS)).order_by(table.c.id)
+
+    for row in db.execute(statement.execution_options(yield_per=chunk_size)):
+        for (name, code), value in zip(FACT_COLUMNS, row):
+            if name == "location":
+                value = -1 if value is None else locations.setdefault(value, len(locations))
+            elif name == "occurred_at":
+                value = (value - _EPOCH) // _MICROSECOND
+            elif value is None:
+                value = math.nan if code == "f" else -1
+            arrays[name].append(value)
+
+    rows = len(arrays["id"])
+    columns = []
+    offset = 0
+    for name, code in FACT_COLUMNS:
+        length = rows * arrays[name].itemsize
+        columns.append({"name": name, "type": code, "offset": offset, "length": length})
+        offset += _aligned(length)
+
+    header = json.dumps({
+        "version": VERSION,
+        "rows": rows,
+        "byteorder": "little",
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "lookups": lookups,
+        "locations": list(locations),
+        "columns": columns,
+    }).encode("utf-8")
+
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<I", len(header)))
+        f.write(header)
+        f.write(b"\0" * (_aligned(f.tell()) - f.tell()))
+        for name, _ in FACT_COLUMNS:
+            values = arrays[name]
+            if sys.byteorder != "little":
+                values.byteswap()
+            f.write(values.tobytes())
+            f.write(b"\0" * (_aligned(len(values) * values.itemsize) - len(values) * values.itemsize))
+    return rows
+
+
+def _aligned(n: int) -> int:
+    return (n + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+class Snapshot:
+    """
+    Memory-mapped snapshot. Fact columns are zero-copy typed memoryviews over the file,
+    so opening a snapshot costs only the header parse.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._file = open(self.path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f"{self.path} is not a collision snapshot")
+        (header_length,) = struct.unpack_from("<I", self._mmap, len(MAGIC))
+        header_start = len(MAGIC) + 4
+        header = json.loads(self._mmap[header_start:header_start + header_length])
+        if header["version"] != VERSION:
+            self.close()
+            raise ValueError(f"Unsupported snapshot version {header['version']}")
+
+        self.rows: int = header["rows"]
+        self.lookups: dict = header["lookups"]
+        self.locations: list[str] = header["locations"]
+        self.created_at: str = header["created_at"]
+
+        data_start = _aligned(header_start + header_length)
+        view = memoryview(self._mmap)
+        self.columns: dict = {}
+        for column in header["columns"]:
+            start = data_start + column["offset"]
+            values = view[start:start + column["length"]]
+            if sys.byteorder == header["byteorder"]:
+                self.columns[column["name"]] = values.cast(column["type"])
+            else:
+                # Byte-swapped copy on hosts with the other byte order
+                swapped = array(column["type"], values)
+                swapped.byteswap()
+                self.columns[column["name"]] = swapped
+        view.release()
+
+    def column(self, name: str):
+        return self.columns[name]
+
+    def records(self) -> Iterator[tuple]:
+        """
+        Decoded fact rows in FACT_COLUMNS order, with NULLs and timestamps restored.
+        """
+        # Columns added after the snapshot was written load as NULL
+        missing = [-1] * self.rows
+        columns = [self.columns.get(name, missing) for name, _ in FACT_COLUMNS]
+        locations = self.locations
+        for values in zip(*columns):
+            row = []
+            for (name, code), value in zip(FACT_COLUMNS, values):
+                if name == "location":
+                    value = locations[value] if value >= 0 else None
+                elif name == "occurred_at":
+                    value = _EPOCH + value * _MICROSECOND
+                elif code == "f":
+                    value = None if math.isnan(value) else value
+                elif value == -1:
+                    value = None
+                row.append(value)
+            yield tuple(row)
+
+    def close(self) -> None:
+        for values in getattr(self, "columns", {}).values():
+            if isinstance(values, memoryview):
+                values.release()
+        self._mmap.close()
+        self._file.close()
+
+    def __enter__(self) -> "Snapshot":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def seed_from_snapshot(db: Session, snapshot: Snapshot) -> int:
+    """
+    Load a snapshot into an empty database, keeping the original ids. Returns the number of collisions.
+    """
+    _lock_seed(db)
+    if db.query(TrafficCollision.id).first() is not None:
+        raise RuntimeError("traffic_collisions is not empty, snapshots are only loaded into a new database")
+
+    tables = {model.__tablename__: model.__table__ for model in LOOKUP_MODELS}
+    for name, lookup in snapshot.lookups.items():
+        rows = [dict(zip(lookup["columns"], row)) for row in lookup["rows"]]
+        if rows:
+            db.execute(insert(tables[name]).on_conflict_do_nothing(), rows)
+
+    table = TrafficCollision.__tablename__
+    columns = ", ".join(name for name, _ in FACT_COLUMNS)
+
+    # Per-row foreign key checks dominate the load; drop the constraints for the COPY
+    # and re-add them, which validates each one in a single pass (same transaction)
+    foreign_keys = db.execute(text(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+        f"WHERE conrelid = '{table}'::regclass AND contype = 'f'"
+    )).all()
+    for name, _ in foreign_keys:
+        db.execute(text(f'ALTER TABLE {table} DROP CONSTRAINT "{name}"'))
+
+    # psycopg 3 connection underneath the session
+    raw = db.connection().connection.driver_connection
+    with raw.cursor() as cursor:
+        with cursor.copy(f"COPY {table} ({columns}) FROM STDIN") as copy:
+            for row in snapshot.records():
+                copy.write_row(row)
+
+    for name, definition in foreign_keys:
+        db.execute(text(f'ALTER TABLE {table} ADD CONSTRAINT "{name}" {definition}'))
+
+    # Explicit ids were inserted, move the id sequences past them
+    for name in [table, *tables]:
+        db.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{name}', 'id'), COALESCE(MAX(id), 0) + 1, false) FROM {name}"
+        ))
+    score_harm(db)
+    refresh_intersections(db)
+    rebuild_condition_stats(db)
+    db.commit()
+    # Snapshots written before the local time columns existed load them as NULL
+    backfill_local_time(db)
+    return snapshot.rows
+
+
+def _lock_seed(db: Session) -> None:
+    # Held until the transaction ends; re-taking it in the same transaction does not block
+    db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": SEED_LOCK_KEY})
+
+
+def seed_if_empty(path: Path) -> Optional[int]:
+    """
+    Seed the database from `path` when traffic_collisions has no rows (replica warm start).
+    """
+    with SessionLocal() as db:
+        # Every worker starting against a new database sees it empty; the first to take
+        # the lock seeds it and the others find the rows once it commits. Lock before
+        # reading the table, or the readers' share locks block the seeder's DROP CONSTRAINT
+        _lock_seed(db)
+        if db.query(func.count(TrafficCollision.id)).scalar():
+            return None
+        with Snapshot(path) as snapshot:
+            started = time.perf_counter()
+            rows = seed_from_snapshot(db, snapshot)
+            logger.info("Seeded %d collisions from %s in %.1fs", rows, path, time.perf_counter() - started)
+            return rows
+
+
+if __name__ == "__main__":
+    setup_logging()
+
+    parser = argparse.ArgumentParser(description="Export or load a compact collision snapshot")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("export", help="Write DATABASE_URL to a snapshot").add_argument("path", type=Path)
+    commands.add_parser("load", help="Seed an empty DATABASE_URL from a snapshot").add_argument("path", type=Path)
+    commands.add_parser("info", help="Show snapshot header details").add_argument("path", type=Path)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    if args.command == "export":
+        with SessionLocal() as session:
+            rows = export_snapshot(session, args.path)
+        print(f"Wrote {rows} collisions to {args.path} ({args.path.stat().st_size / 1e6:.1f} MB) in {time.perf_counter() - started:.1f}s")
+    elif args.command == "load":
+        with SessionLocal() as session, Snapshot(args.path) as snap:
+            rows = seed_from_snapshot(session, snap)
+        print(f"Loaded {rows} collisions in {time.perf_counter() - started:.1f}s")
+    else:
+        with Snapshot(args.path) as snap:
+            print({
+                "rows": snap.rows,
+                "created_at": snap.created_at,
+                "locations": len(snap.locations),
+                "lookups": {name: len(lookup["rows"]) for name, lookup in snap.lookups.items()},
+            })
@@ -0,0 +1,313 @@
+import argparse
+import csv
+import logging
+import mmap
+import time
+from datetime import datetime, timezone
+from itertools import islice
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.conditions import apply_condition_deltas
+from app.core.changes import notify_changes
+from app.core.database import SessionLocal
+from app.core.logging import setup_logging
+from app.data_import import seattle_collisions
+from app.data_import.seattle_collisions import (
+    CHANGE_COLUMNS,
+    CollisionRecord,
+    LookupResolver,
+    build_collision_row,
+    stream_collisions,
+    to_record,
+)
+from app.data_import.streaming import iter_features, read_chunks
+from app.harm import score_harm
+from app.intersections import refresh_intersections
+from app.models.traffic_collisions import TrafficCollision
+
+logger = logging.getLogger(__name__)
+
+LOAD_BATCH_SIZE = 50_000
+
+# ArcGIS fields that are integers in the API but text in CSV dumps
+INT_FIELDS = {
+    "INCKEY", "INTKEY", "PERSONCOUNT", "PEDCOUNT", "PEDCYLCOUNT", "VEHCOUNT",
+    "INJURIES", "SERIOUSINJURIES", "FATALITIES",
+}
+
+
+class ArcGISSource:
+    """
+    Live ArcGIS layer, paged by offset.
+    """
+
+    def records(self) -> Iterator[CollisionRecord]:
+        offset = 0
+        while True:
+            count = 0
+            for record in stream_collisions(offset):
+                count += 1
+                yield record
+            if not count:
+                return
+            offset += seattle_collisions.BATCH_SIZE
+
+
+class GeoJSONSource:
+    """
+    SDOT GeoJSON bulk download. The file is memory-mapped and features are decoded one at a time.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+
+    def records(self) -> Iterator[CollisionRecord]:
+        with open(self.path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            for feature in iter_features(read_chunks(mapped)):
+                coordinates = (feature.get("geometry") or {}).get("coordinates") or (None, None)
+                geometry = {"x": coordinates[0], "y": coordinates[1]}
+                yield to_record(_normalize(feature.get("properties") or {}), geometry)
+
+
+class CSVSource:
+    """
+    SDOT CSV bulk download (ArcGIS field names plus X/Y columns), read row by row.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+
+    def records(self) -> Iterator[CollisionRecord]:
+        with open(self.path, newline="", encoding="utf-8-sig") as f:
+            for row in csv.DictReader(f):
+                attrs = _normalize({k: (v if v != "" else None) for k, v in row.items()})
+                yield to_record(attrs, {"x": _float(row.get("X")), "y": _float(row.get("Y"))})
+
+
+class ParquetSource:
+    """
+    Our Parquet snapshot: one column per STORED_FIELDS entry plus x and y, see `write_parquet_snapshot`.
+    Requires pyarrow.
+    """
+
+    def __init__(self, path: Path, batch_size: int = LOAD_BATCH_SIZE):
+        self.path = Path(path)
+        self.batch_size = batch_size
+
+    def records(self) -> Iterator[CollisionRecord]:
+        pq = _require_pyarrow()
+        parquet = pq.ParquetFile(self.path, memory_map=True)
+        for batch in parquet.iter_batches(batch_size=self.batch_size, columns=list(CollisionRecord._fields)):
+            columns = [batch.column(name).to_pylist() for name in CollisionRecord._fields]
+            for values in zip(*columns):
+                yield CollisionRecord(*values)
+
+
+SOURCES = {
+    "arcgis": ArcGISSource,
+    "geojson": GeoJSONSource,
+    "csv": CSVSource,
+    "parquet": ParquetSource,
+}
+
+
+def open_source(kind: Optional[str] = None, path: Optional[Path] = None):
+    """
+    Build a source by name, or from the file extension when only a path is given.
+    """
+    if kind is None:
+        kind = Path(path).suffix.lstrip(".").lower() if path else "arcgis"
+        kind = {"json": "geojson"}.get(kind, kind)
+    if kind not in SOURCES:
+        raise ValueError(f"Unknown import source {kind!r}, expected one of {sorted(SOURCES)}")
+    if kind == "arcgis":
+        return ArcGISSource()
+    if path is None:
+        raise ValueError(f"The {kind} source needs a file path")
+    return SOURCES[kind](path)
+
+
+def _normalize(attrs: dict) -> dict:
+    """
+    Coerce file attributes to the types the ArcGIS API returns.
+    """
+    for field in INT_FIELDS:
+        value = attrs.get(field)
+        if isinstance(value, str):
+            attrs[field] = int(float(value))
+    incdate = attrs.get("INCDATE")
+    if isinstance(incdate, str):
+        # CSV/GeoJSON dumps carry INCDATE as text (e.g. "2020/01/22 00:00:00+00") instead of epoch ms
+        parsed = datetime.fromisoformat(incdate.replace("/", "-"))
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        attrs["INCDATE"] = int(parsed.timestamp() * 1000)
+    return attrs
+
+
+def _float(value: Optional[str]) -> Optional[float]:
+    return float(value) if value not in (None, "") else None
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow.parquet as pq
+    except ImportError as exc:
+        raise RuntimeError("Parquet snapshots need pyarrow: pip install pyarrow") from exc
+    return pq
+
+
+def _batches(records: Iterable, size: int) -> Iterator[list]:
+    records = iter(records)
+    while batch := list(islice(records, size)):
+        yield batch
+
+
+# Column order for COPY, matches the keys of build_collision_row
+LOAD_COLUMNS = [
+    "inc_key", "int_key", "location", "lon", "lat", "occurred_at",
+    "severity_id", "sdot_collision_type_id", "collision_type_id", "junction_type_id",
+    "light_condition_id", "weather_condition_id", "road_condition_id", "address_type_id",
+    "person_count", "ped_count", "pedcyl_count", "veh_count", "injuries", "serious_injuries", "fatalities",
+    "record_hash", "local_hour", "local_dow", "local_month",
+]
+
+
+def load_records(db: Session, records: Iterable[CollisionRecord], batch_size: int = LOAD_BATCH_SIZE) -> int:
+    """
+    Normalize records and bulk load them: COPY into a temp staging table, then upsert
+    only the rows that are new or whose record_hash changed, keeping the condition tables in step,
+    then refresh the affected intersection aggregates. Returns rows written.
+    """
+    table = TrafficCollision.__tablename__
+    columns = ", ".join(LOAD_COLUMNS)
+    updates = ", ".join(f"{column} = EXCLUDED.{column}" for column in LOAD_COLUMNS if column != "inc_key")
+    change_columns = ", ".join(CHANGE_COLUMNS)
+    lookups = LookupResolver(db)
+
+    # Unchanged rows are filtered out before the upsert so they are not even locked (no WAL),
+    # previous versions of updated rows are returned too so their days are invalidated
+    upsert = text(f"""
+        WITH changed AS (
+            SELECT s.* FROM collision_stage s LEFT JOIN {table} t USING (inc_key)
+            WHERE t.inc_key IS NULL OR t.record_hash IS DISTINCT FROM s.record_hash
+        ),
+        previous AS (
+            SELECT {", ".join(f"t.{c}" for c in CHANGE_COLUMNS)}, false AS written
+            FROM {table} t JOIN changed USING (inc_key)
+        ),
+        written AS (
+            INSERT INTO {table} ({columns}) SELECT {columns} FROM changed
+            ON CONFLICT (inc_key) DO UPDATE SET {updates}
+            WHERE {table}.record_hash IS DISTINCT FROM EXCLUDED.record_hash
+            RETURNING {change_columns}, true AS written
+        )
+        SELECT * FROM written UNION ALL SELECT * FROM previous
+    """)
+
+    total_written = 0
+    int_keys = set()
+    for batch in _batches(records, batch_size):
+        # Exports can repeat an INCKEY; the upsert may touch each row once, so the last version wins
+        rows = list({row["inc_key"]: row for row in (build_collision_row(r, lookups) for r in batch)}.values())
+        db.execute(text(
+            f"CREATE TEMP TABLE collision_stage ON COMMIT DROP AS SELECT {columns} FROM {table} WITH NO DATA"
+        ))
+        # psycopg 3 connection underneath the session
+        raw = db.connection().connection.driver_connection
+        with raw.cursor() as cursor:
+            with cursor.copy(f"COPY collision_stage ({columns}) FROM STDIN") as copy:
+                for row in rows:
+                    copy.write_row([row[column] for column in LOAD_COLUMNS])
+        stale = db.execute(text(
+            f"SELECT inc_key FROM collision_stage s JOIN {table} t USING (inc_key) "
+            "WHERE t.record_hash IS DISTINCT FROM s.record_hash"
+        )).scalars().all()
+        apply_condition_deltas(db, stale, -1)
+        changes = db.execute(upsert).mappings().all()
+        written_keys = [change["inc_key"] for change in changes if change["written"]]
+        score_harm(db, written_keys)
+        apply_condition_deltas(db, written_keys, 1)
+        notify_changes(db, changes)
+        db.commit()
+        written = len(written_keys)
+        total_written += written
+        int_keys.update(change["int_key"] for change in changes)
+        logger.info("Loaded batch of %d records (%d new or changed)", len(batch), written)
+
+    refresh_intersections(db, int_keys)
+    db.commit()
+    return total_written
+
+
+def import_from_source(source, batch_size: int = LOAD_BATCH_SIZE) -> dict:
+    """
+    Import every record from `source` through the shared normalization pipeline.
+    """
+    started = time.perf_counter()
+    with SessionLocal() as db:
+        written = load_records(db, source.records(), batch_size)
+    seconds = time.perf_counter() - started
+    return {
+        "source": type(source).__name__,
+        "written_records": written,
+        "seconds": round(seconds, 3),
+        "records_per_second": round(written / seconds, 1) if seconds else None,
+    }
+
+
+def write_parquet_snapshot(records: Iterable[CollisionRecord], path: Path, batch_size: int = LOAD_BATCH_SIZE) -> int:
+    """
+    Write records to a Parquet snapshot readable by ParquetSource. Returns the number written.
+    """
+    pq = _require_pyarrow()
+    import pyarrow as pa
+
+    types = {field: pa.int64() for field in INT_FIELDS | {"INCDATE"}}
+    types.update({"x": pa.float64(), "y": pa.float64()})
+    schema = pa.schema([(name, types.get(name, pa.string())) for name in CollisionRecord._fields])
+
+    written = 0
+    with pq.ParquetWriter(path, schema, compression="zstd") as writer:
+        for batch in _batches(records, batch_size):
+            columns = [pa.array([_snapshot_value(v, name) for v in values], type=schema.field(name).type)
+                       for name, values in zip(CollisionRecord._fields, zip(*batch))]
+            writer.write_batch(pa.RecordBatch.from_arrays(columns, schema=schema))
+            written += len(batch)
+    return written
+
+
+def _snapshot_value(value, name: str):
+    # Lookup codes can be numbers in the API (e.g. SDOT_COLCODE), the snapshot stores them as text
+    if value is None or name in INT_FIELDS or name in ("INCDATE", "x", "y"):
+        return value
+    return str(value)
+
+
+if __name__ == "__main__":
+    setup_logging()
+
+    parser = argparse.ArgumentParser(description="Import Seattle collisions from ArcGIS or a local dump")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    load = commands.add_parser("load", help="Import records into DATABASE_URL")
+    load.add_argument("path", type=Path, nargs="?", help="Local dump, omit to import from ArcGIS")
+    load.add_argument("--source", choices=sorted(SOURCES), help="Source type (default: from the file extension)")
+    load.add_argument("--batch-size", type=int, default=LOAD_BATCH_SIZE)
+
+    snapshot = commands.add_parser("snapshot", help="Write a Parquet snapshot from another source")
+    snapshot.add_argument("path", type=Path, nargs="?", help="Local dump, omit to read from ArcGIS")
+    snapshot.add_argument("--source", choices=sorted(SOURCES), help="Source type (default: from the file extension)")
+    snapshot.add_argument("--out", type=Path, required=True)
+
+    args = parser.parse_args()
+    source = open_source(args.source, args.path)
+
+    if args.command == "load":
+        print(import_from_source(source, args.batch_size))
+    else:
+        print(f"Wrote {write_parquet_snapshot(source.records(), args.out)} records to {args.out}")
@@ -0,0 +1,90 @@
+import codecs
+import json
+import re
+from typing import BinaryIO, Iterable, Iterator
+
+CHUNK_SIZE = 64 * 1024
+
+FEATURES_START = re.compile(r'"features"\s*:\s*\[')
+SEPARATORS = re.compile(r"[\s,]*")
+
+# Metadata before the features array (fields, spatialReference) is small,
+# only a tail is kept while searching in case the key straddles two chunks
+_SEARCH_TAIL = 64
+_MAX_PREAMBLE = 1024 * 1024
+
+
+def read_chunks(fileobj: BinaryIO, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    Read a binary file object (e.g. a replayed response body) in chunks.
+    """
+    while True:
+        chunk = fileobj.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+def iter_features(chunks: Iterable[bytes]) -> Iterator[dict]:
+    """
+    Incrementally decode the `features` array of an ArcGIS JSON response.
+    Only the current chunk plus one partial feature is held in memory, so peak memory
+    does not depend on the page size.
+    """
+    chunks = iter(chunks)
+    text = codecs.getincrementaldecoder("utf-8")()
+    decoder = json.JSONDecoder()
+
+    # Find the start of the features array
+    buffer = ""
+    preamble = ""
+    for chunk in chunks:
+        buffer += text.decode(chunk)
+        match = FEATURES_START.search(buffer)
+        if match:
+            buffer = buffer[match.end():]
+            break
+        if len(preamble) < _MAX_PREAMBLE:
+            preamble += buffer[:-_SEARCH_TAIL]
+        buffer = buffer[-_SEARCH_TAIL:]
+    else:
+        _raise_for_error(preamble + buffer + text.decode(b"", final=True))
+        return
+
+    pos = 0
+    while True:
+        pos = SEPARATORS.match(buffer, pos).end()
+        if pos == len(buffer):
+            buffer, pos = _refill(chunks, text, buffer, pos)
+            continue
+
+        if buffer[pos] == "]":
+            return
+
+        try:
+            feature, pos = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            # Feature continues in the next chunk
+            buffer, pos = _refill(chunks, text, buffer, pos)
+            continue
+
+        yield feature
+
+
+def _refill(chunks: Iterator[bytes], text, buffer: str, pos: int) -> tuple[str, int]:
+    chunk = next(chunks, None)
+    if chunk is None:
+        raise ValueError("ArcGIS response ended inside the features array")
+    return buffer[pos:] + text.decode(chunk), 0
+
+
+def _raise_for_error(body: str) -> None:
+    """
+    A body without a features array is either an ArcGIS error or an empty result.
+    """
+    try:
+        data = json.loads(body)
+    except ValueError:
+        return
+    if isinstance(data, dict) and "error" in data:
+        raise RuntimeError(f"ArcGIS query failed: {data['error']}")
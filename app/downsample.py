@@ -0,0 +1,50 @@
+import numpy as np
+
+
+def lttb(x: np.ndarray, y: np.ndarray, max_points: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: indices of at most `max_points` points that keep the visual shape
+    of the line (x ascending). The first and last points are kept; the points in between are split into
+    max_points - 2 buckets and from each the point forming the largest triangle with the point kept
+    before it and the average of the next bucket is kept, so peaks and dips survive.
+    """
+    size = len(x)
+    if max_points >= size or max_points < 3:
+        return np.arange(size)
+
+    # Bucket b is [edges[b], edges[b + 1]), over the points between the first and the last
+    edges = np.linspace(1, size - 1, max_points - 1).astype(np.intp)
+    counts = np.diff(edges)
+    # Every bucket's average at once; the last bucket looks ahead to the last point
+    next_x = np.append(np.add.reduceat(x[:-1], edges[:-1])[1:] / counts[1:], x[-1])
+    next_y = np.append(np.add.reduceat(y[:-1], edges[:-1])[1:] / counts[1:], y[-1])
+
+    selected = np.empty(max_points, dtype=np.intp)
+    selected[0] = 0
+    selected[-1] = size - 1
+    a = 0
+    for b in range(max_points - 2):
+        start, stop = edges[b], edges[b + 1]
+        # Twice the triangle areas of (kept point, candidate, next bucket average) for the whole bucket
+        area = np.abs(
+            (x[a] - next_x[b]) * (y[start:stop] - y[a])
+            - (x[a] - x[start:stop]) * (next_y[b] - y[a])
+        )
+        a = start + int(np.argmax(area))
+        selected[b + 1] = a
+    return selected
+
+
+def downsample_series(x: list[float], y: list[float], series: list[str], max_points: int) -> np.ndarray:
+    """
+    Indices (ascending) of the points to keep when every series is reduced to at most
+    `max_points` points with LTTB. Points of each series must be in ascending x order.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    _, series_ids = np.unique(np.asarray(series, dtype=object), return_inverse=True)
+    keep = []
+    for series_id in range(series_ids.max() + 1 if len(series_ids) else 0):
+        members = np.flatnonzero(series_ids == series_id)
+        keep.append(members[lttb(x[members], y[members], max_points)])
+    return np.sort(np.concatenate(keep)) if keep else np.arange(0)
@@ -0,0 +1,186 @@
+import argparse
+import logging
+import time
+from typing import Iterable, Optional
+
+from sqlalchemy import func, text, update
+from sqlalchemy.orm import Session
+
+from app.conditions import rebuild_condition_stats
+from app.core.changes import notify_all_changed
+from app.core.database import SessionLocal
+from app.core.logging import setup_logging
+from app.intersections import refresh_intersections
+from app.models import HarmProfile, TrafficCollision
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROFILE = "default"
+# Weight per fatality, serious injury, injury and per collision
+DEFAULT_WEIGHTS = {"fatalities": 5, "serious_injuries": 3, "injuries": 2, "collisions": 1}
+WEIGHT_NAMES = tuple(DEFAULT_WEIGHTS)
+
+
+class HarmProfileNotFound(LookupError):
+    pass
+
+
+# Scores the selected rows ({where}) with the default profile, the built-in weights when none is stored yet
+_SCORE_SQL = """
+WITH w AS (
+    -- The stored default profile, or the built-in weights on a database without one
+    SELECT fatalities, serious_injuries, injuries, collisions FROM (
+        SELECT 0 AS priority, fatalities, serious_injuries, injuries, collisions FROM harm_profile WHERE is_default
+        UNION ALL
+        SELECT 1, :fatalities, :serious_injuries, :injuries, :collisions
+    ) candidates
+    ORDER BY priority
+    LIMIT 1
+)
+UPDATE traffic_collisions t SET harm =
+    w.fatalities * coalesce(t.fatalities, 0)
+    + w.serious_injuries * coalesce(t.serious_injuries, 0)
+    + w.injuries * coalesce(t.injuries, 0)
+    + w.collisions
+FROM w
+WHERE {where}
+"""
+
+
+def score_harm(db: Session, inc_keys: Optional[Iterable[int]] = None) -> int:
+    """
+    Store the default profile's harm score on the given collisions, or on every row that has none
+    when `inc_keys` is None. Importers call this for the rows they wrote. Returns rows scored.
+    Does not commit.
+    """
+    if inc_keys is None:
+        return db.execute(text(_SCORE_SQL.format(where="t.harm IS NULL")), DEFAULT_WEIGHTS).rowcount
+    inc_keys = list(inc_keys)
+    if not inc_keys:
+        return 0
+    return db.execute(
+        text(_SCORE_SQL.format(where="t.inc_key = ANY(:keys)")), {**DEFAULT_WEIGHTS, "keys": inc_keys}
+    ).rowcount
+
+
+def ensure_default_profile(db: Session) -> None:
+    """
+    Create the built-in default profile on a new database. Does not commit.
+    """
+    if db.query(HarmProfile.name).filter(HarmProfile.is_default).first() is None:
+        profile = db.get(HarmProfile, DEFAULT_PROFILE)
+        if profile is None:
+            db.add(HarmProfile(name=DEFAULT_PROFILE, is_default=True, version=1, **DEFAULT_WEIGHTS))
+        else:
+            profile.is_default = True
+        db.flush()
+
+
+def profile_weights(db: Session, name: Optional[str]) -> Optional[dict]:
+    """
+    Weights of the named profile, or None when the stored per-row score applies
+    (no name given, or the name is the default profile).
+    """
+    if name is None:
+        return None
+    profile = db.get(HarmProfile, name)
+    if profile is None:
+        raise HarmProfileNotFound(name)
+    if profile.is_default:
+        return None
+    return {weight: getattr(profile, weight) for weight in WEIGHT_NAMES}
+
+
+def harm_total(weights: Optional[dict] = None):
+    """
+    Aggregate harm score of the grouped collisions: the sum of the stored per-row scores,
+    or `weights` applied to the summed counts for a non-default profile.
+    """
+    if weights is None:
+        return func.coalesce(func.sum(TrafficCollision.harm), 0)
+    return (
+        func.coalesce(func.sum(TrafficCollision.fatalities), 0) * weights["fatalities"]
+        + func.coalesce(func.sum(TrafficCollision.serious_injuries), 0) * weights["serious_injuries"]
+        + func.coalesce(func.sum(TrafficCollision.injuries), 0) * weights["injuries"]
+        + func.count(TrafficCollision.id) * weights["collisions"]
+    )
+
+
+def recompute_harm(db: Session) -> int:
+    """
+    Rescore every collision with the default profile and rebuild the aggregates that store harm
+    (intersections, condition tables), in one transaction so readers never see a mix of weights.
+    Returns rows rescored. Does not commit; running API instances drop their cached results on commit.
+    """
+    rescored = db.execute(text(_SCORE_SQL.format(where="true")), DEFAULT_WEIGHTS).rowcount
+    refresh_intersections(db)
+    rebuild_condition_stats(db)
+    notify_all_changed(db)
+    return rescored
+
+
+def set_profile(db: Session, name: str, weights: dict, make_default: bool = False) -> bool:
+    """
+    Create or reweight a profile, optionally making it the default.
+    Changing the default profile's weights (or which profile is the default) rescores every row once.
+    Returns True if rows were rescored. Does not commit.
+    """
+    ensure_default_profile(db)
+    profile = db.get(HarmProfile, name)
+    if profile is None:
+        profile = HarmProfile(name=name, is_default=False, version=1, **weights)
+        db.add(profile)
+        changed = True
+    else:
+        changed = any(getattr(profile, weight) != weights[weight] for weight in WEIGHT_NAMES)
+        if changed:
+            for weight in WEIGHT_NAMES:
+                setattr(profile, weight, weights[weight])
+            profile.version += 1
+            profile.updated_at = func.now()
+
+    rescore = (changed and profile.is_default) or (make_default and not profile.is_default)
+    if make_default and not profile.is_default:
+        db.execute(update(HarmProfile).where(HarmProfile.is_default).values(is_default=False))
+        profile.is_default = True
+    db.flush()
+
+    if rescore:
+        recompute_harm(db)
+    elif changed:
+        # Results cached for this profile are stale
+        notify_all_changed(db)
+    return rescore
+
+
+if __name__ == "__main__":
+    setup_logging()
+
+    parser = argparse.ArgumentParser(description="Manage harm score profiles")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list", help="Show the stored profiles")
+    set_parser = commands.add_parser("set", help="Create or reweight a profile")
+    set_parser.add_argument("name")
+    for weight in WEIGHT_NAMES:
+        set_parser.add_argument(f"--{weight.replace('_', '-')}", type=int, required=True)
+    set_parser.add_argument("--default", action="store_true", help="Make this the stored default profile")
+    commands.add_parser("recompute", help="Rescore every collision with the default profile")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    with SessionLocal() as session:
+        if args.command == "list":
+            ensure_default_profile(session)
+            session.commit()
+            for p in session.query(HarmProfile).order_by(HarmProfile.name):
+                weights = ", ".join(f"{weight}={getattr(p, weight)}" for weight in WEIGHT_NAMES)
+                print(f"{p.name}{' (default)' if p.is_default else ''} v{p.version}: {weights}")
+        elif args.command == "set":
+            rescored = set_profile(session, args.name, {w: getattr(args, w) for w in WEIGHT_NAMES}, args.default)
+            session.commit()
+            logger.info("Saved harm profile %s%s", args.name, ", rescored all collisions" if rescored else "")
+        else:
+            count = recompute_harm(session)
+            session.commit()
+            logger.info("Rescored %d collisions", count)
+    logger.info("Done in %.1fs", time.perf_counter() - started)
@@ -0,0 +1,345 @@
+import math
+from datetime import datetime
+from typing import Iterator, Literal, Optional
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.models.traffic_collisions import TrafficCollision
+
+# Equirectangular projection around Seattle, accurate to well under 1% at city scale
+METERS_PER_DEGREE = 111_320.0
+SEATTLE_LAT = 47.61
+METERS_PER_DEGREE_LON = METERS_PER_DEGREE * math.cos(math.radians(SEATTLE_LAT))
+
+
+
+def load_points(
+    db: Session,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    severity_id: Optional[int] = None,
+) -> dict[str, np.ndarray]:
+    """
+    Collisions grouped by exact coordinate (most share their intersection's point),
+    as column arrays: lon, lat, collisions, injuries, serious_injuries, fatalities, harm, location.
+    harm is the stored default profile score.
+    """
+    query = db.query(TrafficCollision).filter(
+        TrafficCollision.lon.isnot(None),
+        TrafficCollision.lat.isnot(None),
+    )
+    if start_date:
+        query = query.filter(TrafficCollision.occurred_at >= start_date)
+    if end_date:
+        query = query.filter(TrafficCollision.occurred_at <= end_date)
+    if severity_id:
+        query = query.filter(TrafficCollision.severity_id == severity_id)
+
+    rows = (
+        query.with_entities(
+            TrafficCollision.lon,
+            TrafficCollision.lat,
+            func.count(TrafficCollision.id),
+            func.coalesce(func.sum(TrafficCollision.injuries), 0),
+            func.coalesce(func.sum(TrafficCollision.serious_injuries), 0),
+            func.coalesce(func.sum(TrafficCollision.fatalities), 0),
+            func.coalesce(func.sum(TrafficCollision.harm), 0),
+            func.max(TrafficCollision.location),
+        )
+        .group_by(TrafficCollision.lon, TrafficCollision.lat)
+        .all()
+    )
+
+    columns = list(zip(*rows)) or [()] * 8
+    points = {
+        name: np.array(values, dtype=dtype)
+        for name, values, dtype in zip(
+            ("lon", "lat", "collisions", "injuries", "serious_injuries", "fatalities", "harm"),
+            columns,
+            (np.float64, np.float64, np.int64, np.int64, np.int64, np.int64, np.int64),
+        )
+    }
+    points["location"] = np.array(columns[7], dtype=object)
+    return points
+
+
+# Point pairs materialized per step, bounds memory for dense hotspots (~16 bytes per pair and array)
+PAIR_CHUNK = 2_000_000
+
+
+class GridIndex:
+    """
+    Uniform grid over projected coordinates with cells of eps / sqrt(2), so any two points
+    in one cell are within eps of each other and every neighbor is at most two cells away.
+    Points are stored sorted by cell; each occupied cell is a contiguous [start, start + size) slice.
+    """
+
+    def __init__(self, x: np.ndarray, y: np.ndarray, eps: float):
+        self.eps = eps
+        self.cell_size = cell_size = eps / math.sqrt(2)
+        cx = np.floor(x / cell_size).astype(np.int64)
+        cy = np.floor(y / cell_size).astype(np.int64)
+        # Two empty columns/rows of padding on each side, so neighbor keys never wrap around
+        self.origin = (cx.min(initial=0) - 2, cy.min(initial=0) - 2)
+        cx -= self.origin[0]
+        cy -= self.origin[1]
+        self.stride = int(cy.max(initial=0)) + 3
+        keys = cx * self.stride + cy
+
+        self.order = np.argsort(keys, kind="stable")
+        self.x = x[self.order]
+        self.y = y[self.order]
+        self.keys, self.start, self.size = np.unique(keys[self.order], return_index=True, return_counts=True)
+        # Cell of each (sorted) point
+        self.cell = np.repeat(np.arange(len(self.keys)), self.size)
+
+    def neighbor_cells(self, dx: int, dy: int, cells: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Positions in `cells` whose neighbor at offset (dx, dy) is occupied, and those neighbors.
+        """
+        target = self.keys[cells] + dx * self.stride + dy
+        found = np.searchsorted(self.keys, target)
+        found = np.minimum(found, len(self.keys) - 1)
+        hit = np.flatnonzero(self.keys[found] == target)
+        return hit, found[hit]
+
+    def cell_distances(self, points: np.ndarray, cells: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Nearest and farthest distance from each point to the bounds of the matching cell.
+        """
+        px, py = self.x[points], self.y[points]
+        left = (self.keys[cells] // self.stride + self.origin[0]) * self.cell_size
+        bottom = (self.keys[cells] % self.stride + self.origin[1]) * self.cell_size
+        right, top = left + self.cell_size, bottom + self.cell_size
+        near = np.hypot(np.maximum(np.maximum(left - px, px - right), 0), np.maximum(np.maximum(bottom - py, py - top), 0))
+        far = np.hypot(np.maximum(px - left, right - px), np.maximum(py - bottom, top - py))
+        return near, far
+
+    def point_pairs(self, start: np.ndarray, size: np.ndarray, b: np.ndarray) -> Iterator[tuple[np.ndarray, np.ndarray]]:
+        """
+        Point pairs (sorted indices) within eps between the points [start[k], start[k] + size[k])
+        and cell b[k], in chunks of about PAIR_CHUNK.
+        """
+        counts = size * self.size[b]
+        ends = np.cumsum(counts)
+        splits = np.searchsorted(ends, np.arange(PAIR_CHUNK, ends[-1] if len(ends) else 0, PAIR_CHUNK))
+        for group in np.split(np.arange(len(b)), np.unique(splits)):
+            if not len(group):
+                continue
+            c = counts[group]
+            pair = np.repeat(np.arange(len(group)), c)
+            t = np.arange(int(c.sum())) - np.repeat(np.cumsum(c) - c, c)
+            width = self.size[b[group]][pair]
+            i = start[group][pair] + t // width
+            j = self.start[b[group]][pair] + t % width
+            close = np.hypot(self.x[i] - self.x[j], self.y[i] - self.y[j]) <= self.eps
+            yield i[close], j[close]
+
+
+# Cell offsets that can hold points within eps (cells are eps / sqrt(2) wide)
+NEIGHBOR_OFFSETS = [(dx, dy) for dx in range(-2, 3) for dy in range(-2, 3)]
+
+
+def _components(n: int, i: np.ndarray, j: np.ndarray) -> np.ndarray:
+    """
+    Connected component label (smallest member index) for each of `n` nodes given edges i-j.
+    Min-label propagation with pointer jumping, converges in a few passes on spatial graphs.
+    """
+    i, j = np.concatenate([i, j]), np.concatenate([j, i])
+    labels = np.arange(n)
+    while True:
+        updated = labels.copy()
+        np.minimum.at(updated, i, labels[j])
+        updated = updated[updated]
+        if np.array_equal(updated, labels):
+            return labels
+        labels = updated
+
+
+def dbscan(x: np.ndarray, y: np.ndarray, weights: np.ndarray, eps: float, min_weight: int) -> np.ndarray:
+    """
+    DBSCAN over weighted points: a point is core when the weights within `eps` (itself included)
+    sum to at least `min_weight`. Equivalent to plain DBSCAN with each point repeated `weight` times.
+    Returns a cluster label per point, -1 for noise.
+
+    Grid-based: points in a cell whose total weight reaches `min_weight` are core without any
+    distance checks, and clusters are built over cells instead of points.
+    """
+    n = len(x)
+    if not n:
+        return np.empty(0, dtype=np.int64)
+
+    grid = GridIndex(x, y, eps)
+    w = weights[grid.order]
+    cells = np.arange(len(grid.keys))
+
+    # Core points: dense cells are core outright, points of sparse cells count their neighbors.
+    # Neighbor cells entirely within eps of a point add their whole weight without distance checks.
+    cell_weight = np.add.reduceat(w, grid.start)
+    core = (cell_weight >= min_weight)[grid.cell]
+    sparse_points = np.flatnonzero(~core)
+    neighbor_weight = np.zeros(n)
+    for dx, dy in NEIGHBOR_OFFSETS:
+        k, b = grid.neighbor_cells(dx, dy, grid.cell[sparse_points])
+        points = sparse_points[k]
+        near, far = grid.cell_distances(points, b)
+        inside = far <= eps
+        neighbor_weight += np.bincount(points[inside], weights=cell_weight[b[inside]], minlength=n)
+        partial = ~inside & (near <= eps)
+        for i, j in grid.point_pairs(points[partial], np.ones(int(partial.sum()), dtype=np.int64), b[partial]):
+            neighbor_weight += np.bincount(i, weights=w[j], minlength=n)
+    core |= neighbor_weight >= min_weight
+
+    # A cell's core points are all within eps of each other, so they always share a cluster.
+    # Core cells are linked when any pair of their core points is within eps.
+    core_cells = np.unique(grid.cell[core])
+    has_core = np.zeros(len(cells), dtype=bool)
+    has_core[core_cells] = True
+    score = np.where(core, 0.0, np.nan)
+    edges_a, edges_b, unresolved = [], [], []
+    for dx, dy in NEIGHBOR_OFFSETS:
+        if (dx, dy) <= (0, 0):
+            continue  # each unordered cell pair once
+        k, b = grid.neighbor_cells(dx, dy, core_cells)
+        keep = has_core[b]
+        a, b = core_cells[k[keep]], b[keep]
+
+        # Cheap test first: the core points of a and b that reach furthest toward each other
+        projection = score + grid.x * dx + grid.y * dy
+        ia = _cell_argmax(grid, projection)[a]
+        ib = _cell_argmax(grid, -projection)[b]
+        linked = np.hypot(grid.x[ia] - grid.x[ib], grid.y[ia] - grid.y[ib]) <= eps
+        edges_a.append(a[linked])
+        edges_b.append(b[linked])
+        unresolved.append((a[~linked], b[~linked]))
+    cell_labels = _components(len(cells), np.concatenate(edges_a), np.concatenate(edges_b))
+
+    # Full check only for pairs the cheap test left in different clusters, core-core point pairs count
+    a = np.concatenate([pair[0] for pair in unresolved])
+    b = np.concatenate([pair[1] for pair in unresolved])
+    apart = cell_labels[a] != cell_labels[b]
+    a, b = a[apart], b[apart]
+    if len(a):
+        for i, j in grid.point_pairs(grid.start[a], grid.size[a], b):
+            both = core[i] & core[j]
+            edges_a.append(grid.cell[i[both]])
+            edges_b.append(grid.cell[j[both]])
+        cell_labels = _components(len(cells), np.concatenate(edges_a), np.concatenate(edges_b))
+
+    labels = np.where(core, cell_labels[grid.cell], len(cells))
+
+    # Border points join the cluster of a core neighbor, everything else is noise
+    border_cells = np.unique(grid.cell[~core])
+    for dx, dy in NEIGHBOR_OFFSETS:
+        k, b = grid.neighbor_cells(dx, dy, border_cells)
+        keep = has_core[b]
+        a, b = border_cells[k[keep]], b[keep]
+        for i, j in grid.point_pairs(grid.start[a], grid.size[a], b):
+            reach = ~core[i] & core[j]
+            np.minimum.at(labels, i[reach], labels[j[reach]])
+    labels[labels == len(cells)] = -1
+
+    result = np.empty(n, dtype=np.int64)
+    result[grid.order] = labels
+    return result
+
+
+def _cell_argmax(grid: GridIndex, values: np.ndarray) -> np.ndarray:
+    """
+    Index of the largest non-NaN value within each cell (any index when all are NaN).
+    """
+    filled = np.where(np.isnan(values), -np.inf, values)
+    best = np.maximum.reduceat(filled, grid.start)
+    result = grid.start.copy()
+    at_best = np.flatnonzero(filled == best[grid.cell])
+    result[grid.cell[at_best]] = at_best
+    return result
+
+
+def find_hotspots(
+    db: Session,
+    *,
+    eps_m: float = 150.0,
+    min_collisions: int = 25,
+    metric: Literal["count", "harm"] = "harm",
+    limit: int = 50,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    severity_id: Optional[int] = None,
+    weights: Optional[dict] = None,
+) -> dict:
+    """
+    Density-based collision hotspots: clusters of collisions around core locations that have
+    at least `min_collisions` collisions within `eps_m` meters.
+    Returns the top `limit` clusters by `metric` plus totals. Harm uses the stored default
+    profile score unless a non-default profile's `weights` are given.
+    """
+    points = load_points(db, start_date=start_date, end_date=end_date, severity_id=severity_id)
+    lon, lat, collisions = points["lon"], points["lat"], points["collisions"]
+    x = lon * METERS_PER_DEGREE_LON
+    y = lat * METERS_PER_DEGREE
+
+    labels = dbscan(x, y, collisions, eps_m, min_collisions)
+    clustered = labels >= 0
+    cluster_ids, members = np.unique(labels[clustered], return_inverse=True)
+    k = len(cluster_ids)
+
+    def total(values: np.ndarray) -> np.ndarray:
+        return np.bincount(members, weights=values[clustered], minlength=k)
+
+    sums = {name: total(points[name]) for name in ("collisions", "injuries", "serious_injuries", "fatalities")}
+    if weights is None:
+        harm = total(points["harm"])
+    else:
+        harm = sum(sums[name] * weight for name, weight in weights.items())
+    center_x = total(x * collisions) / sums["collisions"] if k else np.zeros(0)
+    center_y = total(y * collisions) / sums["collisions"] if k else np.zeros(0)
+
+    # Radius: farthest member location from the collision-weighted center
+    distance = np.hypot(x[clustered] - center_x[members], y[clustered] - center_y[members])
+    radius = np.zeros(k)
+    np.maximum.at(radius, members, distance)
+
+    bounds = {}
+    for name, values in (("lon", lon[clustered]), ("lat", lat[clustered])):
+        low, high = np.full(k, np.inf), np.full(k, -np.inf)
+        np.minimum.at(low, members, values)
+        np.maximum.at(high, members, values)
+        bounds[name] = (low, high)
+
+    # Label each cluster with the location text of its busiest point
+    busiest = np.lexsort((-collisions[clustered], members))
+    first = np.r_[True, members[busiest][1:] != members[busiest][:-1]] if k else np.zeros(0, dtype=bool)
+    names = points["location"][clustered][busiest[first]]
+    locations = np.bincount(members, minlength=k)
+
+    ranking = harm if metric == "harm" else sums["collisions"]
+    top = np.argsort(-ranking, kind="stable")[:limit]
+
+    clusters = []
+    for rank, c in enumerate(top, start=1):
+        clusters.append({
+            "rank": rank,
+            "name": names[c],
+            "lon": round(float(center_x[c] / METERS_PER_DEGREE_LON), 6),
+            "lat": round(float(center_y[c] / METERS_PER_DEGREE), 6),
+            "radius_m": round(float(radius[c]), 1),
+            "bbox": [round(float(bounds[axis][side][c]), 6) for side in (0, 1) for axis in ("lon", "lat")],
+            "locations": int(locations[c]),
+            "collisions": int(sums["collisions"][c]),
+            "injuries": int(sums["injuries"][c]),
+            "serious_injuries": int(sums["serious_injuries"][c]),
+            "fatalities": int(sums["fatalities"][c]),
+            "harm": int(harm[c]),
+        })
+
+    return {
+        "eps_m": eps_m,
+        "min_collisions": min_collisions,
+        "collisions": int(collisions.sum()),
+        "clustered_collisions": int(collisions[clustered].sum()),
+        "cluster_count": k,
+        "clusters": clusters,
+    }
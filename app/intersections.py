@@ -0,0 +1,146 @@
+import logging
+import time
+from typing import Iterable, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.core.database import SessionLocal
+from app.core.logging import setup_logging
+
+logger = logging.getLogger(__name__)
+
+# Number of intersections recomputed per statement on partial refreshes
+REFRESH_CHUNK = 5000
+# Recent collisions kept per intersection
+RECENT_LIMIT = 10
+
+# Aggregates for the given collisions ({where}), harm is the stored default profile score
+_REFRESH_SQL = f"""
+WITH as_of AS (
+    SELECT max(occurred_at) AS as_of FROM traffic_collisions
+),
+base AS (
+    SELECT
+        t.id, t.int_key, t.location, t.lat, t.lon, t.occurred_at,
+        coalesce(t.injuries, 0) AS injuries,
+        coalesce(t.serious_injuries, 0) AS serious_injuries,
+        coalesce(t.fatalities, 0) AS fatalities,
+        coalesce(t.harm, 0) AS harm,
+        coalesce(s.code, 'Unknown') AS severity,
+        ct.name AS collision_type
+    FROM traffic_collisions t
+    LEFT JOIN severity s ON s.id = t.severity_id
+    LEFT JOIN collision_type ct ON ct.id = t.collision_type_id
+    WHERE {{where}}
+),
+totals AS (
+    SELECT
+        int_key,
+        mode() WITHIN GROUP (ORDER BY location) AS name,
+        avg(lat) AS lat,
+        avg(lon) AS lon,
+        count(*) AS collision_count,
+        sum(injuries) AS injuries,
+        sum(serious_injuries) AS serious_injuries,
+        sum(fatalities) AS fatalities,
+        sum(harm) AS harm,
+        count(*) FILTER (WHERE occurred_at > as_of - interval '12 months') AS collisions_12m,
+        coalesce(sum(harm) FILTER (WHERE occurred_at > as_of - interval '12 months'), 0) AS harm_12m,
+        min(occurred_at) AS first_occurred_at,
+        max(occurred_at) AS last_occurred_at
+    FROM base, as_of
+    GROUP BY int_key
+),
+severity_mix AS (
+    SELECT int_key, jsonb_object_agg(severity, collisions) AS severity_mix
+    FROM (SELECT int_key, severity, count(*) AS collisions FROM base GROUP BY int_key, severity) s
+    GROUP BY int_key
+),
+monthly AS (
+    SELECT int_key, jsonb_agg(jsonb_build_object('month', month, 'collisions', collisions, 'harm', harm) ORDER BY month) AS monthly
+    FROM (
+        SELECT int_key, date_trunc('month', occurred_at) AS month, count(*) AS collisions, sum(harm) AS harm
+        FROM base GROUP BY int_key, month
+    ) m
+    GROUP BY int_key
+),
+recent AS (
+    SELECT int_key, jsonb_agg(
+        jsonb_build_object('id', id, 'occurred_at', occurred_at, 'severity', severity, 'collision_type', collision_type)
+        ORDER BY occurred_at DESC, id DESC
+    ) AS recent
+    FROM (
+        SELECT *, row_number() OVER (PARTITION BY int_key ORDER BY occurred_at DESC, id DESC) AS rank FROM base
+    ) r
+    WHERE rank <= {RECENT_LIMIT}
+    GROUP BY int_key
+)
+INSERT INTO intersection (
+    int_key, name, lat, lon, collision_count, injuries, serious_injuries, fatalities, harm,
+    collisions_12m, harm_12m, as_of, first_occurred_at, last_occurred_at, severity_mix, monthly, recent
+)
+SELECT
+    int_key, name, lat, lon, collision_count, injuries, serious_injuries, fatalities, harm,
+    collisions_12m, harm_12m, as_of, first_occurred_at, last_occurred_at, severity_mix, monthly, recent
+FROM totals
+JOIN severity_mix USING (int_key)
+JOIN monthly USING (int_key)
+JOIN recent USING (int_key)
+CROSS JOIN as_of
+ON CONFLICT (int_key) DO UPDATE SET
+    name = EXCLUDED.name, lat = EXCLUDED.lat, lon = EXCLUDED.lon,
+    collision_count = EXCLUDED.collision_count, injuries = EXCLUDED.injuries,
+    serious_injuries = EXCLUDED.serious_injuries, fatalities = EXCLUDED.fatalities, harm = EXCLUDED.harm,
+    collisions_12m = EXCLUDED.collisions_12m, harm_12m = EXCLUDED.harm_12m, as_of = EXCLUDED.as_of,
+    first_occurred_at = EXCLUDED.first_occurred_at, last_occurred_at = EXCLUDED.last_occurred_at,
+    severity_mix = EXCLUDED.severity_mix, monthly = EXCLUDED.monthly, recent = EXCLUDED.recent
+"""
+
+# Intersections whose collisions were all deleted or moved to another int_key
+_DELETE_SQL = """
+DELETE FROM intersection i
+WHERE {where} AND NOT EXISTS (SELECT 1 FROM traffic_collisions t WHERE t.int_key = i.int_key)
+"""
+
+
+def refresh_intersections(db: Session, int_keys: Optional[Iterable[int]] = None) -> int:
+    """
+    Recompute intersection aggregates for `int_keys`, or for every intersection when None.
+    Falls back to a full refresh when the table has not been built yet or the dataset's latest
+    collision moved, because every intersection's rolling 12-month window depends on it.
+    Returns intersections refreshed.
+    Does not commit.
+    """
+    if int_keys is not None:
+        int_keys = sorted({key for key in int_keys if key is not None})
+        if not int_keys:
+            return 0
+        stale = db.execute(text(
+            "SELECT NOT EXISTS (SELECT 1 FROM intersection) OR EXISTS (SELECT 1 FROM intersection "
+            "WHERE as_of IS DISTINCT FROM (SELECT max(occurred_at) FROM traffic_collisions))"
+        )).scalar()
+        if stale:
+            int_keys = None
+
+    if int_keys is None:
+        refreshed = db.execute(text(_REFRESH_SQL.format(where="t.int_key IS NOT NULL"))).rowcount
+        db.execute(text(_DELETE_SQL.format(where="true")))
+        return refreshed
+
+    refreshed = 0
+    for start in range(0, len(int_keys), REFRESH_CHUNK):
+        keys = int_keys[start:start + REFRESH_CHUNK]
+        refreshed += db.execute(text(_REFRESH_SQL.format(where="t.int_key = ANY(:keys)")), {"keys": keys}).rowcount
+        db.execute(text(_DELETE_SQL.format(where="i.int_key = ANY(:keys)")), {"keys": keys})
+    return refreshed
+
+
+if __name__ == "__main__":
+    setup_logging()
+
+    started = time.perf_counter()
+    with SessionLocal() as session:
+        count = refresh_intersections(session)
+        session.commit()
+    logger.info("Refreshed %d intersections in %.1fs", count, time.perf_counter() - started)
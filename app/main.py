@@ -1,9 +1,20 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from app.api import traffic, lookups, stats, viz
-from typing import Dict
+from fastapi.responses import PlainTextResponse
+from sqlalchemy.exc import OperationalError
+from app.api import traffic, lookups, stats, viz, intersections
+from typing import Any, Dict
 import logging
 
+from app.core.cache import result_cache
+from app.core.changes import CHANGE_LISTENER_ENABLED, change_listener
+from app.core.compression import compression_middleware
+from app.core.database import dispose_engine, replica_status
+from app.core.guardrails import QueryTooExpensive, admission, query_too_expensive_handler, statement_timeout_handler
 from app.core.logging import setup_logging
+from app.core.profiling import TimedRoute, latency_metrics, timing_middleware
+from app.core.singleflight import inflight
 
 
 # Initialize logging
@@ -11,18 +22,55 @@ setup_logging()
 logger = logging.getLogger(__name__)
 logger.info("Server started and health endpoint ready.")
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Nothing here touches the database up front: the engine is created by the first session,
+    # so /health answers as soon as the app is imported and the background tasks connect on their own.
+    # The importer and the viz spec builders are imported here, not by `import app.main`
+    from app.data_import.snapshot import SNAPSHOT_PATH, seed_if_empty
+    from app.precompute import WARMUP_ENABLED, warmup_scheduler
+
+    # Warm start a new replica from a local snapshot instead of re-importing
+    if SNAPSHOT_PATH:
+        await asyncio.to_thread(seed_if_empty, SNAPSHOT_PATH)
+
+    # Precompute dashboard-default viz results in the background
+    if WARMUP_ENABLED:
+        warmup_scheduler.start()
+    # Invalidate cached results as soon as an import commits changes
+    if CHANGE_LISTENER_ENABLED:
+        change_listener.start()
+    yield
+    change_listener.stop()
+    await warmup_scheduler.stop()
+    dispose_engine()
+
+
 # Initialize FastAPI app
 app = FastAPI(
     title="SEA-RoadInfo API",
     description="Backend service for ingesting, normalizing, and querying Seattle traffic collision data.",
     version="0.1.0",
+    lifespan=lifespan,
 )
+app.router.route_class = TimedRoute
+
+# Cost guardrail rejections are 400s, queries cancelled by the statement timeout 503s
+app.add_exception_handler(QueryTooExpensive, query_too_expensive_handler)
+app.add_exception_handler(OperationalError, statement_timeout_handler)
+
+# gzip/br/zstd for uncached responses; cached viz specs are stored precompressed
+app.middleware("http")(compression_middleware)
+# Per-request SQL/serialization timings, Server-Timing header and ?profile=1 (outermost, so totals include compression)
+app.middleware("http")(timing_middleware)
 
 # Include API routes
 app.include_router(traffic.router)
 app.include_router(lookups.router)
 app.include_router(stats.router)
 app.include_router(viz.router)
+app.include_router(intersections.router)
 
 # Health check endpoint
 @app.get("/health", tags=["Health"])
@@ -32,4 +80,35 @@ def health_check() -> Dict[str, str]:
     return {
         "status": "ok",
         "service": "sea-roadinfo",
-    }
\ No newline at end of file
+    }
+
+
+@app.get("/health/cache", tags=["Health"])
+def cache_status() -> Dict[str, Any]:
+    """Result cache hit rates, coalesced requests, warm-up scheduler refresh times and change listener state"""
+    from app.precompute import warmup_scheduler
+
+    return {
+        "cache": result_cache.stats(),
+        "singleflight": inflight.stats(),
+        "warmup": warmup_scheduler.status(),
+        "changes": change_listener.status(),
+    }
+
+
+@app.get("/health/db", tags=["Health"])
+def database_status() -> Dict[str, Any]:
+    """Read replica health, replication lag and how many sessions were routed to replicas or fell back to the primary"""
+    return replica_status()
+
+
+@app.get("/health/load", tags=["Health"])
+def load_status() -> Dict[str, Any]:
+    """Admission control of the analytical routes: slots in use, queued requests and shed requests per route"""
+    return admission.status()
+
+
+@app.get("/metrics", tags=["Health"], response_class=PlainTextResponse)
+def metrics() -> str:
+    """Prometheus-style per-route latency histograms, SQL counters, coalesced and admitted request counters"""
+    return latency_metrics.render() + inflight.render() + admission.render()
@@ -6,4 +6,7 @@ from app.models.junction_type import JunctionType
 from app.models.light_condition import LightCondition
 from app.models.weather_condition import WeatherCondition
 from app.models.road_condition import RoadCondition
-from app.models.address_type import AddressType
\ No newline at end of file
+from app.models.address_type import AddressType
+from app.models.intersection import Intersection
+from app.models.condition_pair_stats import ConditionPairStats
+from app.models.harm_profile import HarmProfile
\ No newline at end of file
@@ -0,0 +1,22 @@
+from sqlalchemy import Integer, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.core.base import Base
+
+# Contingency table for each pair of condition dimensions, maintained by app.conditions on import
+class ConditionPairStats(Base):
+    __tablename__ = "condition_pair_stats"
+
+    # Dimension names from app.conditions.CONDITION_DIMENSIONS, stored with dim_a before dim_b in that order.
+    # Values are lookup ids, 0 when the collision has none.
+    dim_a: Mapped[str] = mapped_column(String(16), primary_key=True)
+    dim_b: Mapped[str] = mapped_column(String(16), primary_key=True)
+    a_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    b_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    severity_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+
+    collisions: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    injuries: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    serious_injuries: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    fatalities: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    harm: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
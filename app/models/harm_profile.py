@@ -0,0 +1,21 @@
+from sqlalchemy import Integer, String, Boolean, DateTime, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.core.base import Base
+
+# Named harm score weights, see app.harm. The default profile is stored per row in traffic_collisions.harm
+class HarmProfile(Base):
+    __tablename__ = "harm_profile"
+
+    name: Mapped[str] = mapped_column(String(32), primary_key=True)
+
+    # harm = fatalities * fatalities + serious_injuries * serious_injuries + injuries * injuries + collisions
+    fatalities: Mapped[int] = mapped_column(Integer, nullable=False)
+    serious_injuries: Mapped[int] = mapped_column(Integer, nullable=False)
+    injuries: Mapped[int] = mapped_column(Integer, nullable=False)
+    collisions: Mapped[int] = mapped_column(Integer, nullable=False)
+
+    is_default: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False)
+    # Incremented whenever the weights change
+    version: Mapped[int] = mapped_column(Integer, nullable=False, default=1)
+    updated_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), nullable=False, server_default=func.now())
@@ -0,0 +1,37 @@
+from sqlalchemy import Integer, String, DateTime, Float
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.core.base import Base
+
+# Per-intersection aggregates, maintained by app.intersections after each import
+class Intersection(Base):
+    __tablename__ = "intersection"
+
+    int_key: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    # Most common location text among the intersection's collisions
+    name: Mapped[str] = mapped_column(String(255), nullable=True)
+    lat: Mapped[float] = mapped_column(Float, nullable=True)
+    lon: Mapped[float] = mapped_column(Float, nullable=True)
+
+    # All-time totals
+    collision_count: Mapped[int] = mapped_column(Integer, nullable=False, index=True)
+    injuries: Mapped[int] = mapped_column(Integer, nullable=False)
+    serious_injuries: Mapped[int] = mapped_column(Integer, nullable=False)
+    fatalities: Mapped[int] = mapped_column(Integer, nullable=False)
+    harm: Mapped[int] = mapped_column(Integer, nullable=False, index=True)
+
+    # Rolling 12 months up to `as_of` (latest collision in the whole dataset)
+    collisions_12m: Mapped[int] = mapped_column(Integer, nullable=False, index=True)
+    harm_12m: Mapped[int] = mapped_column(Integer, nullable=False, index=True)
+    as_of: Mapped[DateTime] = mapped_column(DateTime(timezone=True), nullable=True)
+
+    first_occurred_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), nullable=True)
+    last_occurred_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), nullable=True)
+
+    # {severity code: collisions}
+    severity_mix: Mapped[dict] = mapped_column(JSONB, nullable=False)
+    # [{"month", "collisions", "harm"}] in month order
+    monthly: Mapped[list] = mapped_column(JSONB, nullable=False)
+    # Latest collisions, newest first: [{"id", "occurred_at", "severity", "collision_type"}]
+    recent: Mapped[list] = mapped_column(JSONB, nullable=False)
@@ -1,4 +1,4 @@
-from sqlalchemy import Integer, BigInteger,String, DateTime, ForeignKey, CheckConstraint, Float
+from sqlalchemy import Integer, BigInteger, SmallInteger, String, DateTime, ForeignKey, CheckConstraint, Float
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.core.base import Base
@@ -28,6 +28,11 @@ class TrafficCollision(Base):
 
     occurred_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), nullable=False)
 
+    # occurred_at in Seattle local time, precomputed so time-of-day aggregates skip per-row time zone conversion
+    local_hour: Mapped[int] = mapped_column(SmallInteger, nullable=True)   # 0-23
+    local_dow: Mapped[int] = mapped_column(SmallInteger, nullable=True)    # 0 = Monday ... 6 = Sunday
+    local_month: Mapped[int] = mapped_column(SmallInteger, nullable=True)  # 1-12
+
     # Counts
     person_count: Mapped[int] = mapped_column(Integer, nullable=True)
     ped_count: Mapped[int] = mapped_column(Integer, nullable=True)
@@ -37,6 +42,12 @@ class TrafficCollision(Base):
     serious_injuries: Mapped[int] = mapped_column(Integer, nullable=True)
     fatalities: Mapped[int] = mapped_column(Integer, nullable=True)
 
+    # Harm score under the default harm profile (app.harm), recomputed in bulk when its weights change
+    harm: Mapped[int] = mapped_column(Integer, nullable=True, index=True)
+
+    # Fingerprint of the normalized source record, re-imports skip rows whose hash is unchanged
+    record_hash: Mapped[int] = mapped_column(BigInteger, nullable=True)
+
     # Foreign Keys
     severity_id: Mapped[int] = mapped_column(ForeignKey("severity.id"), nullable=True, index=True)
     collision_type_id: Mapped[int] = mapped_column(ForeignKey("collision_type.id"), nullable=True, index=True)
@@ -0,0 +1,163 @@
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime
+from functools import partial
+from typing import Optional
+
+from sqlalchemy import func
+
+from app.core.cache import make_cache_key, result_cache
+from app.core.changes import change_listener
+from app.core.database import analytics_replicas
+from app.models.traffic_collisions import TrafficCollision
+from app.viz_specs import build_encoded, is_viz_result
+
+logger = logging.getLogger(__name__)
+
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() == "true"
+WARMUP_INTERVAL_SECONDS = float(os.getenv("WARMUP_INTERVAL_SECONDS", "60"))
+WARMUP_TOP_N = int(os.getenv("WARMUP_TOP_N", "10"))
+
+# Parameters the viz endpoints receive when called with no query string
+DEFAULT_JOBS: list[tuple[str, dict]] = [
+    ("collisions-by-severity", {}),
+    ("most-dangerous-intersections", {"metric": "harm", "limit": 20}),
+    ("most-dangerous-blocks", {"metric": "harm", "limit": 20}),
+    ("most-dangerous-alleys", {"metric": "harm", "limit": 20}),
+    ("collision-metrics-over-time", {"metric": "collisions", "interval": "month", "series": "none"}),
+    ("collision-heatmap", {"metric": "count"}),
+    ("hotspots", {"eps_m": 150.0, "min_collisions": 25, "metric": "harm", "limit": 50}),
+    ("time-matrix", {"matrix": "hour-of-week", "metric": "collisions"}),
+]
+
+
+class WarmupScheduler:
+    """
+    Background task that precomputes default and most requested viz results into the result cache.
+    Runs after startup, then re-checks every interval and rebuilds the cache when the data changed
+    (a new import raises max(id)) or when a refresh is requested. After change events only the
+    invalidated results are recomputed (missing_only), the rest of the cache is kept.
+    With a shared cache store each worker runs its own scheduler, but only one rebuilds per data version.
+    """
+
+    def __init__(self, interval: float = WARMUP_INTERVAL_SECONDS, top_n: int = WARMUP_TOP_N):
+        self.interval = interval
+        self.top_n = top_n
+        self.data_version: Optional[int] = None
+        self.last_refresh_at: Optional[datetime] = None
+        self.last_refresh_seconds: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.refresh_count = 0
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._force = False
+        self._missing_only = False
+
+    def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def request_refresh(self, missing_only: bool = False) -> None:
+        """
+        Ask for a rebuild on the next loop iteration, safe to call from any thread.
+        With missing_only, only jobs that are no longer cached are recomputed.
+        """
+        if missing_only:
+            self._missing_only = True
+        else:
+            self._force = True
+        if self._loop is not None and self._wake is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    async def _run(self) -> None:
+        while True:
+            force, self._force = self._force, False
+            missing_only, self._missing_only = self._missing_only, False
+            try:
+                await asyncio.to_thread(self.refresh, force, missing_only and not force)
+            except Exception as exc:
+                self.last_error = repr(exc)
+                logger.exception("Cache warm-up failed")
+
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    def refresh(self, force: bool = False, missing_only: bool = False) -> bool:
+        """
+        Rebuild cached results if the data version changed (or force is set).
+        With missing_only, compute just the jobs that are not cached and keep everything else.
+        Returns True if the cache was rebuilt.
+        """
+        # Same replicas as the stats/viz endpoints, so the version matches the data results are built from
+        with analytics_replicas.session() as db:
+            version = db.query(func.max(TrafficCollision.id)).scalar()
+            if not force and not missing_only and self.refresh_count and version == self.data_version:
+                return False
+            if not force and self.refresh_count and change_listener.connected:
+                # Change events already dropped exactly the stale results
+                missing_only = True
+
+            started = time.perf_counter()
+
+            # Defaults first, then the most requested combinations seen so far
+            jobs = list(DEFAULT_JOBS)
+            seen = {make_cache_key(name, params) for name, params in jobs}
+            for name, params in result_cache.most_requested(self.top_n):
+                key = make_cache_key(name, params)
+                if key not in seen and is_viz_result(name):
+                    seen.add(key)
+                    jobs.append((name, params))
+
+            if missing_only:
+                # Skips jobs another worker is computing into a shared store
+                computed = sum(
+                    result_cache.compute_missing(name, params, partial(build_encoded, db, name, **params))
+                    for name, params in jobs
+                )
+            elif result_cache.shared and not force and not result_cache.claim(f"warmup:{version}", self.interval):
+                # Another worker already rebuilt the shared store for this data version
+                computed = 0
+            else:
+                entries = [(name, params, build_encoded(db, name, **params)) for name, params in jobs]
+                # Swap in one step so requests never see a half-built cache
+                result_cache.replace_all(entries)
+                computed = len(entries)
+
+        self.data_version = version
+        self.last_refresh_at = datetime.now()
+        self.last_refresh_seconds = round(time.perf_counter() - started, 3)
+        self.last_error = None
+        self.refresh_count += 1
+        logger.info("Warmed %d cached results in %.2fs (data version %s)", computed, self.last_refresh_seconds, version)
+        return True
+
+    def status(self) -> dict:
+        return {
+            "enabled": WARMUP_ENABLED,
+            "running": self._task is not None and not self._task.done(),
+            "interval_seconds": self.interval,
+            "data_version": self.data_version,
+            "refresh_count": self.refresh_count,
+            "last_refresh_at": self.last_refresh_at.isoformat() if self.last_refresh_at else None,
+            "last_refresh_seconds": self.last_refresh_seconds,
+            "last_error": self.last_error,
+        }
+
+
+warmup_scheduler = WarmupScheduler()
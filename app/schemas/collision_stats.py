@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Optional
+from typing import Optional, Union
 from pydantic import BaseModel, ConfigDict
 
 class CollisionStatsSummaryOut(BaseModel):
@@ -18,3 +18,60 @@ class CollisionsStatsBySeverityOut(BaseModel):
     severity_desc: Optional[str] = None
     total_collisions: int
 
+
+class CollisionStatsCubeOut(BaseModel):
+    """
+    Columnar multi-dimensional stats.
+    `columns` maps each dimension, `grouping` and each measure to one list, all of length `row_count`.
+    """
+
+    dimensions: list[str]
+    measures: list[str]
+    row_count: int
+    columns: dict[str, list[Union[datetime, int, str, None]]]
+    # Bucket of the time dimension, coarser than requested when the query was over the cost guardrail
+    time_bucket: Optional[str] = None
+
+
+class CollisionStatsTimeMatrixOut(BaseModel):
+    """
+    Dense matrix: `values[r][c]` is the metric for `row_labels[r]` (day of week or month) at local hour `column_labels[c]`.
+    """
+
+    matrix: str
+    metric: str
+    row_labels: list[str]
+    column_labels: list[str]
+    values: list[list[int]]
+    total: int
+
+
+class ConditionCellOut(BaseModel):
+    row: str
+    column: str
+    collisions: int
+    injuries: int
+    serious_injuries: int
+    fatalities: int
+    harm: int
+    severity: dict[str, int]
+    share: float
+    row_share: float
+    lift: Optional[float] = None
+    injuries_per_collision: float
+    harm_per_collision: float
+    severe_rate: float
+
+
+class CollisionStatsConditionsOut(BaseModel):
+    """
+    Contingency table of two condition dimensions, cells sorted by collisions.
+    `share` is of all collisions, `row_share` of the row's collisions, `lift` observed / expected under independence.
+    """
+
+    row: str
+    column: str
+    total_collisions: int
+    row_totals: dict[str, int]
+    column_totals: dict[str, int]
+    cells: list[ConditionCellOut]
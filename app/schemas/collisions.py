@@ -24,6 +24,17 @@ class AddressTypeOut(BaseModel):
     id: int
     name: str
 
+class HarmProfileOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+    name: str
+    fatalities: int
+    serious_injuries: int
+    injuries: int
+    collisions: int
+    is_default: bool
+    version: int
+    updated_at: datetime
+
 class JunctionTypeOut(BaseModel):
     model_config = ConfigDict(from_attributes=True)
     id: int
@@ -0,0 +1,26 @@
+from typing import Any, Optional
+from pydantic import BaseModel, Field
+
+# Most panels one dashboard request may ask for
+DASHBOARD_MAX_PANELS = 12
+
+
+class DashboardPanelIn(BaseModel):
+    """
+    One viz of a dashboard: the /viz endpoint name and its query parameters.
+    """
+
+    viz: str
+    params: dict[str, Any] = {}
+    # Echoed back so clients can match panels without relying on order
+    id: Optional[str] = None
+
+
+class DashboardIn(BaseModel):
+    """
+    Panels computed together. `filters` (e.g. start_date, end_date, harm_profile) apply to every panel
+    whose viz takes that parameter; a panel's own `params` override them.
+    """
+
+    filters: dict[str, Any] = {}
+    panels: list[DashboardPanelIn] = Field(..., min_length=1, max_length=DASHBOARD_MAX_PANELS)
@@ -0,0 +1,40 @@
+from datetime import datetime
+from typing import Optional
+from pydantic import BaseModel, ConfigDict
+
+class IntersectionSummaryOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+    int_key: int
+    name: Optional[str] = None
+    lat: Optional[float] = None
+    lon: Optional[float] = None
+    collision_count: int
+    injuries: int
+    serious_injuries: int
+    fatalities: int
+    harm: int
+    collisions_12m: int
+    harm_12m: int
+    as_of: Optional[datetime] = None
+    last_occurred_at: Optional[datetime] = None
+
+class IntersectionMonthOut(BaseModel):
+    month: datetime
+    collisions: int
+    harm: int
+
+class IntersectionCollisionOut(BaseModel):
+    id: int
+    occurred_at: datetime
+    severity: str
+    collision_type: Optional[str] = None
+
+class IntersectionDetailOut(IntersectionSummaryOut):
+    """
+    One intersection's precomputed dashboard: totals, severity mix, monthly series and latest collisions.
+    """
+
+    first_occurred_at: Optional[datetime] = None
+    severity_mix: dict[str, int]
+    monthly: list[IntersectionMonthOut]
+    recent: list[IntersectionCollisionOut]
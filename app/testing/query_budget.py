@@ -0,0 +1,188 @@
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Iterator, Optional
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.database import analytics_replicas, get_engine, read_replicas
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "100"))
+# Held on each collision query by slow_statements, so concurrent requests overlap
+QUERY_DELAY_SECONDS = 0.3
+
+
+@dataclass
+class RecordedStatement:
+    statement: str
+    parameters: object
+    duration_ms: float
+
+
+@dataclass
+class QueryRecorder:
+    """
+    Statements executed on an engine while the recorder is active.
+    """
+    statements: list[RecordedStatement] = field(default_factory=list)
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def slow(self, threshold_ms: float = SLOW_QUERY_MS) -> list[RecordedStatement]:
+        return [s for s in self.statements if s.duration_ms >= threshold_ms]
+
+    def summary(self) -> str:
+        lines = [f"{self.count} statements:"]
+        for i, s in enumerate(self.statements, start=1):
+            first_line = " ".join(s.statement.split())[:200]
+            lines.append(f"  {i:>3}. {s.duration_ms:8.1f} ms  {first_line}")
+        return "\n".join(lines)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+@contextmanager
+def record_queries(engine: Engine) -> Iterator[QueryRecorder]:
+    """
+    Record every statement executed on `engine` inside the block.
+    """
+    recorder = QueryRecorder()
+
+    def before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("budget_query_started", []).append(time.perf_counter())
+
+    def after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["budget_query_started"].pop()
+        recorder.statements.append(
+            RecordedStatement(statement, parameters, (time.perf_counter() - started) * 1000)
+        )
+
+    event.listen(engine, "before_cursor_execute", before)
+    event.listen(engine, "after_cursor_execute", after)
+    try:
+        yield recorder
+    finally:
+        event.remove(engine, "before_cursor_execute", before)
+        event.remove(engine, "after_cursor_execute", after)
+
+
+@contextmanager
+def reads_on_primary() -> Iterator[Engine]:
+    """
+    Route read and analytics sessions to the primary inside the block and yield its engine,
+    so recorders and statement hooks on it see every query even when replicas are configured.
+    """
+    saved = read_replicas.replicas, analytics_replicas.replicas
+    read_replicas.replicas, analytics_replicas.replicas = [], []
+    try:
+        yield get_engine()
+    finally:
+        read_replicas.replicas, analytics_replicas.replicas = saved
+
+
+@contextmanager
+def slow_statements(engine: Engine, delay: float = QUERY_DELAY_SECONDS) -> Iterator[None]:
+    """
+    Sleep `delay` seconds before every collision query on `engine` inside the block.
+    EXPLAINs of the cost checks are not delayed.
+    """
+
+    def before(conn, cursor, statement, parameters, context, executemany):
+        if "traffic_collisions" in statement and not statement.startswith("EXPLAIN"):
+            time.sleep(delay)
+
+    event.listen(engine, "before_cursor_execute", before)
+    try:
+        yield
+    finally:
+        event.remove(engine, "before_cursor_execute", before)
+
+
+def fire_concurrently(app, urls: list[str]) -> list[tuple[object, float]]:
+    """
+    GET every url from its own thread and TestClient, all released at once.
+    Returns (response, seconds) per url, in order.
+    """
+    barrier = threading.Barrier(len(urls))
+    responses = [None] * len(urls)
+
+    def request(i: int) -> None:
+        client = TestClient(app)
+        barrier.wait()
+        started = time.perf_counter()
+        responses[i] = (client.get(urls[i]), time.perf_counter() - started)
+
+    threads = [threading.Thread(target=request, args=(i,)) for i in range(len(urls))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return responses
+
+
+def explain(engine: Engine, statement: str, parameters: object) -> str:
+    """
+    Return the EXPLAIN ANALYZE plan for a recorded statement.
+    """
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql(f"EXPLAIN (ANALYZE, BUFFERS) {statement}", parameters).all()
+        conn.rollback()
+    return "\n".join(row[0] for row in rows)
+
+
+def log_slow_queries(engine: Engine, recorder: QueryRecorder, threshold_ms: float = SLOW_QUERY_MS) -> None:
+    """
+    Log statements slower than the threshold together with their plans.
+    """
+    for s in recorder.slow(threshold_ms):
+        if not s.statement.lstrip().upper().startswith("SELECT"):
+            logger.warning("Slow statement (%.1f ms): %s", s.duration_ms, s.statement)
+            continue
+        logger.warning(
+            "Slow statement (%.1f ms): %s\n%s",
+            s.duration_ms, s.statement, explain(engine, s.statement, s.parameters),
+        )
+
+
+@contextmanager
+def query_budget(
+    engine: Engine,
+    max_queries: int,
+    slow_ms: Optional[float] = SLOW_QUERY_MS,
+    label: str = "block",
+) -> Iterator[QueryRecorder]:
+    """
+    Fail with QueryBudgetExceeded when the block executes more than `max_queries` statements.
+    Statements slower than `slow_ms` are logged with their EXPLAIN plans.
+    """
+    with record_queries(engine) as recorder:
+        yield recorder
+
+    if slow_ms is not None:
+        log_slow_queries(engine, recorder, slow_ms)
+
+    if recorder.count > max_queries:
+        raise QueryBudgetExceeded(
+            f"{label} executed {recorder.count} statements, budget is {max_queries}\n{recorder.summary()}"
+        )
+
+
+def assert_endpoint_budget(client, engine: Engine, url: str, max_queries: int, slow_ms: Optional[float] = SLOW_QUERY_MS):
+    """
+    Call `url` with a FastAPI TestClient and enforce its query budget.
+    """
+    with query_budget(engine, max_queries, slow_ms=slow_ms, label=f"GET {url}") as recorder:
+        response = client.get(url)
+    assert response.status_code == 200, f"GET {url} returned {response.status_code}: {response.text[:200]}"
+    return recorder
@@ -0,0 +1,17 @@
+from sqlalchemy.orm import Session
+
+from app.benchmarks.synthetic import seed_database
+from app.core.database import SessionLocal
+
+
+def seed_collisions(db: Session, count: int = 5000, seed: int = 42) -> int:
+    """
+    Insert `count` synthetic collisions (plus lookup rows) for local testing.
+    Returns the number of rows inserted.
+    """
+    return seed_database(db, count, seed=seed)
+
+
+if __name__ == "__main__":
+    with SessionLocal() as session:
+        print(f"Inserted {seed_collisions(session)} synthetic collisions")
@@ -0,0 +1,150 @@
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+
+import pytest
+
+from app.core.cache import CACHE_LOCK_SECONDS, ResultCache, make_cache_key
+from app.core.cache_stores import RedisStore, SQLiteStore
+
+MAX_ENTRIES = 3
+# How long a compute takes, so the other workers arrive while it runs
+COMPUTE_SECONDS = 0.5
+WORKERS = 4
+
+
+def check_store_contract(store) -> None:
+    """
+    get/set/evict/invalidate and the compute lock, the same for every shared store.
+    """
+    store.clear()
+    assert store.get("missing") is None and not store.contains("missing")
+
+    store.set("a", "stats-summary", {"start_date": "2020-01-01"}, {"total": 1, "rows": [1, 2]})
+    store.set("b", "collision-heatmap", {}, b"\x1f\x8bcompressed")
+    assert store.get("a") == {"total": 1, "rows": [1, 2]}
+    assert store.get("b") == b"\x1f\x8bcompressed"
+    assert store.contains("a") and [key for key, _ in store.entries()] == ["a", "b"]
+
+    # Oldest stored entries are evicted first
+    for key in ("c", "d"):
+        time.sleep(0.01)
+        store.set(key, "stats-summary", {}, key)
+    assert [key for key, _ in store.entries()] == ["b", "c", "d"] and store.get("a") is None
+
+    assert store.invalidate(lambda name, params: name == "collision-heatmap") == 1
+    assert not store.contains("b") and store.contains("c")
+
+    store.replace_all([("e", "stats-summary", {}, [1])])
+    assert [key for key, _ in store.entries()] == ["e"]
+    store.clear()
+    assert store.entries() == []
+
+    # Locks are exclusive until released or expired
+    assert store.acquire("k", 10)
+    assert not store.acquire("k", 10)
+    store.release("k")
+    assert store.acquire("k", 0.1)
+    time.sleep(0.2)
+    assert store.acquire("k", 10), "expired lock was not taken over"
+    store.release("k")
+
+
+def check_waits_for_other_worker(store) -> None:
+    """
+    A miss while another worker holds the compute lock waits for that worker's result instead of computing.
+    """
+    store.clear()
+    cache = ResultCache(MAX_ENTRIES, store=store)
+    key = make_cache_key("stats-summary", {"location": "pike"})
+    locked = threading.Event()
+
+    def other_worker():
+        assert store.acquire(key, CACHE_LOCK_SECONDS)
+        locked.set()
+        time.sleep(COMPUTE_SECONDS)
+        store.set(key, "stats-summary", {"location": "pike"}, {"total": 42})
+        store.release(key)
+
+    thread = threading.Thread(target=other_worker)
+    thread.start()
+    locked.wait()
+    computed = []
+    value = cache.get_or_compute("stats-summary", {"location": "pike"}, lambda: computed.append(1) or {"total": 0})
+    thread.join()
+    assert value == {"total": 42} and not computed
+    assert cache.stats()["by_name"]["stats-summary"]["waited"] == 1
+    assert store.acquire(key, 10), "lock was not released"
+    store.release(key)
+
+
+def test_sqlite_store():
+    with tempfile.TemporaryDirectory() as directory:
+        store = SQLiteStore(MAX_ENTRIES, path=os.path.join(directory, "cache.sqlite3"))
+        check_store_contract(store)
+        check_waits_for_other_worker(store)
+    print("sqlite store: get/set, eviction, invalidation, locks and waiting on another worker")
+
+
+def test_redis_store():
+    fakeredis = pytest.importorskip("fakeredis")
+    # fakeredis runs the lock release script through lupa
+    pytest.importorskip("lupa")
+    server = fakeredis.FakeServer()
+    store = RedisStore(MAX_ENTRIES, client=fakeredis.FakeRedis(server=server), prefix="test:cache:")
+    check_store_contract(store)
+    check_waits_for_other_worker(store)
+
+    # A holder that ran past the expiry must not release the lock another worker took since
+    other = RedisStore(MAX_ENTRIES, client=fakeredis.FakeRedis(server=server), prefix="test:cache:")
+    assert store.acquire("k", 0.1)
+    time.sleep(0.2)
+    assert other.acquire("k", 10)
+    store.release("k")
+    assert not store.acquire("k", 10), "expired holder released the new holder's lock"
+    other.release("k")
+    assert store.acquire("k", 10)
+    store.release("k")
+    print("redis store (fakeredis): get/set, eviction, invalidation, locks and waiting on another worker")
+
+
+def _worker(path: str, start: multiprocessing.Barrier, results: multiprocessing.Queue) -> None:
+    # A separate process, as a uvicorn worker would be
+    store = SQLiteStore(MAX_ENTRIES, path=path)
+    cache = ResultCache(MAX_ENTRIES, store=store)
+
+    def compute():
+        time.sleep(COMPUTE_SECONDS)
+        return {"computed_by": os.getpid()}
+
+    start.wait()
+    value = cache.get_or_compute("stats-summary", {}, compute)
+    results.put((os.getpid(), value["computed_by"]))
+
+
+def test_sqlite_store_coalesces_across_processes():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "cache.sqlite3")
+        SQLiteStore(MAX_ENTRIES, path=path)
+        context = multiprocessing.get_context("spawn")
+        start = context.Barrier(WORKERS)
+        results = context.Queue()
+        workers = [context.Process(target=_worker, args=(path, start, results)) for _ in range(WORKERS)]
+        for worker in workers:
+            worker.start()
+        values = [results.get(timeout=30) for _ in workers]
+        for worker in workers:
+            worker.join()
+
+    computed_by = {value for _, value in values}
+    assert len(computed_by) == 1, values
+    assert computed_by <= {pid for pid, _ in values}
+    print(f"{WORKERS} processes missed the same entry, one computed it")
+
+
+if __name__ == "__main__":
+    test_sqlite_store()
+    test_redis_store()
+    test_sqlite_store_coalesces_across_processes()
@@ -0,0 +1,105 @@
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.cache import result_cache
+from app.core.database import DATABASE_URL
+from app.main import app
+from app.testing.query_budget import reads_on_primary, record_queries, slow_statements
+from app.testing.test_query_budget import ensure_seeded
+
+pytestmark = pytest.mark.skipif(not DATABASE_URL, reason="DATABASE_URL is not set")
+
+FILTERS = {"start_date": "2015-01-01T00:00:00", "harm_profile": None}
+PANELS = [
+    {"viz": "collisions-by-severity", "id": "severity"},
+    {"viz": "most-dangerous-intersections", "params": {"limit": 10}},
+    {"viz": "most-dangerous-blocks", "params": {"limit": 10}},
+    {"viz": "most-dangerous-alleys", "params": {"limit": 10}},
+    {"viz": "collision-metrics-over-time", "params": {"interval": "week", "series": "severity"}},
+    {"viz": "collision-heatmap", "params": {"metric": "count"}},
+]
+# The same panels as single /viz requests
+SINGLE_URLS = [
+    "/viz/collisions-by-severity?start_date=2015-01-01T00:00:00",
+    "/viz/most-dangerous-intersections?limit=10&start_date=2015-01-01T00:00:00",
+    "/viz/most-dangerous-blocks?limit=10&start_date=2015-01-01T00:00:00",
+    "/viz/most-dangerous-alleys?limit=10&start_date=2015-01-01T00:00:00",
+    "/viz/collision-metrics-over-time?interval=week&series=severity&start_date=2015-01-01T00:00:00",
+    "/viz/collision-heatmap?metric=count&start_date=2015-01-01T00:00:00",
+]
+
+
+@pytest.fixture(scope="module", autouse=True)
+def seeded():
+    ensure_seeded()
+
+
+def test_dashboard_matches_single_requests():
+    client = TestClient(app)
+    result_cache.clear()
+    with reads_on_primary() as engine, record_queries(engine) as recorder:
+        response = client.post("/viz/dashboard", json={"filters": FILTERS, "panels": PANELS})
+    assert response.status_code == 200, response.text
+    panels = response.json()["panels"]
+    assert [p["viz"] for p in panels] == [p["viz"] for p in PANELS] and panels[0]["id"] == "severity"
+
+    ranked = [s for s in recorder.statements if "row_number() OVER" in s.statement]
+    assert len(ranked) == 1, recorder.summary()
+    print(f"dashboard: {recorder.count} statements, the three bar charts from one ranked query")
+
+    for panel, url in zip(panels, SINGLE_URLS):
+        result_cache.clear()
+        single = client.get(url)
+        assert single.status_code == 200, single.text
+        assert panel["spec"] == single.json(), f"{url}: dashboard panel differs"
+    print(f"all {len(panels)} panels equal their /viz responses")
+
+
+def test_panels_run_concurrently():
+    client = TestClient(app)
+    # Collision queries are slowed, so panel times dominate and overlap is visible
+    with reads_on_primary() as engine, slow_statements(engine):
+        result_cache.clear()
+        started = time.perf_counter()
+        for url in SINGLE_URLS:
+            assert client.get(url).status_code == 200
+        sequential = time.perf_counter() - started
+
+        result_cache.clear()
+        started = time.perf_counter()
+        response = client.post("/viz/dashboard", json={"filters": FILTERS, "panels": PANELS})
+        together = time.perf_counter() - started
+    assert response.status_code == 200, response.text
+    assert together < sequential / 2, (together, sequential)
+    print(f"{len(SINGLE_URLS)} requests one after another: {sequential:.2f}s, one dashboard request: {together:.2f}s")
+
+
+def test_panel_errors():
+    client = TestClient(app)
+    result_cache.clear()
+    response = client.post("/viz/dashboard", json={"panels": [
+        {"viz": "collisions-by-severity"},
+        {"viz": "most-dangerous-blocks", "params": {"harm_profile": "no-such-profile"}},
+    ]})
+    assert response.status_code == 200, response.text
+    ok, missing = response.json()["panels"]
+    assert "spec" in ok and missing["status"] == 404, missing
+    print(f"failed panel reported in place: {missing['detail']}")
+
+    for body in [
+        {"panels": [{"viz": "no-such-viz"}]},
+        {"panels": [{"viz": "collision-heatmap", "params": {"metric": "speed"}}]},
+        {"panels": [{"viz": "collision-heatmap", "params": {"colour": "red"}}]},
+        {"panels": []},
+    ]:
+        assert client.post("/viz/dashboard", json=body).status_code == 422, body
+    print("unknown viz, invalid and unknown parameters rejected with 422")
+
+
+if __name__ == "__main__":
+    ensure_seeded()
+    test_dashboard_matches_single_requests()
+    test_panels_run_concurrently()
+    test_panel_errors()
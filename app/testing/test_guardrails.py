@@ -0,0 +1,128 @@
+from contextlib import contextmanager
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app.core.guardrails as guardrails
+from app.core.cache import result_cache
+from app.core.database import DATABASE_URL
+from app.core.guardrails import Gate, RouteLimits, admission
+from app.main import app
+from app.testing.query_budget import QUERY_DELAY_SECONDS, fire_concurrently, reads_on_primary, slow_statements
+from app.testing.test_query_budget import ensure_seeded
+
+pytestmark = pytest.mark.skipif(not DATABASE_URL, reason="DATABASE_URL is not set")
+
+BURST = 6
+HEATMAP = "/viz/collision-heatmap"
+
+
+@pytest.fixture(scope="module", autouse=True)
+def seeded():
+    # The timeout and cost checks need a table big enough to be slow and expensive
+    ensure_seeded()
+
+
+@contextmanager
+def slow_queries():
+    # On the primary, so the delay applies whether or not replicas are configured
+    with reads_on_primary() as engine, slow_statements(engine):
+        yield
+
+
+def test_burst_is_shed_and_cheap_routes_stay_fast():
+    # One slot and one queued request for the heatmap, the rest of the burst is shed
+    admission._gates[HEATMAP] = Gate(1, 1)
+    result_cache.clear()
+    # Different date ranges, so single-flight does not merge them
+    urls = [f"{HEATMAP}?start_date=20{10 + i}-01-01T00:00:00" for i in range(BURST)]
+    try:
+        with slow_queries():
+            responses = fire_concurrently(app, urls + ["/lookups/severities"])
+    finally:
+        del admission._gates[HEATMAP]
+
+    statuses = sorted(r.status_code for r, _ in responses[:BURST])
+    assert statuses == [200, 200] + [429] * (BURST - 2), statuses
+    assert all(r.headers["Retry-After"] for r, _ in responses[:BURST] if r.status_code == 429)
+    cheap, seconds = responses[-1]
+    assert cheap.status_code == 200 and seconds < QUERY_DELAY_SECONDS, seconds
+    print(f"{BURST} heatmap requests: {statuses}, /lookups/severities in {seconds * 1000:.0f} ms")
+
+
+def test_queue_timeout_is_503():
+    admission._gates[HEATMAP] = Gate(1, 4)
+    saved = admission.queue_timeout
+    admission.queue_timeout = QUERY_DELAY_SECONDS / 2
+    result_cache.clear()
+    try:
+        with slow_queries():
+            responses = fire_concurrently(app, [f"{HEATMAP}?severity_id={i}" for i in range(1, 4)])
+    finally:
+        admission.queue_timeout = saved
+        del admission._gates[HEATMAP]
+
+    statuses = sorted(r.status_code for r, _ in responses)
+    assert statuses == [200, 503, 503], statuses
+    print(f"requests queued past the timeout: {statuses}")
+
+
+def test_cached_results_are_served_while_shedding():
+    client = TestClient(app)
+    result_cache.clear()
+    assert client.get(HEATMAP).status_code == 200
+    # No slots and no queue: every computation is shed, the cached result still served
+    admission._gates[HEATMAP] = Gate(0, 0)
+    try:
+        cached = client.get(HEATMAP)
+        missed = client.get(f"{HEATMAP}?severity_id=1")
+    finally:
+        del admission._gates[HEATMAP]
+    assert cached.status_code == 200, cached.text
+    assert missed.status_code == 429, missed.text
+    print("cached heatmap served while its route sheds every computation")
+
+
+def test_statement_timeout_is_503():
+    client = TestClient(app)
+    result_cache.clear()
+    # The heatmap aggregate over the whole table takes well over 1 ms
+    guardrails.ROUTE_LIMITS[HEATMAP] = RouteLimits(statement_timeout_ms=1)
+    try:
+        response = client.get(HEATMAP)
+    finally:
+        del guardrails.ROUTE_LIMITS[HEATMAP]
+    assert response.status_code == 503, response.text
+    assert client.get(HEATMAP).status_code == 200
+    print("statement timeout answered with 503, next request unaffected")
+
+
+def test_expensive_requests_are_downgraded_or_rejected():
+    client = TestClient(app)
+    saved = guardrails.QUERY_COST_DOWNGRADE, guardrails.QUERY_COST_LIMIT
+    try:
+        guardrails.QUERY_COST_DOWNGRADE = 1
+        result_cache.clear()
+        spec = client.get("/viz/collision-metrics-over-time?interval=day&series=severity").json()
+        assert spec["usermeta"] == {"interval": "week", "requested_interval": "day"}, spec.get("usermeta")
+        cube = client.get("/collisions/stats/cube?group_by=time&group_by=severity&time_bucket=month").json()
+        assert cube["time_bucket"] == "year", cube["time_bucket"]
+        print("over QUERY_COST_DOWNGRADE: served one bucket size coarser (day -> week, month -> year)")
+
+        guardrails.QUERY_COST_LIMIT = 1
+        result_cache.clear()
+        response = client.get(HEATMAP)
+        assert response.status_code == 400, response.text
+        print(f"over QUERY_COST_LIMIT: {response.json()['detail']}")
+    finally:
+        guardrails.QUERY_COST_DOWNGRADE, guardrails.QUERY_COST_LIMIT = saved
+        result_cache.clear()
+
+
+if __name__ == "__main__":
+    ensure_seeded()
+    test_burst_is_shed_and_cheap_routes_stay_fast()
+    test_queue_timeout_is_503()
+    test_cached_results_are_served_while_shedding()
+    test_statement_timeout_is_503()
+    test_expensive_requests_are_downgraded_or_rejected()
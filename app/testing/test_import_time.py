@@ -0,0 +1,53 @@
+import os
+import subprocess
+import sys
+
+# Cumulative import time budget for `import app.main`, best of RUNS cold interpreter starts
+IMPORT_BUDGET_MS = float(os.getenv("IMPORT_BUDGET_MS", "1000"))
+RUNS = 3
+
+# Loaded on first use (database session, hotspot map, viz specs, importers, warm-up), never by importing the app
+DEFERRED_MODULES = [
+    "psycopg", "numpy", "requests", "app.hotspots", "app.viz_specs", "app.harm", "app.conditions",
+    "app.intersections", "app.time_matrix", "app.precompute", "app.data_import.seattle_collisions",
+    "app.data_import.snapshot",
+]
+
+
+def import_times(module: str) -> dict[str, tuple[int, int]]:
+    """
+    Run `python -X importtime -c "import <module>"` in a fresh interpreter.
+    Returns module -> (self, cumulative) microseconds.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        times[name.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def test_app_import_budget():
+    runs = [import_times("app.main") for _ in range(RUNS)]
+    best = min(runs, key=lambda times: times["app.main"][1])
+    total_ms = best["app.main"][1] / 1000
+
+    slowest = sorted(best.items(), key=lambda item: item[1][0], reverse=True)[:10]
+    for name, (self_us, _) in slowest:
+        print(f"{self_us / 1000:8.1f} ms  {name}")
+    print(f"import app.main: {total_ms:.0f} ms (budget {IMPORT_BUDGET_MS:.0f} ms)")
+
+    loaded = [name for name in DEFERRED_MODULES if name in best]
+    assert not loaded, f"import app.main loads {', '.join(loaded)}, these should be imported on first use"
+    assert total_ms <= IMPORT_BUDGET_MS, f"import app.main took {total_ms:.0f} ms, budget is {IMPORT_BUDGET_MS:.0f} ms"
+
+
+if __name__ == "__main__":
+    test_app_import_budget()
@@ -1,22 +1,21 @@
-from datetime import datetime
+from datetime import datetime, timezone
 from app.core.database import SessionLocal
 from app.models.traffic_collisions import TrafficCollision
 from app.models.severity import Severity
 from app.models.collision_type import CollisionType
 
 def insert_test_data():
-    severity = Severity(code="1", desc="Property Damage")
-    collision_type = CollisionType(code="2", desc="Parked Car Hit")
-
     # Open new session and create new collision object
     with SessionLocal() as session:
+        severity = session.query(Severity).filter_by(code="1").first() or Severity(code="1", desc="Property Damage")
+        collision_type = session.query(CollisionType).filter_by(name="Parked Car").first() or CollisionType(name="Parked Car")
+
         collision = TrafficCollision(
             location="Port Orchard Ave",
-            severity="Property Damage",
             inc_key=999999999999,
-            occurred_at=datetime(2026, 1, 14, 14, 0),
-            severity_id=severity.id,
-            collision_type_id=collision_type.id
+            occurred_at=datetime(2026, 1, 14, 14, 0, tzinfo=timezone.utc),
+            severity=severity,
+            collision_type=collision_type
         )
 
         # Add to session for insertion
@@ -27,13 +26,14 @@ def insert_test_data():
 
         print(f"Inserted collision with ID: {collision.id}")
 
-        # Retrieve all collisions
-        all_collisions = session.query(TrafficCollision).all()
+        # Retrieve the inserted collision, then remove it again
+        inserted = session.query(TrafficCollision).filter_by(inc_key=999999999999).one()
+        print(inserted.id, inserted.inc_key, inserted.location, inserted.severity_id, inserted.collision_type_id, inserted.occurred_at)
 
-        for coll in all_collisions:
-            print(coll.id, coll.inc_key, coll.location, coll.severity_id, coll.collision_type_id, coll.occurred_at)
+        session.delete(inserted)
+        session.commit()
 
 
 
 if __name__ == "__main__":
-    insert_test_data()
\ No newline at end of file
+    insert_test_data()
@@ -0,0 +1,61 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import func
+
+from app.core.cache import result_cache
+from app.core.database import DATABASE_URL, SessionLocal
+from app.main import app
+from app.models import TrafficCollision
+from app.testing.query_budget import assert_endpoint_budget, reads_on_primary
+from app.testing.seed import seed_collisions
+
+pytestmark = pytest.mark.skipif(not DATABASE_URL, reason="DATABASE_URL is not set")
+
+# Max SQL statements per request, cached viz results are cleared before each call
+# Analytical routes (/collisions/stats, /viz) also run SET LOCAL statement_timeout,
+# and the cost-guarded ones an EXPLAIN (see app.core.guardrails)
+ENDPOINT_BUDGETS = {
+    "/collisions/?limit=100": 2,
+    "/collisions/?limit=100&severity=Injury": 2,
+    "/collisions/{id}": 1,
+    "/lookups/severities": 1,
+    "/collisions/stats/": 2,
+    "/collisions/stats/by-severity": 2,
+    "/collisions/stats/cube?group_by=severity&group_by=weather": 3,
+    "/viz/collisions-by-severity": 2,
+    "/viz/most-dangerous-intersections": 2,
+    "/viz/collision-metrics-over-time": 4,
+    "/viz/collision-heatmap": 3,
+    "/viz/hotspots": 3,
+    "/viz/time-matrix": 2,
+    "/collisions/stats/time-matrix": 2,
+    "/collisions/stats/conditions?row=road&column=light": 2,
+    "/intersections/top": 1,
+}
+
+
+def ensure_seeded(min_rows: int = 5000) -> int:
+    """
+    Seed synthetic collisions if the local database has fewer than `min_rows`.
+    """
+    with SessionLocal() as db:
+        existing = db.query(func.count(TrafficCollision.id)).scalar()
+        if existing < min_rows:
+            seed_collisions(db, min_rows - existing)
+        return db.query(func.min(TrafficCollision.id)).scalar()
+
+
+def test_endpoint_query_budgets():
+    collision_id = ensure_seeded()
+
+    # No lifespan, so the warm-up scheduler does not add statements
+    client = TestClient(app)
+    with reads_on_primary() as engine:
+        for url, budget in ENDPOINT_BUDGETS.items():
+            result_cache.clear()
+            recorder = assert_endpoint_budget(client, engine, url.format(id=collision_id), budget)
+            print(f"{recorder.count}/{budget}  {url}")
+
+
+if __name__ == "__main__":
+    test_endpoint_query_budgets()
@@ -0,0 +1,105 @@
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app.core.database as database
+from app.core.cache import result_cache
+from app.core.database import Replica, ReplicaPool, analytics_replicas, get_engine, read_replicas
+from app.main import app
+from app.models import HarmProfile
+from app.testing.query_budget import record_queries
+
+# Run with READ_REPLICA_URLS pointing at a second local Postgres, e.g. a standby started from
+# `pg_basebackup -R` of the DATABASE_URL server, or an instance loaded from the same snapshot.
+UNREACHABLE_URL = "postgresql+psycopg://postgres@localhost:1/roadhelp"
+
+needs_read_replica = pytest.mark.skipif(not read_replicas.replicas, reason="READ_REPLICA_URLS is not set")
+needs_analytics_replica = pytest.mark.skipif(not analytics_replicas.replicas, reason="no analytics replica configured")
+
+
+def test_non_standby_is_behind_after_a_change():
+    # No server needed, the state check() would record for each kind of replica
+    standby, copy = Replica(UNREACHABLE_URL), Replica(UNREACHABLE_URL)
+    standby.in_recovery, standby.replay_lsn = True, database._lsn("0/5000000")
+    copy.in_recovery, copy.replay_lsn = False, None
+
+    saved = database._required_lsn
+    database._required_lsn = None
+    try:
+        assert standby.caught_up() and copy.caught_up()
+        database.require_replay("0/4000000")
+        assert standby.caught_up(), "standby replayed past the change"
+        assert not copy.caught_up(), "a server that is not a standby cannot have replayed the change"
+        database.require_replay("0/6000000")
+        assert not standby.caught_up()
+    finally:
+        database._required_lsn = saved
+    print("after a change event only standbys that replayed it are caught up")
+
+
+@needs_analytics_replica
+def test_reads_go_to_replica():
+    client = TestClient(app)
+    replica = analytics_replicas.replicas[0]
+    result_cache.clear()
+
+    with record_queries(get_engine()) as primary, record_queries(replica.engine) as on_replica:
+        response = client.get("/collisions/stats/")
+    assert response.status_code == 200, response.text
+    assert replica.healthy, replica.last_error
+    assert on_replica.count >= 1 and primary.count == 0, (primary.summary(), on_replica.summary())
+    print(f"/collisions/stats/ ran {on_replica.count} statement(s) on the replica, lag {replica.lag_seconds}s")
+
+    with record_queries(get_engine()) as primary:
+        assert client.get("/lookups/severities").status_code == 200
+    assert primary.count == 0
+    print("/lookups/severities read from the replica")
+
+
+@needs_read_replica
+def test_writes_go_to_primary():
+    replica = read_replicas.replicas[0]
+    with read_replicas.session() as db, record_queries(get_engine()) as primary, record_queries(replica.engine) as on_replica:
+        db.add(HarmProfile(name="replica-test", fatalities=1, serious_injuries=1, injuries=1, collisions=1, is_default=False, version=1))
+        db.flush()
+        assert db.get(HarmProfile, "replica-test") is not None
+        db.rollback()
+    assert any("INSERT INTO harm_profile" in s.statement for s in primary.statements), primary.summary()
+    assert not any("INSERT" in s.statement for s in on_replica.statements), on_replica.summary()
+    print("flush went to the primary")
+
+
+@needs_read_replica
+def test_fallback_to_primary():
+    replica = read_replicas.replicas[0]
+
+    # A change the replica has not replayed yet (far ahead of the primary's WAL), whether it is a standby or not
+    saved = database._required_lsn
+    database.require_replay("FFFF/0")
+    try:
+        fallbacks = read_replicas.fallbacks
+        assert read_replicas.engine() is get_engine()
+        assert read_replicas.fallbacks == fallbacks + 1 and not replica.caught_up()
+    finally:
+        database._required_lsn = saved
+    assert read_replicas.engine() is replica.engine
+    print("replica behind a required LSN is skipped")
+
+    strict = ReplicaPool("strict", [replica.url], max_lag=-1)
+    assert strict.engine() is get_engine()
+    print("replica over the lag limit is skipped")
+
+    unreachable = ReplicaPool("unreachable", [UNREACHABLE_URL])
+    assert unreachable.engine() is get_engine()
+    assert not unreachable.replicas[0].healthy and unreachable.replicas[0].last_error
+    print("unreachable replica falls back to the primary")
+
+
+if __name__ == "__main__":
+    test_non_standby_is_behind_after_a_change()
+    if not os.getenv("READ_REPLICA_URLS"):
+        raise SystemExit("Set READ_REPLICA_URLS to a second Postgres with the same data")
+    test_reads_go_to_replica()
+    test_writes_go_to_primary()
+    test_fallback_to_primary()
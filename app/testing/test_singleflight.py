@@ -0,0 +1,94 @@
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.cache import result_cache
+from app.core.database import DATABASE_URL
+from app.core.singleflight import inflight
+from app.main import app
+from app.testing.query_budget import fire_concurrently, reads_on_primary, record_queries, slow_statements
+from app.testing.test_query_budget import ensure_seeded
+
+CONCURRENT_REQUESTS = 12
+
+COALESCED_URLS = {
+    "/viz/collision-heatmap": "collision-heatmap",
+    "/collisions/stats/": "stats-summary",
+    "/collisions/stats/cube?group_by=severity&group_by=weather": "stats-cube",
+}
+
+
+@pytest.mark.skipif(not DATABASE_URL, reason="DATABASE_URL is not set")
+def test_identical_requests_run_one_query():
+    ensure_seeded()
+    client = TestClient(app)
+
+    for url, name in COALESCED_URLS.items():
+        # Statements one request runs on its own
+        result_cache.clear()
+        with reads_on_primary() as engine, record_queries(engine) as single:
+            expected = client.get(url)
+        assert expected.status_code == 200, expected.text
+
+        result_cache.clear()
+        before = inflight.stats()["by_name"].get(name, {"executed": 0, "coalesced": 0})
+        # Slowed so the followers arrive while the leader's query is still running
+        with reads_on_primary() as engine, slow_statements(engine), record_queries(engine) as concurrent:
+            responses = [r for r, _ in fire_concurrently(app, [url] * CONCURRENT_REQUESTS)]
+        after = inflight.stats()["by_name"][name]
+
+        assert all(r.status_code == 200 for r in responses), [r.status_code for r in responses]
+        assert all(r.json() == expected.json() for r in responses), f"{url}: followers got a different result"
+        assert concurrent.count == single.count, (
+            f"{url}: {CONCURRENT_REQUESTS} requests ran {concurrent.count} statements, one runs {single.count}\n"
+            + concurrent.summary()
+        )
+        executed = after["executed"] - before["executed"]
+        coalesced = after["coalesced"] - before["coalesced"]
+        assert executed == 1 and coalesced == CONCURRENT_REQUESTS - 1, (executed, coalesced)
+        print(f"{concurrent.count} statement(s) for {CONCURRENT_REQUESTS} requests, {coalesced} coalesced  {url}")
+
+    assert inflight.in_flight() == 0
+
+
+def test_followers_get_the_leaders_error():
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def failing():
+        calls.append(1)
+        started.set()
+        release.wait()
+        raise ValueError("boom")
+
+    errors = []
+
+    def call():
+        try:
+            inflight.do("test:error", failing, "test")
+        except ValueError as exc:
+            errors.append(exc)
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    started.wait()
+    followers = [threading.Thread(target=call) for _ in range(3)]
+    for thread in followers:
+        thread.start()
+    while inflight.stats()["by_name"]["test"]["coalesced"] < 3:
+        time.sleep(0.01)
+    release.set()
+    for thread in [leader, *followers]:
+        thread.join()
+
+    assert len(calls) == 1 and len(errors) == 4
+    assert inflight.in_flight() == 0
+    print("leader error raised in all 4 callers")
+
+
+if __name__ == "__main__":
+    test_identical_requests_run_one_query()
+    test_followers_get_the_leaders_error()
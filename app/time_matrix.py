@@ -0,0 +1,70 @@
+from datetime import datetime
+from typing import Literal, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.harm import harm_total, profile_weights
+from app.models.traffic_collisions import TrafficCollision
+
+DAY_LABELS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+MONTH_LABELS = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+HOUR_LABELS = [f"{hour:02d}" for hour in range(24)]
+
+# Matrix name -> (row column, first row value, row labels); columns are always the local hour
+MATRICES = {
+    "hour-of-week": (TrafficCollision.local_dow, 0, DAY_LABELS),
+    "month-by-hour": (TrafficCollision.local_month, 1, MONTH_LABELS),
+}
+
+
+def time_matrix(
+    db: Session,
+    *,
+    matrix: Literal["hour-of-week", "month-by-hour"] = "hour-of-week",
+    metric: Literal["collisions", "harm"] = "collisions",
+    severity_id: Optional[int] = None,
+    location: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    harm_profile: Optional[str] = None,
+) -> dict:
+    """
+    Collisions (or harm score) by local hour against day of week or month, as a dense matrix.
+    Groups on the precomputed local time columns, so no time zone conversion runs per row.
+    """
+    row_column, first_row, row_labels = MATRICES[matrix]
+
+    query = db.query(TrafficCollision).filter(row_column.isnot(None), TrafficCollision.local_hour.isnot(None))
+    if severity_id:
+        query = query.filter(TrafficCollision.severity_id == severity_id)
+    if location:
+        query = query.filter(TrafficCollision.location.ilike(f"%{location}%"))
+    if start_date:
+        query = query.filter(TrafficCollision.occurred_at >= start_date)
+    if end_date:
+        query = query.filter(TrafficCollision.occurred_at <= end_date)
+
+    if metric == "collisions":
+        value_expr = func.count(TrafficCollision.id)
+    else:
+        value_expr = harm_total(profile_weights(db, harm_profile))
+
+    rows = (
+        query.with_entities(row_column, TrafficCollision.local_hour, value_expr)
+        .group_by(row_column, TrafficCollision.local_hour)
+        .all()
+    )
+
+    values = [[0] * len(HOUR_LABELS) for _ in row_labels]
+    for row, hour, value in rows:
+        values[row - first_row][hour] = int(value)
+
+    return {
+        "matrix": matrix,
+        "metric": metric,
+        "row_labels": row_labels,
+        "column_labels": HOUR_LABELS,
+        "values": values,
+        "total": sum(map(sum, values)),
+    }
@@ -1,16 +1,26 @@
 import json
+from functools import partial
 from pathlib import Path
+from urllib.parse import urlencode
 from typing import Literal, Optional
-from datetime import datetime
+from datetime import datetime, timedelta
 
 from sqlalchemy.orm import Session
-from sqlalchemy import String, func, literal
+from sqlalchemy import String, and_, case, func, literal, or_
 
+from app.core.compression import encode_json_variants
+from app.core.guardrails import affordable_variant, check_cost
+from app.harm import harm_total, profile_weights
+from app.time_matrix import HOUR_LABELS, MATRICES, time_matrix
 from app.models.address_type import AddressType
 from app.models.severity import Severity
 from app.models.traffic_collisions import TrafficCollision
 
 
+# Heatmap cell edge in degrees
+HEATMAP_CELL_SIZE = 0.0025
+
+
 def load_vega_spec(filename: str) -> dict:
     """
     Load a Vega JSON spec template from `app\vega_specs\`.
@@ -73,7 +83,8 @@ def build_horizontal_bar_graph_spec(
     end_date: Optional[datetime] = None,
     address_type_name: str,
     metric: Literal["harm", "count"] = "harm",
-    limit: int
+    limit: int,
+    harm_profile: Optional[str] = None
 ) -> dict:
     """
     Build "top N locations" horizontal bar chart.
@@ -94,22 +105,12 @@ def build_horizontal_bar_graph_spec(
     if end_date:
         query = query.filter(TrafficCollision.occurred_at <= end_date)
 
-    # Aggregates for calculating metrics
+    # Metric determining y-axis data, harm is the stored per-row score unless another profile is asked for
     collision_count = func.count(TrafficCollision.id)
-    injuries_total = func.coalesce(func.sum(TrafficCollision.injuries), 0)
-    serious_injuries_total = func.coalesce(func.sum(TrafficCollision.serious_injuries), 0)
-    fatalities_total = func.coalesce(func.sum(TrafficCollision.fatalities), 0)
-
-    # Weighted "harm score", numbers easily adjustable
-    harm_score = (
-        fatalities_total * 5
-        + serious_injuries_total * 3
-        + injuries_total * 2
-        + collision_count * 1
-    )
-
-    # Metric determining y-axis data
-    amount_expr = collision_count if metric == "count" else harm_score
+    if metric == "count":
+        amount_expr = collision_count
+    else:
+        amount_expr = harm_total(profile_weights(db, harm_profile))
 
     # Intersections grouped by int_key
     if address_type_name.strip().lower() == "intersection":
@@ -122,7 +123,8 @@ def build_horizontal_bar_graph_spec(
                 amount_expr.label("amount"),
             )
             .group_by(TrafficCollision.int_key)
-            .order_by(amount_expr.desc())
+            # Ties in key order, so the ranking is stable (and matches build_ranked_bar_graph_specs)
+            .order_by(amount_expr.desc(), TrafficCollision.int_key)
             .limit(limit)
             .all()
         )
@@ -137,7 +139,7 @@ def build_horizontal_bar_graph_spec(
                 amount_expr.label("amount"),
             )
             .group_by(TrafficCollision.location)
-            .order_by(amount_expr.desc())
+            .order_by(amount_expr.desc(), TrafficCollision.location)
             .limit(limit)
             .all()
         )
@@ -147,6 +149,95 @@ def build_horizontal_bar_graph_spec(
     return inject_values(spec, values)
 
 
+# Address type of each "top N locations" viz
+RANKED_BAR_GRAPHS = {
+    "most-dangerous-intersections": "Intersection",
+    "most-dangerous-blocks": "Block",
+    "most-dangerous-alleys": "Alley",
+}
+
+
+def build_ranked_bar_graph_specs(
+    db: Session,
+    *,
+    limits: dict[str, int],
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    metric: Literal["harm", "count"] = "harm",
+    harm_profile: Optional[str] = None
+) -> dict[str, dict]:
+    """
+    Several "top N locations" bar charts (RANKED_BAR_GRAPHS name -> limit) from one statement:
+    the filtered collisions are grouped by address type and location in one CTE and ranked per
+    address type with row_number(). Each spec equals build_horizontal_bar_graph_spec's.
+    """
+    address_types = {RANKED_BAR_GRAPHS[name]: limit for name, limit in limits.items()}
+    is_intersection = AddressType.name == "Intersection"
+
+    query = (
+        db.query(TrafficCollision)
+        .join(TrafficCollision.address_type)
+        .filter(
+            AddressType.name.in_(address_types),
+            or_(
+                and_(is_intersection, TrafficCollision.int_key.isnot(None)),
+                and_(~is_intersection, TrafficCollision.location.isnot(None)),
+            ),
+        )
+    )
+    if start_date:
+        query = query.filter(TrafficCollision.occurred_at >= start_date)
+    if end_date:
+        query = query.filter(TrafficCollision.occurred_at <= end_date)
+
+    if metric == "count":
+        amount_expr = func.count(TrafficCollision.id)
+    else:
+        amount_expr = harm_total(profile_weights(db, harm_profile))
+
+    # Intersections are grouped by int_key, other address types by location text
+    int_key = case((is_intersection, TrafficCollision.int_key))
+    location_key = case((is_intersection, None), else_=TrafficCollision.location)
+    ranked = (
+        query.with_entities(
+            AddressType.name.label("address_type"),
+            int_key.label("int_key"),
+            func.max(TrafficCollision.location).label("category"),
+            amount_expr.label("amount"),
+            func.row_number().over(
+                partition_by=AddressType.name,
+                order_by=(amount_expr.desc(), int_key, location_key),
+            ).label("rank"),
+        )
+        .group_by(AddressType.name, int_key, location_key)
+        .cte("ranked")
+    )
+    rows = (
+        db.query(ranked)
+        .filter(ranked.c.rank <= max(address_types.values()))
+        .order_by(ranked.c.address_type, ranked.c.rank)
+        .all()
+    )
+
+    values = {address_type: [] for address_type in address_types}
+    for row in rows:
+        if row.rank > address_types[row.address_type]:
+            continue
+        if row.address_type == "Intersection":
+            values[row.address_type].append({"int_key": row.int_key, "category": row.category, "amount": row.amount})
+        else:
+            values[row.address_type].append({"category": row.category, "amount": row.amount})
+
+    return {
+        name: inject_values(load_vega_spec("horizontal_bar_graph.vega.json"), values[address_type])
+        for name, address_type in RANKED_BAR_GRAPHS.items() if name in limits
+    }
+
+
+# Finest first, a request over the cost guardrail is served the next one
+LINE_CHART_INTERVALS = ["day", "week", "month"]
+
+
 def build_line_chart_spec(
         db: Session,
         *,
@@ -155,10 +246,13 @@ def build_line_chart_spec(
         series: Literal["none", "severity"] = "none",
         location: Optional[str] = None,
         start_date: Optional[datetime] = None,
-        end_date: Optional[datetime] = None
+        end_date: Optional[datetime] = None,
+        harm_profile: Optional[str] = None,
+        max_points: Optional[int] = None
 ) -> dict:
     """
     Build line chart spec for collisions metrics over time.
+    With `max_points`, each series is downsampled to at most that many points (LTTB).
     """
     spec = load_vega_spec("line_chart.vega.json")
 
@@ -171,32 +265,23 @@ def build_line_chart_spec(
     if end_date:
         query = query.filter(TrafficCollision.occurred_at <= end_date)
 
-    # Time bucket used for grouping by interval (day/week/month)
-    bucket = func.date_trunc(interval, TrafficCollision.occurred_at)
-
     # Aggregates for calculating metrics
     collision_count = func.count(TrafficCollision.id)
     injuries_total = func.coalesce(func.sum(TrafficCollision.injuries), 0)
     serious_injuries_total = func.coalesce(func.sum(TrafficCollision.serious_injuries), 0)
     fatalities_total = func.coalesce(func.sum(TrafficCollision.fatalities), 0)
 
-    # Weighted "harm score", numbers easily adjustable
-    harm_score = (
-        fatalities_total * 5
-        + serious_injuries_total * 3
-        + injuries_total * 2
-        + collision_count * 1
-    )
-
     # Map for metric selection
     metric_expr_map = {
         "collisions": collision_count,
         "injuries": injuries_total,
         "serious_injuries": serious_injuries_total,
         "fatalities": fatalities_total,
-        "harm": harm_score,
     }
-    amount_expr = metric_expr_map[metric]
+    if metric == "harm":
+        amount_expr = harm_total(profile_weights(db, harm_profile))
+    else:
+        amount_expr = metric_expr_map[metric]
 
 
     # Select series mode, one line per severity bucket, or none (one line for metric)
@@ -209,34 +294,98 @@ def build_line_chart_spec(
         series_select = literal(metric).label("series")
         series_group = literal(metric)
 
-    rows = (
-        query.with_entities(
-            bucket.label("bucket"),
-            series_select,
-            amount_expr.label("amount"),
+    def aggregate(interval):
+        # Time bucket used for grouping by interval (day/week/month)
+        bucket = func.date_trunc(interval, TrafficCollision.occurred_at)
+        return (
+            query.with_entities(
+                bucket.label("bucket"),
+                series_select,
+                amount_expr.label("amount"),
+            )
+            .group_by(bucket, series_group)
+            .order_by(bucket.asc())
         )
-        .group_by(bucket, series_group)
-        .order_by(bucket.asc())
-        .all()
+
+    # Over the cost guardrail, serve the next coarser buckets rather than reject (day -> week -> month)
+    position = LINE_CHART_INTERVALS.index(interval)
+    intervals = LINE_CHART_INTERVALS[position:position + 2]
+    used_interval, statement = affordable_variant(
+        db, "collision-metrics-over-time", [(i, aggregate(i)) for i in intervals]
     )
+    rows = statement.all()
+
+    rows = [row for row in rows if row.bucket is not None]
+    usermeta = {}
+    if max_points is not None and len(rows) > max_points:
+        # NumPy is only loaded once a downsampled chart is requested
+        from app.downsample import downsample_series
+
+        keep = downsample_series(
+            [row.bucket.timestamp() for row in rows],
+            [float(row.amount) for row in rows],
+            [row.series for row in rows],
+            max_points,
+        )
+        if len(keep) < len(rows):
+            usermeta.update(max_points=max_points, downsampled_from=len(rows))
+            rows = [rows[i] for i in keep]
 
     values = []
     for row in rows:
-        if row.bucket is None:
-            continue
         values.append(
             {"x": row.bucket.isoformat(), "y": int(row.amount), "c": row.series}
         )
 
+    if used_interval != interval:
+        usermeta.update(interval=used_interval, requested_interval=interval)
+    if usermeta:
+        spec["usermeta"] = usermeta
     return inject_values(spec, values)
 
+
+def build_metrics_over_time_spec(
+        db: Session,
+        *,
+        metric: Literal["collisions", "injuries", "serious_injuries", "fatalities", "harm"] = "collisions",
+        interval: Literal["day", "week", "month"] = "month",
+        series: Literal["none", "severity"] = "none",
+        location: Optional[str] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        harm_profile: Optional[str] = None,
+        max_points: Optional[int] = None
+) -> dict:
+    """
+    Build line chart spec, defaulting to the last 5 years of data when no start date is given.
+    """
+    if start_date is None:
+        max_dt = db.query(func.max(TrafficCollision.occurred_at)).scalar()
+        if max_dt is not None:
+            start_date = max_dt - timedelta(days=1825)
+            if end_date is None:
+                end_date = max_dt
+
+    return build_line_chart_spec(
+        db,
+        metric=metric,
+        interval=interval,
+        series=series,
+        location=location,
+        start_date=start_date,
+        end_date=end_date,
+        harm_profile=harm_profile,
+        max_points=max_points,
+    )
+
 def build_collision_heatmap_spec(
     db: Session,
     *,
     metric: Literal["count", "harm"] = "count",
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
-    severity_id: Optional[int] = None
+    severity_id: Optional[int] = None,
+    harm_profile: Optional[str] = None
 ) -> dict:
     spec = load_vega_spec("collision_heatmap.vega.json")
 
@@ -252,32 +401,16 @@ def build_collision_heatmap_spec(
     if severity_id:
         query = query.filter(TrafficCollision.severity_id == severity_id)
 
-    # Aggregates for calculating metrics
-    collision_count = func.count(TrafficCollision.id)
-    injuries_total = func.coalesce(func.sum(TrafficCollision.injuries), 0)
-    serious_injuries_total = func.coalesce(func.sum(TrafficCollision.serious_injuries), 0)
-    fatalities_total = func.coalesce(func.sum(TrafficCollision.fatalities), 0)
-
-    # Weighted "harm score", numbers easily adjustable
-    harm_score = (
-        fatalities_total * 5
-        + serious_injuries_total * 3
-        + injuries_total * 2
-        + collision_count * 1
-    )
-
-    weight_expr = 0
-
     if metric == "count":
-        weight_expr = collision_count
+        weight_expr = func.count(TrafficCollision.id)
     else:
-        weight_expr = harm_score
+        weight_expr = harm_total(profile_weights(db, harm_profile))
 
-    cell_size = 0.0025
+    cell_size = HEATMAP_CELL_SIZE
     lon_bin = (func.floor(TrafficCollision.lon / cell_size) * cell_size).label("lon")
     lat_bin = (func.floor(TrafficCollision.lat / cell_size) * cell_size).label("lat")
 
-    rows = (
+    statement = (
         query.with_entities(
             lon_bin,
             lat_bin,
@@ -285,17 +418,217 @@ def build_collision_heatmap_spec(
         )
         .group_by(lon_bin, lat_bin)
         .order_by(weight_expr.desc())
-        .all()
     )
+    check_cost(db, "collision-heatmap", statement)
+    rows = statement.all()
 
     values = []
     for row in rows:
         values.append(
             {
-                "lon": float(row.lon),
-                "lat": float(row.lat),
+                # Cell corners are multiples of HEATMAP_CELL_SIZE, rounding drops float noise (-122.36500000000001)
+                "lon": round(float(row.lon), 4),
+                "lat": round(float(row.lat), 4),
                 "weight": float(row.weight),
             }
         )
     
-    return inject_values(spec, values)
\ No newline at end of file
+    return inject_values(spec, values)
+
+
+def build_hotspots_spec(
+    db: Session,
+    *,
+    eps_m: float = 150.0,
+    min_collisions: int = 25,
+    metric: Literal["count", "harm"] = "harm",
+    limit: int = 50,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    severity_id: Optional[int] = None,
+    harm_profile: Optional[str] = None
+) -> dict:
+    """
+    Build hotspot map spec, defaulting to the last year of data when no start date is given.
+    The ranked cluster list is the "table" data and is repeated under `usermeta` with run totals.
+    """
+    if start_date is None:
+        max_dt = db.query(func.max(TrafficCollision.occurred_at)).scalar()
+        if max_dt is not None:
+            start_date = max_dt - timedelta(days=365)
+            if end_date is None:
+                end_date = max_dt
+
+    # NumPy is only loaded once a hotspot map is requested
+    from app.hotspots import find_hotspots
+
+    spec = load_vega_spec("hotspots.vega.json")
+    hotspots = find_hotspots(
+        db,
+        eps_m=eps_m,
+        min_collisions=min_collisions,
+        metric=metric,
+        limit=limit,
+        start_date=start_date,
+        end_date=end_date,
+        severity_id=severity_id,
+        weights=profile_weights(db, harm_profile) if metric == "harm" else None,
+    )
+    spec["usermeta"] = {
+        **hotspots,
+        "start_date": start_date.isoformat() if start_date else None,
+        "end_date": end_date.isoformat() if end_date else None,
+    }
+    return inject_values(spec, hotspots["clusters"])
+
+
+def time_matrix_template(matrix: str, metric: str) -> dict:
+    """
+    Time matrix spec without data: fixed axis order (Mon..Sun / Jan..Dec, 00..23) instead of data order.
+    """
+    spec = load_vega_spec("time_matrix.vega.json")
+    scales = {scale["name"]: scale for scale in spec["scales"]}
+    scales["x"]["domain"] = HOUR_LABELS
+    scales["y"]["domain"] = MATRICES[matrix][2]
+    spec["legends"][0]["title"] = "Collisions" if metric == "collisions" else "Harm Score"
+    return spec
+
+
+def build_time_matrix_spec(
+    db: Session,
+    *,
+    matrix: Literal["hour-of-week", "month-by-hour"] = "hour-of-week",
+    metric: Literal["collisions", "harm"] = "collisions",
+    severity_id: Optional[int] = None,
+    location: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    harm_profile: Optional[str] = None
+) -> dict:
+    """
+    Build local hour x day of week (or month) heatmap spec.
+    """
+    spec = time_matrix_template(matrix, metric)
+    result = time_matrix(
+        db,
+        matrix=matrix,
+        metric=metric,
+        severity_id=severity_id,
+        location=location,
+        start_date=start_date,
+        end_date=end_date,
+        harm_profile=harm_profile,
+    )
+
+    values = []
+    for row_label, row in zip(result["row_labels"], result["values"]):
+        for hour_label, value in zip(result["column_labels"], row):
+            values.append({"row": row_label, "hour": hour_label, "value": value})
+
+    return inject_values(spec, values)
+
+
+# Cacheable viz results by name, each called as builder(db, **params)
+VIZ_BUILDERS = {
+    "collisions-by-severity": build_collisions_by_severity_spec,
+    "most-dangerous-intersections": partial(build_horizontal_bar_graph_spec, address_type_name="Intersection"),
+    "most-dangerous-blocks": partial(build_horizontal_bar_graph_spec, address_type_name="Block"),
+    "most-dangerous-alleys": partial(build_horizontal_bar_graph_spec, address_type_name="Alley"),
+    "collision-metrics-over-time": build_metrics_over_time_spec,
+    "collision-heatmap": build_collision_heatmap_spec,
+    "hotspots": build_hotspots_spec,
+    "time-matrix": build_time_matrix_spec,
+}
+
+
+# Template and "table" dataset fields of each viz, in column order for data-by-reference specs
+VIZ_TABLES = {
+    "collisions-by-severity": ("collisions_by_severity.vega.json", ["severity_code", "category", "amount"]),
+    "most-dangerous-intersections": ("horizontal_bar_graph.vega.json", ["int_key", "category", "amount"]),
+    "most-dangerous-blocks": ("horizontal_bar_graph.vega.json", ["category", "amount"]),
+    "most-dangerous-alleys": ("horizontal_bar_graph.vega.json", ["category", "amount"]),
+    "collision-metrics-over-time": ("line_chart.vega.json", ["x", "y", "c"]),
+    "collision-heatmap": ("collision_heatmap.vega.json", ["lon", "lat", "weight"]),
+    "hotspots": ("hotspots.vega.json", [
+        "rank", "name", "lon", "lat", "radius_m", "bbox", "locations",
+        "collisions", "injuries", "serious_injuries", "fatalities", "harm",
+    ]),
+    "time-matrix": ("time_matrix.vega.json", ["row", "hour", "value"]),
+}
+
+
+def data_url(name: str, params: dict) -> str:
+    """
+    Path of the columnar data endpoint for a viz with the given parameters.
+    """
+    query = {
+        key: value.isoformat() if isinstance(value, datetime) else value
+        for key, value in params.items() if value is not None
+    }
+    return f"/viz/data/{name}" + (f"?{urlencode(query)}" if query else "")
+
+
+def build_spec_by_reference(name: str, **params) -> dict:
+    """
+    Viz spec whose "table" dataset is loaded from the data endpoint instead of embedded.
+    Depends on the parameters only, not on the data, so clients can keep it.
+    The columnar payload is one object of parallel arrays; a flatten transform turns it into rows.
+    """
+    if name == "time-matrix":
+        spec = time_matrix_template(params.get("matrix", "hour-of-week"), params.get("metric", "collisions"))
+    else:
+        spec = load_vega_spec(VIZ_TABLES[name][0])
+    dataset = next(d for d in spec.get("data", []) if d.get("name") == "table")
+    parse = dataset.pop("format", {}).get("parse", {})
+    dataset.pop("values", None)
+    dataset["url"] = data_url(name, params)
+    dataset["format"] = {"type": "json", "property": "columns"}
+    transform = [{"type": "flatten", "fields": VIZ_TABLES[name][1]}]
+    # Parsing applies before the flatten, so dates are converted per row afterwards
+    transform += [
+        {"type": "formula", "expr": f"toDate(datum.{field})", "as": field}
+        for field, kind in parse.items() if kind == "date"
+    ]
+    dataset["transform"] = transform + dataset.get("transform", [])
+    return spec
+
+
+def build_columnar_data(db: Session, name: str, **params) -> dict:
+    """
+    The "table" data of a viz as columns ({field: [values]}) rather than a list of row objects,
+    so field names are not repeated per row. Extra results (hotspot totals) are under `meta`.
+    """
+    spec = VIZ_BUILDERS[name](db, **params)
+    rows = next(d for d in spec["data"] if d.get("name") == "table")["values"]
+    result = {
+        "name": name,
+        "rows": len(rows),
+        "columns": {field: [row.get(field) for row in rows] for field in VIZ_TABLES[name][1]},
+    }
+    meta = {key: value for key, value in spec.get("usermeta", {}).items() if key != "clusters"}
+    if meta:
+        result["meta"] = meta
+    return result
+
+
+# Cached variants of each viz besides the inline spec, cache name "<viz>/<part>"
+VIZ_PARTS = {
+    "spec": lambda db, name, **params: build_spec_by_reference(name, **params),
+    "data": build_columnar_data,
+}
+
+
+def is_viz_result(name: str) -> bool:
+    viz, _, part = name.partition("/")
+    return viz in VIZ_BUILDERS and (not part or part in VIZ_PARTS)
+
+
+def build_encoded(db: Session, name: str, **params) -> bytes:
+    """
+    Build a viz result ("<viz>" inline spec, "<viz>/spec" or "<viz>/data") and serialize it once
+    into the precompressed bodies that are cached (see app.core.compression),
+    so cache hits are served without encoding or compressing.
+    """
+    viz, _, part = name.partition("/")
+    value = VIZ_PARTS[part](db, viz, **params) if part else VIZ_BUILDERS[viz](db, **params)
+    return encode_json_variants(value)